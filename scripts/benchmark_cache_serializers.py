@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Compares the blob size and load time of the chart cache serializers
+
+Usage: python scripts/benchmark_cache_serializers.py [rows]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from superset.cache_serializers import (
+    CODECS, ColumnarSerializer, PickleSerializer,
+)
+
+
+def get_df(rows):
+    rng = np.random.RandomState(0)
+    names = np.array(['name_{}'.format(i) for i in range(1000)], dtype=object)
+    return pd.DataFrame({
+        '__timestamp': pd.date_range('2000-01-01', periods=rows, freq='min'),
+        'name': names[rng.randint(0, len(names), rows)],
+        'state': names[rng.randint(0, 50, rows)],
+        'sum__num': rng.randint(0, 10000, rows),
+        'avg__num': rng.rand(rows),
+    })
+
+
+def benchmark(rows=500000, repeat=5):
+    payload = {
+        'dttm': '2018-07-01T00:00:00',
+        'query': 'SELECT * FROM birth_names',
+        'df': get_df(rows),
+    }
+    serializers = [('pickle', PickleSerializer()), ('columnar', ColumnarSerializer())]
+    for codec, (is_available, _, _) in sorted(CODECS.items()):
+        if is_available():
+            serializers.append((
+                'columnar+{}'.format(codec),
+                ColumnarSerializer(compression=codec)))
+
+    print('{:<20}{:>14}{:>14}{:>14}'.format(
+        'serializer', 'size (MB)', 'dumps (ms)', 'loads (ms)'))
+    for name, serializer in serializers:
+        blob = serializer.dumps(payload)
+        dumps_time = min(timeit.repeat(
+            lambda: serializer.dumps(payload), number=1, repeat=repeat))
+        loads_time = min(timeit.repeat(
+            lambda: serializer.loads(blob), number=1, repeat=repeat))
+        print('{:<20}{:>14.2f}{:>14.1f}{:>14.1f}'.format(
+            name, len(blob) / 1024 / 1024, dumps_time * 1000, loads_time * 1000))
+
+
+if __name__ == '__main__':
+    benchmark(*[int(arg) for arg in sys.argv[1:2]])
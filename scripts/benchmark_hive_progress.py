@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Compares parsing the whole Hive log on every poll with HiveLogTracker
+
+The log of a multi-stage job is replayed a few lines per poll, the way
+``HiveEngineSpec.handle_cursor`` reads it from ``cursor.fetch_logs()``.
+
+Usage: python scripts/benchmark_hive_progress.py [jobs] [lines_per_poll]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import timeit
+
+from superset.db_engine_specs import HiveEngineSpec, HiveLogTracker
+
+HEADER = [
+    '18/06/12 10:01:02 INFO ql.Driver: Compiling command(queryId=hive_1)',
+    '18/06/12 10:01:03 INFO ql.Driver: Total jobs = {jobs}',
+]
+JOB = [
+    '18/06/12 10:01:04 INFO ql.Driver: Launching Job {job} out of {jobs}',
+    '18/06/12 10:01:04 INFO exec.Task: Number of reduce tasks not specified.',
+    '18/06/12 10:01:05 INFO mapreduce.JobSubmitter: number of splits:2048',
+    '18/06/12 10:01:06 INFO exec.Task: Starting Job = job_{job}, '
+    'Tracking URL = http://yarn:8088/proxy/application_{job}/',
+]
+STAGE = (
+    '18/06/12 10:02:{second:02d} INFO exec.Task: 2018-06-12 10:02:{second:02d},'
+    '173 Stage-{stage} map = {map}%,  reduce = {reduce}%, '
+    'Cumulative CPU {cpu} sec'
+)
+NOISE = (
+    '18/06/12 10:02:{second:02d} INFO log.PerfLogger: '
+    '<PERFLOG method=task.MAPRED.Stage-{stage} '
+    'from=org.apache.hadoop.hive.ql.Driver>'
+)
+
+
+def get_log_lines(jobs):
+    lines = [line.format(jobs=jobs) for line in HEADER]
+    for job in range(1, jobs + 1):
+        lines += [line.format(job=job, jobs=jobs) for line in JOB]
+        for stage in range(1, 4):
+            for step in range(101):
+                lines.append(STAGE.format(
+                    second=step % 60, stage=stage, map=step,
+                    reduce=step // 2, cpu=step * 3))
+                lines.append(NOISE.format(second=step % 60, stage=stage))
+    return lines
+
+
+def get_logs(lines, lines_per_poll):
+    """The whole log as returned by each poll"""
+    return [
+        '\n'.join(lines[:end])
+        for end in range(lines_per_poll, len(lines), lines_per_poll)
+    ] + ['\n'.join(lines)]
+
+
+def parse_whole(logs):
+    for log in logs:
+        log_lines = log.splitlines()
+        HiveEngineSpec.progress(log_lines)
+        HiveEngineSpec.get_tracking_url(log_lines)
+
+
+def parse_incremental(logs):
+    tracker = HiveLogTracker(HiveEngineSpec)
+    for log in logs:
+        tracker.update(log)
+        tracker.progress
+        tracker.tracking_url
+
+
+def benchmark(jobs=20, lines_per_poll=100, repeat=3):
+    lines = get_log_lines(jobs)
+    logs = get_logs(lines, lines_per_poll)
+    print('{} log lines, {} polls'.format(len(lines), len(logs)))
+    print('{:<14}{:>12}'.format('parsing', 'time (ms)'))
+    for name, parse in (
+            ('whole log', parse_whole),
+            ('incremental', parse_incremental)):
+        duration = min(timeit.repeat(
+            lambda: parse(logs), number=1, repeat=repeat))
+        print('{:<14}{:>12.1f}'.format(name, duration * 1000))
+
+
+if __name__ == '__main__':
+    benchmark(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Compares parsing SQL Lab queries with and without the parse cache
+
+Each query of the corpus is parsed as many times as a SQL Lab submission
+does: by the security checks, the limit handling and the execution.
+
+Usage: python scripts/benchmark_sql_parse.py [columns] [repeat]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import timeit
+
+from superset import sql_parse
+
+PARSES_PER_QUERY = 5
+
+
+def get_corpus(columns):
+    select = ',\n  '.join(
+        'SUM(CASE WHEN category = \'c{0}\' THEN amount ELSE 0 END) AS c{0}'
+        .format(i) for i in range(columns))
+    return [
+        'SELECT * FROM sales LIMIT 100',
+        'SELECT name, SUM(num) AS total FROM birth_names '
+        'WHERE ds >= \'2000-01-01\' GROUP BY name ORDER BY total DESC LIMIT 50',
+        'WITH recent AS (SELECT * FROM events WHERE ts > NOW() - INTERVAL 1 DAY)\n'
+        'SELECT e.user_id, COUNT(*) FROM recent e\n'
+        'JOIN users u ON u.id = e.user_id GROUP BY e.user_id',
+        'SELECT region,\n  {}\nFROM warehouse.sales s\n'
+        'LEFT JOIN warehouse.regions r ON r.id = s.region_id\n'
+        'WHERE s.ds BETWEEN \'2018-01-01\' AND \'2018-06-30\'\n'
+        'GROUP BY region LIMIT 1000'.format(select),
+        'SELECT * FROM (SELECT a.*, b.value FROM a JOIN b ON a.id = b.id) t1\n'
+        'UNION ALL\nSELECT * FROM archive.t2; SELECT COUNT(*) FROM t3',
+    ]
+
+
+def parse(corpus, parse_query):
+    # every submission starts from an empty cache
+    sql_parse.parse_cache.clear()
+    for sql in corpus:
+        for _ in range(PARSES_PER_QUERY):
+            parse_query(sql)
+
+
+def benchmark(columns=200, repeat=5):
+    corpus = get_corpus(columns)
+    print('{} queries, {} parses each'.format(len(corpus), PARSES_PER_QUERY))
+    print('{:<12}{:>12}'.format('parser', 'time (ms)'))
+    for name, parse_query in (
+            ('uncached', sql_parse.SupersetQuery),
+            ('cached', sql_parse.parse_query)):
+        duration = min(timeit.repeat(
+            lambda: parse(corpus, parse_query), number=1, repeat=repeat))
+        print('{:<12}{:>12.1f}'.format(name, duration * 1000))
+
+
+if __name__ == '__main__':
+    benchmark(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Compares the per point and columnar NVD3 time series payloads
+
+Usage: python scripts/benchmark_timeseries_series.py [series] [points]
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from superset import viz
+
+
+def get_df(series, points):
+    rng = np.random.RandomState(0)
+    values = rng.rand(points, series)
+    values[rng.rand(points, series) < 0.01] = np.nan
+    return pd.DataFrame(
+        values,
+        columns=['series_{}'.format(i) for i in range(series)],
+        index=pd.date_range('2000-01-01', periods=points, freq='min'))
+
+
+def benchmark(series=200, points=10000, repeat=3):
+    df = get_df(series, points)
+    viz_obj = viz.NVD3TimeSeriesViz(True, {'metrics': ['sum__num']})
+
+    print('{:<12}{:>16}{:>16}{:>14}'.format(
+        'shape', 'to_series (ms)', 'json (ms)', 'size (MB)'))
+    for name, columnar in (('per point', False), ('columnar', True)):
+        viz.config['NVD3_COLUMNAR_SERIES'] = columnar
+        data = viz_obj.to_series(df.copy())
+        blob = viz_obj.json_dumps(data)
+        series_time = min(timeit.repeat(
+            lambda: viz_obj.to_series(df.copy()), number=1, repeat=repeat))
+        json_time = min(timeit.repeat(
+            lambda: viz_obj.json_dumps(data), number=1, repeat=repeat))
+        print('{:<12}{:>16.1f}{:>16.1f}{:>14.2f}'.format(
+            name, series_time * 1000, json_time * 1000,
+            len(blob) / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    benchmark(*[int(arg) for arg in sys.argv[1:3]])
@@ -19,7 +19,7 @@ from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from werkzeug.contrib.fixers import ProxyFix
 
-from superset import config, utils
+from superset import config, sql_parse, utils
 from superset.connectors.connector_registry import ConnectorRegistry
 from superset.security import SupersetSecurityManager
 
@@ -113,6 +113,7 @@ utils.pessimistic_connection_handling(db.engine)
 
 cache = utils.setup_cache(app, conf.get('CACHE_CONFIG'))
 tables_cache = utils.setup_cache(app, conf.get('TABLE_NAMES_CACHE_CONFIG'))
+sql_parse.parse_cache.max_size = conf.get('SQL_PARSE_CACHE_SIZE')
 
 migrate = Migrate(app, db, directory=APP_DIR + '/migrations')
 
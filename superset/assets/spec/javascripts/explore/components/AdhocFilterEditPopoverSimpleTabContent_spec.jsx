@@ -110,6 +110,13 @@ describe('AdhocFilterEditPopoverSimpleTabContent', () => {
     ))).to.be.true;
   });
 
+  it('searches the suggestions on the server as the comparator is typed', () => {
+    const { wrapper } = setup();
+    const refresh = sinon.spy(wrapper.instance(), 'refreshComparatorSuggestions');
+    expect(wrapper.instance().onComparatorSearchChange('Car')).to.equal('Car');
+    expect(refresh.calledWith('Car')).to.be.true;
+  });
+
   it('will filter operators for table datasources', () => {
     const { wrapper } = setup({ datasource: { type: 'table' } });
     expect(wrapper.instance().isOperatorRelevant('regex')).to.be.false;
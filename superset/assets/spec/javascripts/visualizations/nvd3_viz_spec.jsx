@@ -1,7 +1,7 @@
 import { describe, it } from 'mocha';
 import { expect } from 'chai';
 
-import { formatLabel } from '../../../src/visualizations/nvd3_vis';
+import { formatLabel, toPointSeries } from '../../../src/visualizations/nvd3_vis';
 
 describe('nvd3 viz', () => {
   const verboseMap = {
@@ -25,4 +25,16 @@ describe('nvd3 viz', () => {
       expect(formatLabel(['foo', 'bar', 'baz', '2 hours offset'], verboseMap)).to.equal('Foo, Bar, baz, 2 hours offset');
     });
   });
+  describe('toPointSeries', () => {
+    it('turns columnar series into points', () => {
+      expect(toPointSeries({ key: 'foo', x: [1, 2], y: [3, null] })).to.deep.equal({
+        key: 'foo',
+        values: [{ x: 1, y: 3 }, { x: 2, y: null }],
+      });
+    });
+    it('leaves point series alone', () => {
+      const series = { key: 'foo', values: [{ x: 1, y: 3 }] };
+      expect(toPointSeries(series)).to.equal(series);
+    });
+  });
 });
@@ -49,6 +49,8 @@ function translateOperator(operator) {
 }
 
 const SINGLE_LINE_SELECT_CONTROL_HEIGHT = 30;
+// the values suggested before anything is typed, the server is searched then
+const SUGGESTIONS_LIMIT = 1000;
 
 export default class AdhocFilterEditPopoverSimpleTabContent extends React.Component {
   constructor(props) {
@@ -57,6 +59,7 @@ export default class AdhocFilterEditPopoverSimpleTabContent extends React.Compon
     this.onOperatorChange = this.onOperatorChange.bind(this);
     this.onComparatorChange = this.onComparatorChange.bind(this);
     this.onInputComparatorChange = this.onInputComparatorChange.bind(this);
+    this.onComparatorSearchChange = this.onComparatorSearchChange.bind(this);
     this.isOperatorRelevant = this.isOperatorRelevant.bind(this);
     this.refreshComparatorSuggestions = this.refreshComparatorSuggestions.bind(this);
     this.multiComparatorRef = this.multiComparatorRef.bind(this);
@@ -132,6 +135,11 @@ export default class AdhocFilterEditPopoverSimpleTabContent extends React.Compon
     this.onComparatorChange(event.target.value);
   }
 
+  onComparatorSearchChange(search) {
+    this.refreshComparatorSuggestions(search);
+    return search;
+  }
+
   onComparatorChange(comparator) {
     this.props.onChange(this.props.adhocFilter.duplicateWith({
       comparator,
@@ -156,7 +164,7 @@ export default class AdhocFilterEditPopoverSimpleTabContent extends React.Compon
     }
   }
 
-  refreshComparatorSuggestions() {
+  refreshComparatorSuggestions(search) {
     const datasource = this.props.datasource;
     const col = this.props.adhocFilter.subject;
     const having = this.props.adhocFilter.clause === CLAUSES.HAVING;
@@ -165,10 +173,14 @@ export default class AdhocFilterEditPopoverSimpleTabContent extends React.Compon
       if (this.state.activeRequest) {
         this.state.activeRequest.abort();
       }
+      const params = search ?
+        `q=${encodeURIComponent(search)}&match=substring` :
+        `limit=${SUGGESTIONS_LIMIT}`;
       this.setState({
+        comparatorSearch: search,
         activeRequest: $.ajax({
           type: 'GET',
-          url: `/superset/filter/${datasource.type}/${datasource.id}/${col}/`,
+          url: `/superset/filter/${datasource.type}/${datasource.id}/${col}/?${params}`,
           success: data => this.setState({ suggestions: data, activeRequest: null }),
         }),
       });
@@ -261,7 +273,8 @@ export default class AdhocFilterEditPopoverSimpleTabContent extends React.Compon
           {
             (
               MULTI_OPERATORS.indexOf(adhocFilter.operator) >= 0 ||
-              this.state.suggestions.length > 0
+              this.state.suggestions.length > 0 ||
+              this.state.comparatorSearch
             ) ?
               <SelectControl
                 multi={MULTI_OPERATORS.indexOf(adhocFilter.operator) >= 0}
@@ -271,6 +284,7 @@ export default class AdhocFilterEditPopoverSimpleTabContent extends React.Compon
                 isLoading={false}
                 choices={this.state.suggestions}
                 onChange={this.onComparatorChange}
+                onInputChange={this.onComparatorSearchChange}
                 showHeader={false}
                 noResultsText={t('type a value here')}
                 refFunc={this.multiComparatorRef}
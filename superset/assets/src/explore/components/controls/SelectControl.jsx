@@ -19,6 +19,7 @@ const propTypes = {
   name: PropTypes.string.isRequired,
   onChange: PropTypes.func,
   onFocus: PropTypes.func,
+  onInputChange: PropTypes.func,
   value: PropTypes.oneOfType([PropTypes.string, PropTypes.number, PropTypes.array]),
   showHeader: PropTypes.bool,
   optionRenderer: PropTypes.func,
@@ -126,6 +127,7 @@ export default class SelectControl extends React.PureComponent {
       isLoading: this.props.isLoading,
       onChange: this.onChange,
       onFocus: this.props.onFocus,
+      onInputChange: this.props.onInputChange,
       optionRenderer: VirtualizedRendererWrap(this.props.optionRenderer),
       valueRenderer: this.props.valueRenderer,
       noResultsText: this.props.noResultsText,
@@ -990,6 +990,31 @@ export const controls = {
     'with the [Periods] text box'),
   },
 
+  downsampling: {
+    type: 'SelectControl',
+    label: t('Downsampling'),
+    default: null,
+    clearable: true,
+    choices: [
+      ['lttb', 'Largest triangle three buckets'],
+      ['minmax', 'Min / max per bucket'],
+    ],
+    description: t('Only send a subset of the points of each series to the ' +
+    'browser. "Largest triangle three buckets" keeps the points that best ' +
+    'preserve the shape of the line, "Min / max" keeps the lowest and ' +
+    'highest point of each bucket so that spikes are never lost'),
+  },
+
+  downsampling_points: {
+    type: 'TextControl',
+    label: t('Downsampling Points'),
+    isInt: true,
+    default: 1000,
+    validators: [v.integer],
+    description: t('The maximum number of points kept per series when ' +
+    'downsampling'),
+  },
+
   multiplier: {
     type: 'TextControl',
     label: t('Multiplier'),
@@ -182,6 +182,7 @@ export const visTypes = {
           ['show_brush', 'show_legend'],
           ['rich_tooltip', 'show_markers'],
           ['line_interpolation'],
+          ['downsampling', 'downsampling_points'],
         ],
       },
       {
@@ -352,6 +353,7 @@ export const visTypes = {
         controlSetRows: [
           ['color_scheme'],
           ['x_axis_format'],
+          ['downsampling', 'downsampling_points'],
         ],
       },
       {
@@ -1667,6 +1669,7 @@ export const visTypes = {
         expanded: true,
         controlSetRows: [
           ['series_height', 'horizon_color_scale'],
+          ['downsampling', 'downsampling_points'],
         ],
       },
     ],
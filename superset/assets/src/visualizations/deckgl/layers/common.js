@@ -3,6 +3,72 @@ import { fitBounds } from 'viewport-mercator-project';
 
 import sandboxedEval from '../../../modules/sandbox';
 
+const TYPED_ARRAYS = {
+  Float32Array,
+  Float64Array,
+  Uint8Array,
+  Int8Array,
+  Uint16Array,
+  Int16Array,
+  Uint32Array,
+  Int32Array,
+};
+
+export function decodeTypedArray(spec) {
+  // Reads an array encoded by superset/typed_arrays.py
+  const raw = atob(spec.data);
+  const bytes = new Uint8Array(raw.length);
+  for (let i = 0; i < raw.length; i += 1) {
+    bytes[i] = raw.charCodeAt(i);
+  }
+  return new TYPED_ARRAYS[spec.type](bytes.buffer);
+}
+
+export function binaryToFeatures(binary) {
+  // Builds the features of a deck.gl payload sent as typed arrays
+  // (see DECKGL_BINARY_PAYLOAD)
+  const features = [];
+  for (let i = 0; i < binary.length; i += 1) {
+    features.push({ ...binary.constants });
+  }
+  Object.keys(binary.attributes).forEach((name) => {
+    const spec = binary.attributes[name];
+    const values = decodeTypedArray(spec);
+    features.forEach((feature, i) => {
+      let value;
+      if (spec.size > 1) {
+        value = Array.from(values.subarray(i * spec.size, (i + 1) * spec.size));
+      } else if (spec.categories) {
+        value = values[i] < 0 ? null : spec.categories[values[i]];
+      } else {
+        value = values[i];
+      }
+      // eslint-disable-next-line no-param-reassign
+      feature[name] = value;
+    });
+  });
+  const columns = Object.keys(binary.columns || {});
+  if (columns.length) {
+    features.forEach((feature, i) => {
+      const extraProps = {};
+      columns.forEach((col) => {
+        extraProps[col] = binary.columns[col][i];
+      });
+      // eslint-disable-next-line no-param-reassign
+      feature.extraProps = extraProps;
+    });
+  }
+  return features;
+}
+
+export function getFeatures(payload) {
+  const data = payload.data;
+  if (!data.features && data.binary) {
+    data.features = binaryToFeatures(data.binary);
+  }
+  return data.features;
+}
+
 export function getBounds(points) {
   const latExt = d3.extent(points, d => d[1]);
   const lngExt = d3.extent(points, d => d[0]);
@@ -11,7 +11,7 @@ import sandboxedEval from '../../../modules/sandbox';
 function getLayer(formData, payload, slice) {
   const fd = formData;
   const c = fd.color_picker;
-  let data = payload.data.features.map(d => ({
+  let data = common.getFeatures(payload).map(d => ({
     ...d,
     color: [c.r, c.g, c.b, 255 * c.a],
   }));
@@ -50,7 +50,7 @@ function deckHex(slice, payload, setControlValue) {
   };
 
   if (slice.formData.autozoom) {
-    viewport = common.fitViewport(viewport, getPoints(payload.data.features));
+    viewport = common.fitViewport(viewport, getPoints(common.getFeatures(payload)));
   }
 
   ReactDOM.render(
@@ -26,7 +26,7 @@ function getCategories(formData, payload) {
   const fixedColor = [c.r, c.g, c.b, 255 * c.a];
   const categories = {};
 
-  payload.data.features.forEach((d) => {
+  common.getFeatures(payload).forEach((d) => {
     if (d.cat_color != null && !categories.hasOwnProperty(d.cat_color)) {
       let color;
       if (fd.dimension) {
@@ -45,7 +45,7 @@ function getLayer(formData, payload, slice, filters) {
   const c = fd.color_picker || { r: 0, g: 0, b: 0, a: 1 };
   const fixedColor = [c.r, c.g, c.b, 255 * c.a];
 
-  let data = payload.data.features.map((d) => {
+  let data = common.getFeatures(payload).map((d) => {
     let radius = unitToRadius(fd.point_unit, d.radius) || 10;
     if (fd.multiplier) {
       radius *= fd.multiplier;
@@ -99,7 +99,7 @@ class DeckGLScatter extends React.PureComponent {
     const fd = nextProps.slice.formData;
 
     const timeGrain = fd.time_grain_sqla || fd.granularity || 'PT1M';
-    const timestamps = nextProps.payload.data.features.map(f => f.__timestamp);
+    const timestamps = common.getFeatures(nextProps.payload).map(f => f.__timestamp);
     const { start, end, step, values, disabled } = getPlaySliderParams(timestamps, timeGrain);
 
     const categories = getCategories(fd, nextProps.payload);
@@ -198,7 +198,7 @@ function deckScatter(slice, payload, setControlValue) {
   };
 
   if (fd.autozoom) {
-    viewport = common.fitViewport(viewport, getPoints(payload.data.features));
+    viewport = common.fitViewport(viewport, getPoints(common.getFeatures(payload)));
   }
 
   ReactDOM.render(
@@ -19,7 +19,7 @@ function getPoints(data) {
 function getLayer(formData, payload, slice, filters) {
   const fd = formData;
   const c = fd.color_picker;
-  let data = payload.data.features.map(d => ({
+  let data = common.getFeatures(payload).map(d => ({
     ...d,
     color: [c.r, c.g, c.b, 255 * c.a],
   }));
@@ -64,7 +64,7 @@ class DeckGLScreenGrid extends React.PureComponent {
     const fd = nextProps.slice.formData;
 
     const timeGrain = fd.time_grain_sqla || fd.granularity || 'PT1M';
-    const timestamps = nextProps.payload.data.features.map(f => f.__timestamp);
+    const timestamps = common.getFeatures(nextProps.payload).map(f => f.__timestamp);
     const { start, end, step, values, disabled } = getPlaySliderParams(timestamps, timeGrain);
 
     return { start, end, step, values, disabled };
@@ -127,7 +127,7 @@ function deckScreenGrid(slice, payload, setControlValue) {
   };
 
   if (fd.autozoom) {
-    viewport = common.fitViewport(viewport, getPoints(payload.data.features));
+    viewport = common.fitViewport(viewport, getPoints(common.getFeatures(payload)));
   }
 
   ReactDOM.render(
@@ -123,6 +123,16 @@ export function formatLabel(input, verboseMap = {}) {
   return label;
 }
 
+export function toPointSeries(series) {
+  // Columnar series ({ key, x: [...], y: [...] }, see NVD3_COLUMNAR_SERIES)
+  // are turned into the { key, values: [{ x, y }, ...] } shape nvd3 expects
+  if (series.values || !Array.isArray(series.x)) {
+    return series;
+  }
+  const { x, y, ...rest } = series;
+  return { ...rest, values: x.map((xi, i) => ({ x: xi, y: y[i] })) };
+}
+
 export default function nvd3Vis(slice, payload) {
   let chart;
   let colorKey = 'key';
@@ -132,7 +142,7 @@ export default function nvd3Vis(slice, payload) {
   if (payload.data) {
     if (Array.isArray(payload.data)) {
         data = payload.data.map(x => ({
-            ...x, key: formatLabel(x.key, slice.datasource.verbose_map),
+            ...toPointSeries(x), key: formatLabel(x.key, slice.datasource.verbose_map),
         }));
     } else {
       data = payload.data;
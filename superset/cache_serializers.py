@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Serializers used to store query results (pandas DataFrames) in the cache
+
+The serializer is picked through the ``DATA_CACHE_SERIALIZER`` config key.
+``PickleSerializer`` is the historical behavior. ``ColumnarSerializer``
+writes a pickle-free binary layout made of one typed, little-endian buffer
+per column, optionally compressed, that can be decoded straight into numpy
+arrays without going through per-row Python objects.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import logging
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+from six import integer_types, string_types, text_type
+from six.moves import cPickle as pkl
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class UnsupportedFrameException(Exception):
+    """Raised when a DataFrame can't be represented in the columnar layout"""
+    pass
+
+
+class BaseSerializer(object):
+    """Base class for cache serializers
+
+    A serializer turns the dict stored by ``BaseViz.get_df_payload``
+    (``df``, ``query``, ``dttm``) into bytes and back.
+    """
+
+    def dumps(self, obj):
+        raise NotImplementedError()
+
+    def loads(self, blob):
+        raise NotImplementedError()
+
+
+class PickleSerializer(BaseSerializer):
+    """Pickles the whole payload, DataFrame included"""
+
+    def dumps(self, obj):
+        return pkl.dumps(obj, protocol=pkl.HIGHEST_PROTOCOL)
+
+    def loads(self, blob):
+        return pkl.loads(blob)
+
+
+def _to_bytes(data):
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return data
+
+
+def _zlib_compress(data):
+    return zlib.compress(data, 1)
+
+
+def _lz4_compress(data):
+    return lz4_frame.compress(data)
+
+
+def _lz4_decompress(data):
+    return lz4_frame.decompress(data)
+
+
+def _zstd_compress(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {
+    'zlib': (lambda: True, _zlib_compress, zlib.decompress),
+    'lz4': (lambda: lz4_frame is not None, _lz4_compress, _lz4_decompress),
+    'zstd': (lambda: zstandard is not None, _zstd_compress, _zstd_decompress),
+}
+
+
+class ColumnarSerializer(BaseSerializer):
+    """Stores DataFrames as typed column buffers instead of a pickle
+
+    Blob layout::
+
+        MAGIC | uint32 header length | JSON header | padding | buffers
+
+    The JSON header holds every non-DataFrame value of the payload plus the
+    description of each column (name, dtype, encoding and the position of
+    its buffers in the body). Buffers are aligned on 8 bytes so that, when
+    no compression is used, numeric and datetime columns are decoded with
+    ``np.frombuffer`` as views over the blob.
+
+    Numeric, boolean and (timezone naive) datetime columns are stored as raw
+    little-endian values. String columns are dictionary encoded: int32 codes
+    (-1 for nulls) plus the distinct values as one UTF-8 buffer and their
+    character offsets. Payloads that can't be represented
+    that way (mixed object columns, custom indexes, ...) fall back to
+    ``PickleSerializer``, and ``loads`` reads both formats so switching
+    serializers doesn't invalidate a warm cache.
+    """
+
+    MAGIC = b'SSCOL1\x00\x00'
+    ALIGNMENT = 8
+
+    def __init__(self, compression=None, compression_min_size=1024):
+        if compression and compression not in CODECS:
+            raise ValueError('Unknown compression [{}]'.format(compression))
+        if compression and not CODECS[compression][0]():
+            raise ValueError(
+                'The python package required for [{}] compression '
+                'is not installed'.format(compression))
+        self.compression = compression
+        self.compression_min_size = compression_min_size
+        self.fallback = PickleSerializer()
+
+    def dumps(self, obj):
+        try:
+            return self._dumps(obj)
+        except UnsupportedFrameException as e:
+            logging.info(
+                'Falling back to pickle for cache serialization: {}'.format(e))
+            return self.fallback.dumps(obj)
+
+    def loads(self, blob, columns=None):
+        """Reads a payload, ``columns`` restricts the DataFrame columns read"""
+        if not self.is_columnar(blob):
+            obj = self.fallback.loads(blob)
+            if columns is not None and obj.get('df') is not None:
+                obj['df'] = obj['df'][[c for c in obj['df'].columns if c in columns]]
+            return obj
+        return self._loads(blob, columns)
+
+    @classmethod
+    def is_columnar(cls, blob):
+        return _to_bytes(blob[:len(cls.MAGIC)]) == cls.MAGIC
+
+    def _dumps(self, obj):
+        obj = dict(obj)
+        df = obj.pop('df', None)
+        buffers = []
+        header = {'meta': obj, 'df': None}
+        if df is not None:
+            header['df'] = self.encode_frame(df, buffers)
+
+        offset = 0
+        chunks = []
+        for buf in buffers:
+            data = buf['data']
+            codec = None
+            if self.compression and len(data) >= self.compression_min_size:
+                codec = self.compression
+                data = CODECS[codec][1](data)
+            pad = -len(data) % self.ALIGNMENT
+            buf['spec'].update({
+                'offset': offset,
+                'size': len(data),
+                'codec': codec,
+            })
+            chunks.append(data)
+            chunks.append(b'\x00' * pad)
+            offset += len(data) + pad
+
+        try:
+            header_bytes = json.dumps(header).encode('utf-8')
+        except (TypeError, ValueError):
+            raise UnsupportedFrameException('payload is not JSON serializable')
+        prefix = self.MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+        prefix += b'\x00' * (-len(prefix) % self.ALIGNMENT)
+        return prefix + b''.join(chunks)
+
+    def _loads(self, blob, columns=None):
+        view = memoryview(blob)
+        start = len(self.MAGIC)
+        header_len = struct.unpack('<I', view[start:start + 4].tobytes())[0]
+        start += 4
+        header = json.loads(view[start:start + header_len].tobytes().decode('utf-8'))
+        body_start = start + header_len
+        body_start += -body_start % self.ALIGNMENT
+
+        obj = header['meta']
+        obj['df'] = None
+        if header['df'] is not None:
+            obj['df'] = self.decode_frame(
+                header['df'], view[body_start:], columns)
+        return obj
+
+    @classmethod
+    def encode_frame(cls, df, buffers):
+        """Describes ``df`` and appends its column buffers to ``buffers``"""
+        index = df.index
+        if not (
+                isinstance(index, pd.RangeIndex) and
+                index.name is None and
+                (len(index) == 0 or (index[0] == 0 and index[-1] == len(index) - 1))):
+            raise UnsupportedFrameException('only default indexes are supported')
+        if isinstance(df.columns, pd.MultiIndex):
+            raise UnsupportedFrameException('MultiIndex columns are not supported')
+
+        columns = []
+        for i, name in enumerate(df.columns):
+            if not isinstance(name, string_types + integer_types):
+                raise UnsupportedFrameException(
+                    'unsupported column name {!r}'.format(name))
+            values = df.iloc[:, i].values
+            columns.append(cls.encode_column(name, values, buffers))
+        return {'nrows': len(df.index), 'columns': columns}
+
+    @classmethod
+    def _add_buffer(cls, buffers, data):
+        spec = {}
+        buffers.append({'data': data, 'spec': spec})
+        return spec
+
+    @classmethod
+    def encode_column(cls, name, values, buffers):
+        dtype = values.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+            le_dtype = dtype.newbyteorder('<')
+            data = np.ascontiguousarray(values, dtype=le_dtype).tobytes()
+            return {
+                'name': name,
+                'encoding': 'plain',
+                'dtype': le_dtype.str,
+                'values': cls._add_buffer(buffers, data),
+            }
+
+        if not (isinstance(dtype, np.dtype) and dtype.kind == 'O'):
+            raise UnsupportedFrameException(
+                'unsupported dtype {} for column {!r}'.format(dtype, name))
+
+        codes, uniques = pd.factorize(values)
+        inferred = pd.api.types.infer_dtype(uniques)
+        if inferred not in ('string', 'unicode', 'empty'):
+            raise UnsupportedFrameException(
+                'object column {!r} holds {} values'.format(name, inferred))
+
+        strings = [text_type(s) for s in uniques]
+        offsets = np.zeros(len(strings) + 1, dtype='<i8')
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+        return {
+            'name': name,
+            'encoding': 'dictionary',
+            'dtype': 'object',
+            'codes': cls._add_buffer(
+                buffers, np.asarray(codes, dtype='<i4').tobytes()),
+            'offsets': cls._add_buffer(buffers, offsets.tobytes()),
+            'values': cls._add_buffer(
+                buffers, ''.join(strings).encode('utf-8')),
+        }
+
+    @classmethod
+    def _read_buffer(cls, body, spec):
+        data = body[spec['offset']:spec['offset'] + spec['size']]
+        codec = spec.get('codec')
+        if codec:
+            if not CODECS[codec][0]():
+                raise ValueError(
+                    'Cache entry requires [{}] decompression'.format(codec))
+            return CODECS[codec][2](_to_bytes(data))
+        return data
+
+    @classmethod
+    def decode_column(cls, spec, body, nrows):
+        if spec['encoding'] == 'plain':
+            return np.frombuffer(
+                cls._read_buffer(body, spec['values']),
+                dtype=np.dtype(str(spec['dtype'])),
+                count=nrows)
+
+        offsets = np.frombuffer(
+            cls._read_buffer(body, spec['offsets']), dtype='<i8').tolist()
+        text = _to_bytes(cls._read_buffer(body, spec['values'])).decode('utf-8')
+        # the last slot of the dictionary holds nulls, coded as -1
+        dictionary = np.empty(len(offsets), dtype=object)
+        dictionary[:-1] = [text[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        codes = np.frombuffer(
+            cls._read_buffer(body, spec['codes']), dtype='<i4', count=nrows)
+        return dictionary.take(codes)
+
+    @classmethod
+    def decode_frame(cls, frame, body, columns=None):
+        """Builds a DataFrame out of an encoded frame description
+
+        ``columns`` optionally restricts decoding to a subset of column names
+        """
+        nrows = frame['nrows']
+        specs = frame['columns']
+        if columns is not None:
+            specs = [spec for spec in specs if spec['name'] in columns]
+        df = pd.DataFrame({
+            i: cls.decode_column(spec, body, nrows)
+            for i, spec in enumerate(specs)
+        }, columns=list(range(len(specs))), index=pd.RangeIndex(nrows))
+        df.columns = [spec['name'] for spec in specs]
+        return df
@@ -5,6 +5,11 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import logging
+import threading
+import time
+import uuid
+
 from flask import request
 
 from superset import tables_cache
@@ -38,3 +43,95 @@ def memoized_func(timeout=5 * 60, key=view_cache_key):
                 return f(cls, *args, **kwargs)
         return wrapped_f
     return wrap
+
+
+class SingleFlight(object):
+    """Coalesces concurrent computations of the same cache key
+
+    The first caller to ``acquire`` a key gets a lock and is expected to
+    compute the value and store it in the cache. Concurrent callers for the
+    same key block until the lock is released and then read the value from
+    the cache instead of computing it again. Callers are coordinated with a
+    ``threading.Event`` within the process and with a lock key created
+    through the atomic ``cache.add`` across processes (gunicorn workers).
+
+    Waiting is bounded by ``timeout``, after which callers give up and
+    compute the value themselves. The lock key expires after ``timeout`` as
+    well, so that a crashed worker can't hold it forever.
+    """
+
+    def __init__(self, cache, timeout=60, poll_interval=0.1):
+        self.cache = cache
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._events = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def lock_key(key):
+        return 'single_flight/{}'.format(key)
+
+    def acquire(self, key):
+        """Returns a lock to release once the value for ``key`` is cached
+
+        Returns None if another caller held the lock, in which case the
+        value for ``key`` should be read from the cache.
+        """
+        with self._lock:
+            event = self._events.get(key)
+            is_leader = event is None
+            if is_leader:
+                event = self._events[key] = threading.Event()
+        if not is_leader:
+            event.wait(self.timeout)
+            return None
+
+        lock = SingleFlightLock(self, key, event)
+        try:
+            deadline = time.time() + self.timeout
+            waited = False
+            while not self.cache.add(
+                    self.lock_key(key), lock.token, timeout=self.timeout):
+                waited = True
+                if time.time() > deadline or self.cache.get(key) is not None:
+                    lock.release()
+                    return None
+                time.sleep(self.poll_interval)
+            if waited and self.cache.get(key) is not None:
+                lock.release()
+                return None
+        except Exception:
+            # don't leave the callers of this process waiting on the event
+            lock.release()
+            raise
+        lock.is_shared = True
+        return lock
+
+    def _release(self, lock):
+        if lock.is_shared:
+            lock_key = self.lock_key(lock.key)
+            try:
+                if self.cache.get(lock_key) == lock.token:
+                    self.cache.delete(lock_key)
+            except Exception as e:
+                logging.exception(e)
+        with self._lock:
+            self._events.pop(lock.key, None)
+        lock.event.set()
+
+
+class SingleFlightLock(object):
+    """Handle returned by ``SingleFlight.acquire``"""
+
+    def __init__(self, single_flight, key, event):
+        self.single_flight = single_flight
+        self.key = key
+        self.event = event
+        self.token = uuid.uuid4().hex
+        self.is_shared = False
+        self.is_released = False
+
+    def release(self):
+        if not self.is_released:
+            self.is_released = True
+            self.single_flight._release(self)
@@ -37,6 +37,11 @@ class BaseDatasource(AuditMixinNullable, ImportMixin):
 
     name = None  # can be a Column or a property pointing to one
 
+    # Number of the independent queries of a chart (time comparisons,
+    # filter box fields, ...) that can run concurrently, see
+    # ``BaseViz.get_df_payloads``
+    concurrent_queries = 0
+
     # ---------------------------------------------------------------
 
     # Columns
@@ -263,6 +268,35 @@ class BaseDatasource(AuditMixinNullable, ImportMixin):
         """
         raise NotImplementedError()
 
+    def prepare_concurrent_queries(self):
+        """Called before ``query`` gets called from other threads
+
+        This is the place to load whatever ``query`` lazily loads from the
+        database, the session of this object belonging to the current thread.
+        """
+        pass
+
+    def can_query_time_offsets(self, query_obj):
+        """Whether ``query_obj`` can be run for many time offsets at once
+
+        If so, ``query`` accepts a ``time_offsets`` list of timedeltas in
+        the query object. The rows of the time range shifted back by every
+        offset are then returned together, the index of the offset in
+        ``time_offsets`` being in the ``utils.TIME_OFFSET_ALIAS`` column.
+        """
+        return False
+
+    def can_query_grouping_sets(self, query_obj):
+        """Whether ``query_obj`` can be aggregated by each groupby column
+
+        If so, ``query`` accepts ``grouping_sets`` set to True in the query
+        object, returning the rows aggregated by every ``groupby`` column
+        on its own, as ``GROUPING SETS`` would. The index of the column in
+        ``groupby`` is in the ``utils.GROUPING_SET_ALIAS`` column, and the
+        other columns are null. ``row_limit`` applies to every column.
+        """
+        return False
+
     def values_for_column(self, column_name, limit=10000):
         """Given a column, returns an iterable of distinct values
 
@@ -270,6 +304,13 @@ class BaseDatasource(AuditMixinNullable, ImportMixin):
         values in filters in the explore view"""
         raise NotImplementedError()
 
+    def get_fetch_values_predicate(self):
+        """Returns what restricts the values of ``values_for_column``, if any
+
+        The values of columns are cached along with it.
+        """
+        return None
+
     @staticmethod
     def default_query(qry):
         return qry
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""A per-process cache of what Druid clusters run and support
+
+The version of a cluster decides how queries and metadata requests are
+built, but fetching it is an HTTP request to the coordinator. The version,
+the query types it supports and the lookups registered on the cluster are
+kept here for ``DRUID_CAPABILITIES_CACHE_TIMEOUT`` seconds, and reloaded
+when the cluster's datasources are refreshed.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from distutils.version import LooseVersion
+import threading
+import time
+
+# query types along the version they're available from
+QUERY_TYPES = (
+    ('timeseries', '0.0.0'),
+    ('topN', '0.0.0'),
+    ('groupBy', '0.0.0'),
+    ('search', '0.0.0'),
+    ('select', '0.0.0'),
+    ('timeBoundary', '0.0.0'),
+    ('segmentMetadata', '0.0.0'),
+    ('dataSourceMetadata', '0.7.0'),
+    ('scan', '0.11.0'),
+)
+
+
+def get_query_types(version):
+    """Returns the query types supported by that version of Druid"""
+    return [
+        query_type for query_type, since in QUERY_TYPES
+        if LooseVersion(version) >= LooseVersion(since)]
+
+
+class ClusterCapabilitiesCache(object):
+    """Caches the capabilities of clusters for ``timeout`` seconds
+
+    Capabilities are dicts holding the ``version``, ``query_types`` and
+    ``lookups`` of a cluster, along with the time they were ``loaded_at``.
+    They are keyed on the name and coordinator of the cluster.
+    """
+
+    def __init__(self, timeout=3600):
+        self.timeout = timeout
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(cluster):
+        return (
+            cluster.cluster_name, cluster.coordinator_host,
+            cluster.coordinator_port)
+
+    @staticmethod
+    def load(cluster):
+        version = cluster.get_druid_version()
+        return {
+            'version': version,
+            'query_types': get_query_types(version),
+            'lookups': cluster.get_lookups(),
+            'loaded_at': time.time(),
+        }
+
+    def get(self, cluster, force=False):
+        """Returns the capabilities of ``cluster``, loading them if need be"""
+        key = self.get_key(cluster)
+        with self._lock:
+            entry = self._entries.get(key)
+        if (
+                force or entry is None or
+                (self.timeout and time.time() - entry['loaded_at'] > self.timeout)):
+            entry = self.load(cluster)
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+    def get_age(self, cluster):
+        """Seconds since the capabilities were loaded, None if they aren't"""
+        with self._lock:
+            entry = self._entries.get(self.get_key(cluster))
+        if entry is None:
+            return None
+        return time.time() - entry['loaded_at']
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
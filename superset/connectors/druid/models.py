@@ -10,6 +10,7 @@ from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime, timedelta
 from distutils.version import LooseVersion
+import hashlib
 import json
 import logging
 from multiprocessing.pool import ThreadPool
@@ -20,6 +21,8 @@ from flask import escape, Markup
 from flask_appbuilder import Model
 from flask_appbuilder.models.decorators import renders
 from flask_babel import lazy_gettext as _
+import numpy as np
+import pandas as pd
 from pydruid.client import PyDruid
 from pydruid.utils.aggregators import count
 from pydruid.utils.dimensions import MapLookupExtraction, RegexExtraction
@@ -29,15 +32,16 @@ from pydruid.utils.postaggregator import (
     Const, Field, HyperUniqueCardinality, Postaggregator, Quantile, Quantiles,
 )
 import requests
-from six import string_types
+from six import string_types, text_type
 import sqlalchemy as sa
 from sqlalchemy import (
     Boolean, Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint,
 )
 from sqlalchemy.orm import backref, relationship
 
-from superset import conf, db, import_util, security_manager, utils
+from superset import cache, conf, db, import_util, security_manager, utils
 from superset.connectors.base.models import BaseColumn, BaseDatasource, BaseMetric
+from superset.connectors.druid.capabilities import ClusterCapabilitiesCache
 from superset.exceptions import MetricPermException, SupersetException
 from superset.models.helpers import (
     AuditMixinNullable, ImportMixin, QueryResult, set_perm,
@@ -49,6 +53,9 @@ from superset.utils import (
 DRUID_TZ = conf.get('DRUID_TZ')
 POST_AGG_TYPE = 'postagg'
 
+capabilities_cache = ClusterCapabilitiesCache(
+    timeout=conf.get('DRUID_CAPABILITIES_CACHE_TIMEOUT'))
+
 
 # Function wrapper because bound methods cannot
 # be passed to processes
@@ -113,6 +120,7 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
             'id': self.id,
             'name': self.cluster_name,
             'backend': 'druid',
+            'capabilities_age': capabilities_cache.get_age(self),
         }
 
     @staticmethod
@@ -143,10 +151,28 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
             self.coordinator_host, self.coordinator_port) + '/status'
         return json.loads(requests.get(endpoint).text)['version']
 
+    def get_lookups(self, tier='__default'):
+        """Returns the names of the lookups of a tier, [] if unavailable"""
+        endpoint = self.get_base_url(
+            self.coordinator_host, self.coordinator_port)
+        endpoint += '/druid/coordinator/v1/lookups/config/' + tier
+        try:
+            response = requests.get(endpoint, timeout=10)
+            response.raise_for_status()
+            return sorted(json.loads(response.text))
+        except Exception as e:
+            logging.warning(
+                'Could not fetch the lookups of cluster [{}]: {}'.format(
+                    self.cluster_name, e))
+            return []
+
+    def get_capabilities(self, force=False):
+        """Returns the cached ``version``, ``query_types`` and ``lookups``"""
+        return capabilities_cache.get(self, force=force)
+
     @property
-    @utils.memoized
     def druid_version(self):
-        return self.get_druid_version()
+        return self.get_capabilities()['version']
 
     def refresh_datasources(
             self,
@@ -156,6 +182,7 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
         """Refresh metadata of all datasources in the cluster
         If ``datasource_name`` is specified, only that datasource is updated
         """
+        self.get_capabilities(force=True)
         ds_list = self.get_datasources()
         blacklist = conf.get('DRUID_DATA_SOURCE_BLACKLIST', [])
         ds_refresh = []
@@ -493,6 +520,14 @@ class DruidDatasource(Model, BaseDatasource):
     export_parent = 'cluster'
     export_children = ['columns', 'metrics']
 
+    @property
+    def concurrent_queries(self):
+        return conf.get('DRUID_QUERY_WORKERS') or 0
+
+    def prepare_concurrent_queries(self):
+        for attr in ('cluster', 'columns', 'metrics'):
+            getattr(self, attr)
+
     @property
     def database(self):
         return self.cluster
@@ -940,9 +975,50 @@ class DruidDatasource(Model, BaseDatasource):
         df = client.export_pandas()
         return [row[column_name] for row in df.to_records(index=False)]
 
+    def get_fetch_values_predicate(self):
+        return self.fetch_values_from
+
     def get_query_str(self, query_obj, phase=1, client=None):
         return self.run_query(client=client, phase=phase, **query_obj)
 
+    @staticmethod
+    def run_pre_query(client, query_type, pre_qry, force=False):
+        """Runs the first phase of a two-phase query and returns its result
+
+        The result only holds the top dimension values, and phase 1 queries
+        always use the ``all`` granularity, so it is cached for
+        ``DRUID_PREQUERY_CACHE_TIMEOUT`` seconds and reused by the phase 2
+        queries that only differ by their granularity. The cached result
+        isn't read when ``force`` is set, it is replaced.
+        """
+        timeout = conf.get('DRUID_PREQUERY_CACHE_TIMEOUT')
+        if not cache or not timeout:
+            getattr(client, query_type)(**pre_qry)
+            return client.export_pandas()
+
+        # building the query doesn't send it, it sets the query_builder's
+        # last_query which is used to display the query either way
+        query = getattr(client.query_builder, query_type)(pre_qry)
+        cache_key = 'druid_pre_query_' + hashlib.md5(json.dumps(
+            [client.url, client.endpoint, query.query_dict],
+            sort_keys=True,
+            default=str,
+        ).encode('utf-8')).hexdigest()
+        stats_logger = conf.get('STATS_LOGGER')
+        df = None if force else cache.get(cache_key)
+        if df is not None:
+            stats_logger.incr('druid_pre_query_loaded_from_cache')
+            return df
+
+        getattr(client, query_type)(**pre_qry)
+        df = client.export_pandas()
+        try:
+            cache.set(cache_key, df, timeout=timeout)
+        except Exception as e:
+            logging.warning('Could not cache key {}'.format(cache_key))
+            logging.exception(e)
+        return df
+
     def _add_filter_from_pre_query_data(self, df, dimensions, dim_filter):
         ret = dim_filter
         if df is not None and not df.empty:
@@ -1111,8 +1187,11 @@ class DruidDatasource(Model, BaseDatasource):
             order_desc=True,
             prequeries=None,
             is_prequery=False,
+            force=False,
         ):
         """Runs a query against Druid and returns a dataframe.
+
+        The result of phase 1 queries is cached unless ``force`` is set.
         """
         # TODO refactor into using a TBD Query object
         client = client or self.cluster.get_pydruid_client()
@@ -1134,7 +1213,7 @@ class DruidDatasource(Model, BaseDatasource):
 
         if (
             self.cluster and
-            LooseVersion(self.cluster.get_druid_version()) < LooseVersion('0.11.0')
+            LooseVersion(self.cluster.druid_version) < LooseVersion('0.11.0')
         ):
             for metric in metrics:
                 self.sanitize_metric_object(metric)
@@ -1214,7 +1293,10 @@ class DruidDatasource(Model, BaseDatasource):
             pre_qry['dimension'] = self._dimensions_to_values(qry.get('dimensions'))[0]
             del pre_qry['dimensions']
 
-            client.topn(**pre_qry)
+            if phase == 1:
+                client.topn(**pre_qry)
+            else:
+                df = self.run_pre_query(client, 'topn', pre_qry, force=force)
             logging.info('Phase 1 Complete')
             if phase == 2:
                 query_str += '// Two phase query\n// Phase 1\n'
@@ -1225,7 +1307,6 @@ class DruidDatasource(Model, BaseDatasource):
                 return query_str
             query_str += (
                 "// Phase 2 (built based on phase one's results)\n")
-            df = client.export_pandas()
             qry['filter'] = self._add_filter_from_pre_query_data(
                 df,
                 [pre_qry['dimension']],
@@ -1286,7 +1367,10 @@ class DruidDatasource(Model, BaseDatasource):
                         'direction': order_direction,
                     }],
                 }
-                client.groupby(**pre_qry)
+                if phase == 1:
+                    client.groupby(**pre_qry)
+                else:
+                    df = self.run_pre_query(client, 'groupby', pre_qry, force=force)
                 logging.info('Phase 1 Complete')
                 query_str += '// Two phase query\n// Phase 1\n'
                 query_str += json.dumps(
@@ -1296,7 +1380,6 @@ class DruidDatasource(Model, BaseDatasource):
                     return query_str
                 query_str += (
                     "// Phase 2 (built based on phase one's results)\n")
-                df = client.export_pandas()
                 qry['filter'] = self._add_filter_from_pre_query_data(
                     df,
                     pre_qry['dimensions'],
@@ -1335,9 +1418,30 @@ class DruidDatasource(Model, BaseDatasource):
         str instead of an object.
         """
         for col in groupby_cols:
-            df[col] = df[col].fillna('<NULL>').astype('unicode')
+            # only the distinct values are converted, and shared by the rows
+            codes, uniques = pd.factorize(df[col])
+            values = np.array(
+                [text_type(v) for v in uniques] + ['<NULL>'], dtype=object)
+            df[col] = values[codes]
         return df
 
+    @staticmethod
+    def offset_timestamps(timestamps, time_offset):
+        """Parses the timestamps of a result and shifts them by ``time_offset``
+
+        The timestamps are read as ``DRUID_TZ`` times, ``time_offset`` is in
+        milliseconds.
+        """
+        try:
+            # Druid returns ISO 8601 UTC times, which pandas parses natively
+            dttms = pd.to_datetime(timestamps, utc=True).dt.tz_localize(None)
+        except (TypeError, ValueError):
+            # row by row, for timestamps of another format
+            dttms = pd.to_datetime(
+                timestamps.map(lambda ts: dparse(ts).replace(tzinfo=None)))
+        return (
+            dttms.dt.tz_localize(DRUID_TZ) + timedelta(milliseconds=time_offset))
+
     def query(self, query_obj):
         qry_start_dttm = datetime.now()
         client = self.cluster.get_pydruid_client()
@@ -1374,13 +1478,8 @@ class DruidDatasource(Model, BaseDatasource):
         df = df[cols]
 
         time_offset = DruidDatasource.time_offset(query_obj['granularity'])
-
-        def increment_timestamp(ts):
-            dt = utils.parse_human_datetime(ts).replace(
-                tzinfo=DRUID_TZ)
-            return dt + timedelta(milliseconds=time_offset)
         if DTTM_ALIAS in df.columns and time_offset:
-            df[DTTM_ALIAS] = df[DTTM_ALIAS].apply(increment_timestamp)
+            df[DTTM_ALIAS] = self.offset_timestamps(df[DTTM_ALIAS], time_offset)
 
         return QueryResult(
             df=df,
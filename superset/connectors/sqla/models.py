@@ -20,11 +20,15 @@ from sqlalchemy import (
 from sqlalchemy.orm import backref, relationship
 from sqlalchemy.schema import UniqueConstraint
 from sqlalchemy.sql import column, literal_column, table, text
+from sqlalchemy.sql.elements import Label
 from sqlalchemy.sql.expression import TextAsFrom
 import sqlparse
 
 from superset import app, db, import_util, security_manager, utils
 from superset.connectors.base.models import BaseColumn, BaseDatasource, BaseMetric
+from superset.connectors.sqla import query_cache as query_cache_util
+from superset.connectors.sqla.values import Values
+from superset.db_engine_specs import TopGroupsFilter
 from superset.jinja_context import get_template_processor
 from superset.models.annotations import Annotation
 from superset.models.core import Database
@@ -33,6 +37,10 @@ from superset.models.helpers import set_perm
 from superset.utils import DTTM_ALIAS, QueryStatus
 
 config = app.config
+query_cache = query_cache_util.CompiledQueryCache(
+    max_size=config.get('SQLA_QUERY_CACHE_SIZE'),
+    stats_logger=config.get('STATS_LOGGER'),
+)
 
 
 class AnnotationDatasource(BaseDatasource):
@@ -158,6 +166,8 @@ class TableColumn(Model, BaseColumn):
         If database_expression is not empty, the internal dttm
         will be parsed as the sql sentence for the database to convert
         """
+        if isinstance(dttm, query_cache_util.TimeBound):
+            return dttm.render(self.column_name)
         tf = self.python_date_format
         if self.database_expression:
             return self.database_expression.format(dttm.strftime('%Y-%m-%d %H:%M:%S'))
@@ -429,9 +439,9 @@ class SqlaTable(Model, BaseDatasource):
         if limit:
             qry = qry.limit(limit)
 
-        if self.fetch_values_predicate:
-            tp = self.get_template_processor()
-            qry = qry.where(tp.process_template(self.fetch_values_predicate))
+        fetch_values_predicate = self.get_fetch_values_predicate()
+        if fetch_values_predicate:
+            qry = qry.where(fetch_values_predicate)
 
         engine = self.database.get_sqla_engine()
         sql = '{}'.format(
@@ -442,6 +452,11 @@ class SqlaTable(Model, BaseDatasource):
         df = pd.read_sql_query(sql=sql, con=engine)
         return [row[0] for row in df.to_records(index=False)]
 
+    def get_fetch_values_predicate(self):
+        if self.fetch_values_predicate:
+            tp = self.get_template_processor()
+            return tp.process_template(self.fetch_values_predicate)
+
     def mutate_query_from_config(self, sql):
         """Apply config's SQL_QUERY_MUTATOR
 
@@ -456,11 +471,57 @@ class SqlaTable(Model, BaseDatasource):
         return get_template_processor(
             table=self, database=self.database, **kwargs)
 
-    def get_query_str(self, query_obj):
-        qry = self.get_sqla_query(**query_obj)
+    def get_query_cache_key(self, query_obj):
+        """Returns the key of the compiled query in ``query_cache``
+
+        None is returned for queries that can't be cached: the ones using
+        Jinja templates, whose rendering can depend on the request, and the
+        ones running a prequery to fetch the top groups.
+        """
+        if not query_cache.max_size:
+            return None
+        extras = query_obj.get('extras') or {}
+        templates = [self.sql, extras.get('where'), extras.get('having')]
+        if any('{{' in t or '{%' in t for t in templates if t):
+            return None
+        if self.uses_top_groups_prequery(query_obj):
+            return None
+        fingerprint = [
+            self.changed_on,
+            self.database_id,
+            self.database.changed_on,
+            [(c.id, c.changed_on) for c in self.columns],
+            [(m.id, m.changed_on) for m in self.metrics],
+        ]
+        return query_cache.get_key(self.id, fingerprint, query_obj)
+
+    def compile_query(self, query_obj):
+        if query_obj.get('time_offsets'):
+            qry = self.get_time_offsets_query(**query_obj)
+        elif query_obj.get('grouping_sets'):
+            qry = self.get_grouping_sets_query(**query_obj)
+        else:
+            qry = self.get_sqla_query(**query_obj)
         sql = self.database.compile_sqla_query(qry)
         logging.info(sql)
-        sql = sqlparse.format(sql, reindent=True)
+        return sqlparse.format(sql, reindent=True)
+
+    def get_query_str(self, query_obj):
+        cache_key = self.get_query_cache_key(query_obj)
+        if cache_key:
+            entry = query_cache.get(cache_key)
+            if entry is None:
+                template_query_obj, rendered = (
+                    query_cache_util.get_template_query_obj(query_obj))
+                entry = (self.compile_query(template_query_obj), rendered)
+                query_cache.set(cache_key, entry)
+            template, rendered = entry
+            cols = {col.column_name: col for col in self.columns}
+            sql = query_cache_util.render_time_bounds(
+                template, rendered, query_obj,
+                lambda column_name, dttm: cols[column_name].dttm_sql_literal(dttm))
+        else:
+            sql = self.compile_query(query_obj)
         if query_obj['is_prequery']:
             query_obj['prequeries'].append(sql)
         sql = self.mutate_query_from_config(sql)
@@ -528,6 +589,7 @@ class SqlaTable(Model, BaseDatasource):
             order_desc=True,
             prequeries=None,
             is_prequery=False,
+            force=False,
         ):
         """Querying any sqla table from this common interface"""
         template_kwargs = {
@@ -748,22 +810,160 @@ class SqlaTable(Model, BaseDatasource):
                 }
                 result = self.query(subquery_obj)
                 dimensions = [c for c in result.df.columns if c not in metrics]
-                top_groups = self._get_top_groups(result.df, dimensions)
-                qry = qry.where(top_groups)
+                groups = self._get_top_groups_rows(result.df, dimensions)
+                if (
+                        db_engine_spec.top_groups_filter == TopGroupsFilter.VALUES and
+                        len(dimensions) > 1 and groups and
+                        not any(None in group for group in groups)):
+                    tbl = self._join_top_groups(tbl, groups, dimensions)
+                else:
+                    qry = qry.where(self._get_top_groups(groups, dimensions))
 
         return qry.select_from(tbl)
 
-    def _get_top_groups(self, df, dimensions):
+    def uses_top_groups_prequery(self, query_obj):
+        """Whether ``get_sqla_query`` runs a prequery for the top groups"""
+        db_engine_spec = self.database.db_engine_spec
+        return bool(
+            query_obj.get('is_timeseries', True) and
+            query_obj.get('timeseries_limit', 15) and
+            query_obj.get('groupby') and
+            not db_engine_spec.time_groupby_inline and
+            not db_engine_spec.inner_joins)
+
+    def can_query_time_offsets(self, query_obj):
+        # the prequery would run once per offset
+        return (
+            not self.uses_top_groups_prequery(query_obj) and
+            self.database.db_engine_spec.allows_subquery)
+
+    def get_time_offsets_query(self, time_offsets, **query_obj):
+        """Returns the UNION ALL of the query shifted by each time offset
+
+        All the shifted queries keep the unshifted inner time range, which
+        is the one series limits are computed on.
+        """
+        from_dttm = query_obj['from_dttm']
+        to_dttm = query_obj['to_dttm']
+        query_obj['inner_from_dttm'] = query_obj.get('inner_from_dttm') or from_dttm
+        query_obj['inner_to_dttm'] = query_obj.get('inner_to_dttm') or to_dttm
+        qries = []
+        for i, offset in enumerate(time_offsets):
+            query_obj['from_dttm'] = from_dttm - offset
+            query_obj['to_dttm'] = to_dttm - offset
+            qry = self.get_sqla_query(**query_obj).alias('offset_{}'.format(i))
+            qries.append(select([
+                literal_column('{}'.format(i)).label(utils.TIME_OFFSET_ALIAS),
+                qry,
+            ]))
+        return sa.union_all(*qries)
+
+    def can_query_grouping_sets(self, query_obj):
+        db_engine_spec = self.database.db_engine_spec
+        return bool(
+            len(query_obj.get('groupby') or []) > 1 and
+            not query_obj.get('is_timeseries', True) and
+            not query_obj.get('columns') and
+            (db_engine_spec.supports_grouping_sets or
+             db_engine_spec.allows_subquery))
+
+    def get_grouping_sets_query(self, grouping_sets, **query_obj):
+        """Returns the query aggregated by each of its groupby columns
+
+        Engines supporting it run a single ``GROUPING SETS`` query, ranking
+        rows within each set to apply ``row_limit``. The other ones run a
+        UNION ALL of one query per groupby column.
+        """
+        groupby = query_obj['groupby']
+        row_limit = query_obj.get('row_limit')
+        if not self.database.db_engine_spec.supports_grouping_sets:
+            qries = []
+            for i, name in enumerate(groupby):
+                qry = self.get_sqla_query(**dict(query_obj, groupby=[name]))
+                qry = qry.alias('groupby_{}'.format(i))
+                exprs = [literal_column('{}'.format(i)).label(utils.GROUPING_SET_ALIAS)]
+                exprs += [
+                    qry.c[gb] if gb == name else sa.null().label(gb)
+                    for gb in groupby]
+                exprs += [c for c in qry.c if c.name != name]
+                qries.append(select(exprs))
+            return sa.union_all(*qries)
+
+        def unlabeled(expr):
+            return expr.element if isinstance(expr, Label) else expr
+
         cols = {col.column_name: col for col in self.columns}
-        groups = []
-        for unused, row in df.iterrows():
-            group = []
-            for dimension in dimensions:
-                col_obj = cols.get(dimension)
-                group.append(col_obj.sqla_col == row[dimension])
-            groups.append(and_(*group))
+        groupby_exprs = [unlabeled(cols[name].sqla_col) for name in groupby]
+        qry = self.get_sqla_query(**dict(query_obj, row_limit=None))
+        # the main metric follows the groupby columns in the select clause
+        select_exprs = list(qry.inner_columns)
+        if len(select_exprs) > len(groupby):
+            main_metric_expr = unlabeled(select_exprs[len(groupby)])
+        else:
+            main_metric_expr = literal_column('COUNT(*)')
+        direction = desc if query_obj.get('order_desc', True) else asc
+        groupings = [sa.func.grouping(expr) for expr in groupby_exprs]
+        qry = (
+            qry
+            .group_by(None)
+            .order_by(None)
+            .group_by(sa.func.grouping_sets(
+                *[sa.tuple_(expr) for expr in groupby_exprs]))
+            .column(sa.case([
+                (grouping == 0, literal_column('{}'.format(i)))
+                for i, grouping in enumerate(groupings)
+            ]).label(utils.GROUPING_SET_ALIAS))
+            .column(sa.func.row_number().over(
+                partition_by=groupings,
+                order_by=direction(main_metric_expr),
+            ).label('grouping_set_rank__'))
+        ).alias('grouping_sets')
+        outer = select([c for c in qry.c if c.name != 'grouping_set_rank__'])
+        if row_limit:
+            outer = outer.where(qry.c.grouping_set_rank__ <= row_limit)
+        return outer
+
+    @staticmethod
+    def _get_top_groups_rows(df, dimensions):
+        """Returns the values of ``dimensions`` as tuples, nulls as None"""
+        values = df[dimensions].astype(object)
+        values = values.where(pd.notnull(values), None)
+        return list(zip(*[values[dimension].tolist() for dimension in dimensions]))
 
-        return or_(*groups)
+    def _get_top_groups(self, groups, dimensions):
+        """Returns the clause filtering on ``groups``, tuples of dimension values
+
+        The groups are matched as ``top_groups_filter`` of the engine spec
+        says, the ones holding nulls with ``IS NULL``.
+        """
+        cols = {col.column_name: col for col in self.columns}
+        sqla_cols = [cols.get(dimension).sqla_col for dimension in dimensions]
+        null_groups = [group for group in groups if None in group]
+        groups = [group for group in groups if None not in group]
+
+        strategy = self.database.db_engine_spec.top_groups_filter
+        clauses = []
+        if groups and len(sqla_cols) == 1:
+            clauses.append(sqla_cols[0].in_([group[0] for group in groups]))
+        elif groups and strategy in (
+                TopGroupsFilter.TUPLE_IN, TopGroupsFilter.VALUES):
+            clauses.append(sa.tuple_(*sqla_cols).in_(groups))
+        else:
+            null_groups = groups + null_groups
+        for group in null_groups:
+            clauses.append(and_(*[
+                sqla_col == value for sqla_col, value in zip(sqla_cols, group)]))
+        return or_(*clauses)
+
+    def _join_top_groups(self, tbl, groups, dimensions):
+        """Joins ``tbl`` with the groups, as a ``VALUES`` derived table"""
+        cols = {col.column_name: col for col in self.columns}
+        values = Values(
+            'top_groups__', [dimension + '__' for dimension in dimensions], groups)
+        on_clause = [
+            cols[dimension].sqla_col == values.c[dimension + '__']
+            for dimension in dimensions]
+        return tbl.join(values, and_(*on_clause))
 
     def query(self, query_obj):
         qry_start_dttm = datetime.now()
@@ -889,5 +1089,21 @@ class SqlaTable(Model, BaseDatasource):
         return qry.filter_by(is_sqllab_view=False)
 
 
+def invalidate_table_queries(mapper, connection, target):
+    query_cache.invalidate(target.id)
+
+
+def invalidate_table_child_queries(mapper, connection, target):
+    query_cache.invalidate(target.table_id)
+
+
 sa.event.listen(SqlaTable, 'after_insert', set_perm)
 sa.event.listen(SqlaTable, 'after_update', set_perm)
+sa.event.listen(SqlaTable, 'after_update', invalidate_table_queries)
+sa.event.listen(SqlaTable, 'after_delete', invalidate_table_queries)
+sa.event.listen(TableColumn, 'after_insert', invalidate_table_child_queries)
+sa.event.listen(TableColumn, 'after_update', invalidate_table_child_queries)
+sa.event.listen(TableColumn, 'after_delete', invalidate_table_child_queries)
+sa.event.listen(SqlMetric, 'after_insert', invalidate_table_child_queries)
+sa.event.listen(SqlMetric, 'after_update', invalidate_table_child_queries)
+sa.event.listen(SqlMetric, 'after_delete', invalidate_table_child_queries)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""A per-process cache of the SQL compiled for SqlaTable queries
+
+Building the SQLAlchemy select in ``SqlaTable.get_sqla_query`` and
+compiling it with literal binds is pure Python work that is repeated for
+every chart of every dashboard load. The compiled (and reformatted) SQL is
+kept here, keyed on the normalized query object and on the modification
+times of the table, its columns, its metrics and its database.
+
+Time bounds aren't part of the key: relative time ranges yield new bounds
+every second. The SQL is compiled with a marker in place of each rendered
+time bound, the markers being replaced by the bounds of the query object
+when it runs.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+
+# query object keys that don't change the SQL of a query
+IGNORED_KEYS = ('prequeries', 'is_prequery', 'force')
+# query object keys holding datetimes rendered through TimeBound markers
+TIME_BOUNDS = ('from_dttm', 'to_dttm', 'inner_from_dttm', 'inner_to_dttm')
+
+TIME_BOUND_MARKER = '__superset_time_bound_{}__'
+TIME_BOUND_MARKER_RE = re.compile(r'__superset_time_bound_([0-9]+)__')
+
+
+class TimeBound(object):
+    """Stands for a time bound of the query object while compiling
+
+    ``render`` records which column renders the bound, shifted by which
+    offset, and returns the marker to put in the SQL in its place.
+    """
+
+    def __init__(self, name, rendered, offset=None):
+        self.name = name
+        self.rendered = rendered
+        self.offset = offset
+
+    def __sub__(self, offset):
+        if self.offset is not None:
+            offset = self.offset + offset
+        return TimeBound(self.name, self.rendered, offset)
+
+    def render(self, column_name):
+        self.rendered.append((column_name, self.name, self.offset))
+        return TIME_BOUND_MARKER.format(len(self.rendered) - 1)
+
+
+def get_template_query_obj(query_obj):
+    """Returns ``query_obj`` with ``TimeBound`` objects for its time bounds
+
+    along with the list they record their renderings to.
+    """
+    rendered = []
+    query_obj = dict(query_obj)
+    for name in TIME_BOUNDS:
+        if query_obj.get(name):
+            query_obj[name] = TimeBound(name, rendered)
+    return query_obj, rendered
+
+
+def render_time_bounds(sql, rendered, query_obj, render):
+    """Replaces the markers of ``sql`` with the bounds of ``query_obj``
+
+    :param render: callable rendering a datetime as a SQL literal for a
+        column, given the column name and the datetime
+    """
+    def replace(match):
+        column_name, name, offset = rendered[int(match.group(1))]
+        dttm = query_obj[name]
+        if offset is not None:
+            dttm = dttm - offset
+        return render(column_name, dttm)
+    return TIME_BOUND_MARKER_RE.sub(replace, sql)
+
+
+class CompiledQueryCache(object):
+    """An LRU cache of compiled SQL statements
+
+    :param max_size: number of statements kept around, 0 disables the cache
+    """
+
+    def __init__(self, max_size=1000, stats_logger=None):
+        self.max_size = max_size
+        self.stats_logger = stats_logger
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query_obj(query_obj):
+        query_obj = {
+            k: v for k, v in query_obj.items() if k not in IGNORED_KEYS}
+        # only whether the bounds are set changes the SQL
+        for name in TIME_BOUNDS:
+            if name in query_obj:
+                query_obj[name] = bool(query_obj[name])
+        # filters missing a column or an operator are skipped when querying
+        query_obj['filter'] = [
+            flt for flt in query_obj.get('filter') or []
+            if flt.get('col') and flt.get('op')]
+        return query_obj
+
+    @classmethod
+    def get_key(cls, datasource_id, fingerprint, query_obj):
+        """Returns the cache key of ``query_obj``
+
+        ``fingerprint`` describes the state of the datasource, any change
+        to it yields a different key.
+        """
+        blob = json.dumps(
+            [fingerprint, cls.normalize_query_obj(query_obj)],
+            sort_keys=True, default=str)
+        return (datasource_id, hashlib.md5(blob.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        with self._lock:
+            sql = self._entries.pop(key, None)
+            if sql is not None:
+                self._entries[key] = sql
+        if self.stats_logger:
+            self.stats_logger.incr(
+                'sqla_query_cache.{}'.format('miss' if sql is None else 'hit'))
+        return sql
+
+    def set(self, key, sql):
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+            self._entries[key] = sql
+
+    def invalidate(self, datasource_id):
+        """Drops the statements of a datasource"""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == datasource_id:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""A ``VALUES`` derived table, which SQLAlchemy doesn't provide"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sqlalchemy as sa
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import column, TableClause
+
+
+class Values(TableClause):
+    """Rows of literals usable in FROM clauses and joins, rendered as::
+
+        (VALUES (1, 'x'), (2, 'y')) AS name (col_1, col_2)
+    """
+
+    def __init__(self, name, column_names, rows):
+        super(Values, self).__init__(name, *[column(c) for c in column_names])
+        self.rows = [tuple(row) for row in rows]
+
+
+@compiles(Values)
+def compile_values(element, compiler, **kw):
+    kw.pop('asfrom', None)
+    rows = ', '.join(
+        '({})'.format(', '.join(
+            compiler.process(sa.literal(value), **kw) for value in row))
+        for row in element.rows)
+    quote = compiler.preparer.quote
+    return '(VALUES {}) AS {} ({})'.format(
+        rows,
+        quote(element.name),
+        ', '.join(quote(c.name) for c in element.columns))
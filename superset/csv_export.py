@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Streaming CSV exports
+
+The rows to export are read as an iterable of DataFrames (chunks fetched
+from a cursor, pages of stored results, slices of a DataFrame) and each of
+them is written as CSV on its own, so the memory used by an export depends
+on the chunk size rather than on the number of rows.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import zlib
+
+import pandas as pd
+from six import text_type
+
+from superset.exceptions import SupersetException
+
+
+def dataframe_chunks(df, chunk_size):
+    """Yields slices of at most ``chunk_size`` rows of ``df``
+
+    Empty DataFrames are yielded as is so that their header is written.
+    """
+    if df.empty or not chunk_size:
+        yield df
+        return
+    for start in range(0, len(df.index), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def conform_dtypes(df, dtypes):
+    """Writes the numeric columns of ``df`` the way ``dtypes`` would
+
+    The dtypes of every chunk are inferred on their own: an integer column
+    turns into floats in the chunks where it holds nulls. Such columns keep
+    their integers, and the nulls are left empty, when the first chunk had
+    integers, and integer columns are turned into floats when the first
+    chunk had floats.
+    """
+    df = df.copy(deep=False)
+    for col, dtype in dtypes.items():
+        if col not in df.columns:
+            continue
+        kind = df[col].dtype.kind
+        if dtype.kind in 'iu' and kind == 'f':
+            df[col] = pd.Series(
+                [None if pd.isnull(v) else int(v) for v in df[col]],
+                index=df.index, dtype=object)
+        elif dtype.kind == 'f' and kind in 'iu':
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def iter_csv(chunks, index=False, **kwargs):
+    """Yields the CSV text of every DataFrame of ``chunks``
+
+    The header is only written for the first one, ``kwargs`` are passed to
+    ``DataFrame.to_csv``. The numeric columns of the following ones are
+    written with the dtypes of the first one, see ``conform_dtypes``.
+    """
+    kwargs.pop('header', None)
+    dtypes = None
+    for df in chunks:
+        if dtypes is None:
+            dtypes = df.dtypes
+            header = True
+        else:
+            df = conform_dtypes(df, dtypes)
+            header = False
+        yield df.to_csv(index=index, header=header, **kwargs)
+
+
+def iter_gzip(chunks, encoding='utf-8', compresslevel=6):
+    """Compresses a stream of text or bytes into a stream of gzip bytes"""
+    compressor = zlib.compressobj(
+        compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, text_type):
+            chunk = chunk.encode(encoding)
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def records_chunks(pages, columns):
+    """Turns pages of records (lists of rows or of dicts) into DataFrames
+
+    Pages are None when they couldn't be read, which fails the export
+    rather than silently truncating it.
+    """
+    empty = True
+    for page, records in enumerate(pages):
+        if records is None:
+            raise SupersetException(
+                'Page {} of the results could not be retrieved'.format(page))
+        if not records:
+            continue
+        empty = False
+        yield pd.DataFrame.from_records(records, columns=columns)
+    if empty:
+        yield pd.DataFrame(columns=columns)
@@ -12,14 +12,16 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from collections import Counter, OrderedDict
 from datetime import date, datetime
 import logging
+from operator import itemgetter
 
 import numpy as np
 import pandas as pd
-from pandas.core.common import _maybe_box_datetimelike
 from pandas.core.dtypes.dtypes import ExtensionDtype
 from past.builtins import basestring
+from six import integer_types
 
 from superset.utils import JS_MAX_INTEGER
 
@@ -77,9 +79,8 @@ class SupersetDataFrame(object):
         self.column_names = dedup(column_names,
                                   case_sensitive=case_sensitive)
 
-        data = data or []
-        self.df = (
-            pd.DataFrame(list(data), columns=self.column_names).infer_objects())
+        data = list(data or [])
+        self.df = self.build_df(data, self.column_names)
 
         self._type_dict = {}
         try:
@@ -92,24 +93,140 @@ class SupersetDataFrame(object):
         except Exception as e:
             logging.exception(e)
 
+    @classmethod
+    def sample_indexes(cls, size, sample_size=INFER_COL_TYPES_SAMPLE_SIZE):
+        """Positions of up to ``sample_size`` rows spread evenly over the data
+
+        Unlike a random sample, this covers the head, the middle and the
+        tail of sorted results and is stable across calls.
+        """
+        if size <= sample_size:
+            return list(range(size))
+        return np.linspace(0, size - 1, num=sample_size).astype(int).tolist()
+
+    @classmethod
+    def build_df(cls, data, column_names):
+        """Builds the DataFrame one column at a time
+
+        The kind of each column is guessed from a sample of its values so
+        that numeric, boolean and string columns are loaded straight into
+        numpy arrays, without first building an object DataFrame of the
+        whole result. Columns the sample can't vouch for go through the
+        usual pandas inference.
+        """
+        if (
+                not data or not column_names or
+                isinstance(data[0], dict) or
+                set(map(len, data)) != {len(column_names)}):
+            return pd.DataFrame(data, columns=column_names).infer_objects()
+
+        indexes = cls.sample_indexes(len(data))
+        columns = OrderedDict()
+        for i, name in enumerate(column_names):
+            values = list(map(itemgetter(i), data))
+            sample = [values[j] for j in indexes]
+            columns[name] = cls.build_column(values, sample)
+        return pd.DataFrame(columns, columns=column_names)
+
+    @classmethod
+    def build_column(cls, values, sample):
+        kinds = {cls.value_kind(v) for v in sample}
+        if 'S' in kinds:
+            # a single string keeps the whole column as objects
+            return np.array(values, dtype=object)
+        if kinds == {'b'} or kinds <= {'i', 'f'}:
+            # the sample may have missed values of other types, in which
+            # case numpy doesn't come up with the expected dtype
+            try:
+                arr = np.array(values)
+            except ValueError:
+                arr = None
+            if arr is not None and arr.ndim == 1:
+                if kinds == {'b'} and arr.dtype.kind == 'b':
+                    return arr
+                if kinds != {'b'} and arr.dtype.kind in 'iuf':
+                    return arr
+        return pd.Series(values).infer_objects()
+
+    @staticmethod
+    def value_kind(v):
+        if v is None:
+            return None
+        if isinstance(v, bool):
+            return 'b'
+        if isinstance(v, integer_types):
+            return 'i'
+        if isinstance(v, float):
+            return 'f'
+        if isinstance(v, basestring):
+            return 'S'
+        return 'O'
+
     @property
     def size(self):
         return len(self.df.index)
 
     @property
     def data(self):
-        # work around for https://github.com/pandas-dev/pandas/issues/18372
-        data = [dict((k, _maybe_box_datetimelike(v))
-                for k, v in zip(self.df.columns, np.atleast_1d(row)))
-                for row in self.df.values]
-        for d in data:
-            for k, v in list(d.items()):
-                # if an int is too big for Java Script to handle
-                # convert it to a string
-                if isinstance(v, int):
-                    if abs(v) > JS_MAX_INTEGER:
-                        d[k] = str(v)
-        return data
+        return self.get_data()
+
+    def get_data(self, orient='records'):
+        return self.df_data(self.df, orient)
+
+    @classmethod
+    def df_data(cls, df, orient='records'):
+        """Returns the content of a DataFrame as JSON serializable values
+
+        Conversion happens column by column: datetimes are boxed into
+        Timestamps and integers too big for JavaScript are turned into
+        strings without looping over every cell in Python.
+
+        :param orient: ``records`` returns a list of dicts, one per row.
+            ``columns`` returns ``{'columns': [...], 'data': {col: [...]}}``,
+            which is cheaper to build and to serialize for large results
+        """
+        columns = list(df.columns)
+        values = [cls.column_values(df.iloc[:, i]) for i in range(len(columns))]
+        if orient == 'columns':
+            return {
+                'columns': columns,
+                'data': dict(zip(columns, values)),
+            }
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    @staticmethod
+    def column_values(series):
+        """Converts a column of a DataFrame into a list"""
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+            values = series.values
+            # if an int is too big for JavaScript to handle convert it
+            # to a string
+            too_big = values > JS_MAX_INTEGER
+            if dtype.kind == 'i':
+                too_big |= values < -JS_MAX_INTEGER
+            if too_big.any():
+                boxed = values.astype(object)
+                boxed[too_big] = [str(v) for v in values[too_big].tolist()]
+                return boxed.tolist()
+            return values.tolist()
+        if isinstance(dtype, np.dtype) and dtype.kind in 'bf':
+            return series.values.tolist()
+        if isinstance(dtype, np.dtype) and dtype.kind == 'O':
+            values = series.values.tolist()
+            inferred = pd.api.types.infer_dtype(values, skipna=True)
+            if inferred not in ('string', 'unicode', 'empty'):
+                values = [
+                    str(v) if (
+                        isinstance(v, integer_types) and
+                        not isinstance(v, bool) and
+                        abs(v) > JS_MAX_INTEGER) else v
+                    for v in values
+                ]
+            return values
+        # datetimes, timedeltas and extension types are boxed into pandas
+        # (or python) objects
+        return series.astype(object).tolist()
 
     @classmethod
     def db_type(cls, dtype):
@@ -132,6 +249,34 @@ class SupersetDataFrame(object):
                 continue
         return 100 * success / total
 
+    @classmethod
+    def object_type(cls, v):
+        """Returns the generic database type of a python value"""
+        if isinstance(v, basestring):
+            return 'STRING'
+        elif isinstance(v, int):
+            return 'INT'
+        elif isinstance(v, float):
+            return 'FLOAT'
+        elif isinstance(v, (datetime, date)):
+            return 'DATETIME'
+
+    @classmethod
+    def infer_object_type(cls, values):
+        """Returns the type shared by most of the non null values, if any
+
+        The type has to be shared by more than INFER_COL_TYPES_THRESHOLD
+        percent of the non null values.
+        """
+        types = Counter(
+            cls.object_type(v) for v in values
+            if v is not None and not (isinstance(v, float) and np.isnan(v)))
+        if not types:
+            return None
+        col_type, count = types.most_common(1)[0]
+        if 100 * count / sum(types.values()) > INFER_COL_TYPES_THRESHOLD:
+            return col_type
+
     @classmethod
     def is_date(cls, dtype):
         if dtype.name:
@@ -167,10 +312,7 @@ class SupersetDataFrame(object):
             return None
 
         columns = []
-        sample_size = min(INFER_COL_TYPES_SAMPLE_SIZE, len(self.df.index))
-        sample = self.df
-        if sample_size:
-            sample = self.df.sample(sample_size)
+        sample = self.df.iloc[self.sample_indexes(len(self.df.index))]
         for col in self.df.dtypes.keys():
             col_db_type = (
                 self._type_dict.get(col) or
@@ -185,15 +327,8 @@ class SupersetDataFrame(object):
             }
 
             if column['type'] in ('OBJECT', None):
-                v = sample[col].iloc[0] if not sample[col].empty else None
-                if isinstance(v, basestring):
-                    column['type'] = 'STRING'
-                elif isinstance(v, int):
-                    column['type'] = 'INT'
-                elif isinstance(v, float):
-                    column['type'] = 'FLOAT'
-                elif isinstance(v, (datetime, date)):
-                    column['type'] = 'DATETIME'
+                column['type'] = self.infer_object_type(sample[col]) or column['type']
+                if column['type'] == 'DATETIME':
                     column['is_date'] = True
                     column['is_dim'] = False
                 # check if encoded datetime
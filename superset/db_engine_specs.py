@@ -41,7 +41,7 @@ import sqlparse
 from tableschema import Table
 from werkzeug.utils import secure_filename
 
-from superset import app, cache_util, conf, db, sql_parse, utils
+from superset import app, cache_util, conf, db, query_polling, sql_parse, utils
 from superset.exceptions import SupersetTemplateException
 from superset.utils import QueryStatus
 
@@ -90,6 +90,23 @@ class LimitMethod(object):
     FORCE_LIMIT = 'force_limit'
 
 
+class TopGroupsFilter(object):
+    """Enum the ways queries can be filtered on the groups of a prequery
+
+    Only used by engines without ``inner_joins``, when the top groups of a
+    series limit are fetched first. A single dimension always uses ``IN``.
+    Druid is the only such engine today and supports neither row values nor
+    joins, so ``TUPLE_IN`` and ``VALUES`` are left to engine specs setting
+    ``inner_joins = False`` themselves.
+    """
+    # (a = 1 AND b = 'x') OR (a = 2 AND b = 'y') OR ...
+    OR = 'or'
+    # (a, b) IN ((1, 'x'), (2, 'y'), ...)
+    TUPLE_IN = 'tuple_in'
+    # JOIN (VALUES (1, 'x'), (2, 'y'), ...) AS top_groups__ (a__, b__) ON ...
+    VALUES = 'values'
+
+
 class BaseEngineSpec(object):
 
     """Abstract class for database engine specific configurations"""
@@ -100,8 +117,12 @@ class BaseEngineSpec(object):
     limit_method = LimitMethod.FORCE_LIMIT
     time_secondary_columns = False
     inner_joins = True
+    top_groups_filter = TopGroupsFilter.OR
     allows_subquery = True
+    # supports GROUP BY GROUPING SETS, GROUPING() and window functions
+    supports_grouping_sets = False
     consistent_case_sensitivity = True  # do results have same case as qry for col names?
+    allows_connection_pooling = True
 
     @classmethod
     def get_time_grains(cls):
@@ -119,6 +140,18 @@ class BaseEngineSpec(object):
             return cursor.fetchmany(limit)
         return cursor.fetchall()
 
+    @classmethod
+    def fetch_data_chunks(cls, cursor, limit, chunk_size):
+        """Yields lists of at most ``chunk_size`` rows, up to ``limit`` rows"""
+        fetched = 0
+        while not limit or fetched < limit:
+            size = min(chunk_size, limit - fetched) if limit else chunk_size
+            rows = cursor.fetchmany(size)
+            if not rows:
+                break
+            fetched += len(rows)
+            yield rows
+
     @classmethod
     def epoch_to_dttm(cls):
         raise NotImplementedError()
@@ -151,18 +184,18 @@ class BaseEngineSpec(object):
             )
             return database.compile_sqla_query(qry)
         elif LimitMethod.FORCE_LIMIT:
-            parsed_query = sql_parse.SupersetQuery(sql)
+            parsed_query = sql_parse.parse_query(sql)
             sql = parsed_query.get_query_with_new_limit(limit)
         return sql
 
     @classmethod
     def get_limit_from_sql(cls, sql):
-        parsed_query = sql_parse.SupersetQuery(sql)
+        parsed_query = sql_parse.parse_query(sql)
         return parsed_query.limit
 
     @classmethod
     def get_query_with_new_limit(cls, sql, limit):
-        parsed_query = sql_parse.SupersetQuery(sql)
+        parsed_query = sql_parse.parse_query(sql)
         return parsed_query.get_query_with_new_limit(limit)
 
     @staticmethod
@@ -443,6 +476,13 @@ class PostgresBaseEngineSpec(BaseEngineSpec):
             return cursor.fetchmany(limit)
         return cursor.fetchall()
 
+    @classmethod
+    def fetch_data_chunks(cls, cursor, limit, chunk_size):
+        if not cursor.description:
+            return iter([])
+        return super(PostgresBaseEngineSpec, cls).fetch_data_chunks(
+            cursor, limit, chunk_size)
+
     @classmethod
     def epoch_to_dttm(cls):
         return "(timestamp 'epoch' + {col} * interval '1 second')"
@@ -454,6 +494,7 @@ class PostgresBaseEngineSpec(BaseEngineSpec):
 
 class PostgresEngineSpec(PostgresBaseEngineSpec):
     engine = 'postgresql'
+    supports_grouping_sets = True
 
     @classmethod
     def get_table_names(cls, schema, inspector):
@@ -465,6 +506,7 @@ class PostgresEngineSpec(PostgresBaseEngineSpec):
 
 class SnowflakeEngineSpec(PostgresBaseEngineSpec):
     engine = 'snowflake'
+    supports_grouping_sets = True
     consistent_case_sensitivity = False
     time_grain_functions = {
         None: '{col}',
@@ -507,6 +549,7 @@ class RedshiftEngineSpec(PostgresBaseEngineSpec):
 
 class OracleEngineSpec(PostgresBaseEngineSpec):
     engine = 'oracle'
+    supports_grouping_sets = True
     limit_method = LimitMethod.WRAP_SQL
     consistent_case_sensitivity = False
 
@@ -568,6 +611,8 @@ class Db2EngineSpec(BaseEngineSpec):
 
 class SqliteEngineSpec(BaseEngineSpec):
     engine = 'sqlite'
+    # pysqlite connections can't be shared across threads
+    allows_connection_pooling = False
 
     time_grain_functions = {
         None: '{col}',
@@ -691,6 +736,7 @@ class MySQLEngineSpec(BaseEngineSpec):
 
 class PrestoEngineSpec(BaseEngineSpec):
     engine = 'presto'
+    supports_grouping_sets = True
 
     time_grain_functions = {
         None: '{col}',
@@ -781,6 +827,9 @@ class PrestoEngineSpec(BaseEngineSpec):
     @classmethod
     def handle_cursor(cls, cursor, query, session):
         """Updates progress information"""
+        channel = query_polling.get_cancellation_channel()
+        backoff = query_polling.Backoff(
+            1, config.get('SQLLAB_POLL_MAX_INTERVAL'))
         logging.info('Polling the cursor for progress')
         polled = cursor.poll()
         # poll returns dict -- JSON status information or ``None``
@@ -791,8 +840,8 @@ class PrestoEngineSpec(BaseEngineSpec):
             # Update the object and wait for the kill signal.
             stats = polled.get('stats', {})
 
-            query = session.query(type(query)).filter_by(id=query.id).one()
-            if query.status in [QueryStatus.STOPPED, QueryStatus.TIMED_OUT]:
+            if channel.is_stopped(query, session):
+                query.status = QueryStatus.STOPPED
                 cursor.cancel()
                 break
 
@@ -810,10 +859,11 @@ class PrestoEngineSpec(BaseEngineSpec):
                     logging.info(
                         'Query progress: {} / {} '
                         'splits'.format(completed_splits, total_splits))
-                    if progress > query.progress:
+                    if query_polling.is_progress_step(query.progress, progress):
                         query.progress = progress
-                    session.commit()
-            time.sleep(1)
+                        session.commit()
+                        backoff.reset()
+            time.sleep(backoff.next())
             logging.info('Polling the cursor for progress')
             polled = cursor.poll()
 
@@ -966,11 +1016,97 @@ class PrestoEngineSpec(BaseEngineSpec):
         return df.to_dict()[field_to_return][0]
 
 
+class HiveLogTracker(object):
+    """Follows the progress of a Hive query through its log
+
+    Only the lines logged since the previous call to ``update`` are parsed,
+    the jobs and the progress of the stages of the current job being kept
+    between calls.
+    """
+
+    tracking_url_prefix = 'Tracking URL = '
+
+    def __init__(self, engine_spec):
+        self.engine_spec = engine_spec
+        self.total_jobs = 1  # assuming there's at least 1 job
+        self.current_job = 1
+        self.stages = {}
+        self.tracking_url = None
+        self._log = None
+
+    def get_new_lines(self, log):
+        """Returns the lines of ``log`` which weren't read yet
+
+        Depending on the server, ``fetch_logs`` returns either the whole log
+        or what was logged since its previous call. The log is whole when it
+        starts with the previous one.
+        """
+        if self._log and log.startswith(self._log):
+            # without the line break ending the last line read
+            new_log = log[len(self._log):].lstrip('\r\n')
+        else:
+            new_log = log
+        self._log = log
+        return new_log.splitlines()
+
+    def update(self, log):
+        """Reads the new lines of ``log`` and returns them"""
+        lines = self.get_new_lines(log)
+        self.update_lines(lines)
+        return lines
+
+    def update_lines(self, lines):
+        spec = self.engine_spec
+        for line in lines:
+            # the regexes are only run on the lines which can match them
+            if 'Stage-' in line:
+                match = spec.stage_progress_r.match(line)
+                if match:
+                    stage_number = int(match.groupdict()['stage_number'])
+                    map_progress = int(match.groupdict()['map_progress'])
+                    reduce_progress = int(match.groupdict()['reduce_progress'])
+                    self.stages[stage_number] = (
+                        (map_progress + reduce_progress) / 2)
+            elif 'Total jobs' in line:
+                match = spec.jobs_stats_r.match(line)
+                if match:
+                    self.total_jobs = int(match.groupdict()['max_jobs']) or 1
+            elif 'Launching Job' in line:
+                match = spec.launching_job_r.match(line)
+                if match:
+                    self.current_job = int(match.groupdict()['job_number'])
+                    self.total_jobs = int(match.groupdict()['max_jobs']) or 1
+                    self.stages = {}
+            elif (
+                    not self.tracking_url and
+                    self.tracking_url_prefix in line):
+                self.tracking_url = line.split(self.tracking_url_prefix)[1]
+
+    @property
+    def progress(self):
+        logging.info(
+            'Progress detail: {}, '
+            'current job {}, '
+            'total jobs: {}'.format(
+                self.stages, self.current_job, self.total_jobs))
+
+        stage_progress = sum(
+            self.stages.values()) / len(self.stages) if self.stages else 0
+
+        progress = (
+            100 * (self.current_job - 1) / self.total_jobs +
+            stage_progress / self.total_jobs
+        )
+        return int(progress)
+
+
 class HiveEngineSpec(PrestoEngineSpec):
 
     """Reuses PrestoEngineSpec functionality."""
 
     engine = 'hive'
+    # Hive's GROUPING SETS syntax differs from the standard one
+    supports_grouping_sets = False
 
     # Scoping regex at class level to avoid recompiling
     # 17/02/07 19:36:38 INFO ql.Driver: Total jobs = 5
@@ -1017,6 +1153,15 @@ class HiveEngineSpec(PrestoEngineSpec):
             raise Exception('Query error', state.errorMessage)
         return super(HiveEngineSpec, cls).fetch_data(cursor, limit)
 
+    @classmethod
+    def fetch_data_chunks(cls, cursor, limit, chunk_size):
+        from TCLIService import ttypes
+        state = cursor.poll()
+        if state.operationState == ttypes.TOperationState.ERROR_STATE:
+            raise Exception('Query error', state.errorMessage)
+        return super(HiveEngineSpec, cls).fetch_data_chunks(
+            cursor, limit, chunk_size)
+
     @staticmethod
     def create_table_from_csv(form, table):
         """Uploads a csv file and creates a superset datasource in Hive."""
@@ -1112,43 +1257,15 @@ class HiveEngineSpec(PrestoEngineSpec):
 
     @classmethod
     def progress(cls, log_lines):
-        total_jobs = 1  # assuming there's at least 1 job
-        current_job = 1
-        stages = {}
-        for line in log_lines:
-            match = cls.jobs_stats_r.match(line)
-            if match:
-                total_jobs = int(match.groupdict()['max_jobs']) or 1
-            match = cls.launching_job_r.match(line)
-            if match:
-                current_job = int(match.groupdict()['job_number'])
-                total_jobs = int(match.groupdict()['max_jobs']) or 1
-                stages = {}
-            match = cls.stage_progress_r.match(line)
-            if match:
-                stage_number = int(match.groupdict()['stage_number'])
-                map_progress = int(match.groupdict()['map_progress'])
-                reduce_progress = int(match.groupdict()['reduce_progress'])
-                stages[stage_number] = (map_progress + reduce_progress) / 2
-        logging.info(
-            'Progress detail: {}, '
-            'current job {}, '
-            'total jobs: {}'.format(stages, current_job, total_jobs))
-
-        stage_progress = sum(
-            stages.values()) / len(stages.values()) if stages else 0
-
-        progress = (
-            100 * (current_job - 1) / total_jobs + stage_progress / total_jobs
-        )
-        return int(progress)
+        tracker = HiveLogTracker(cls)
+        tracker.update_lines(log_lines)
+        return tracker.progress
 
     @classmethod
     def get_tracking_url(cls, log_lines):
-        lkp = 'Tracking URL = '
-        for line in log_lines:
-            if lkp in line:
-                return line.split(lkp)[1]
+        tracker = HiveLogTracker(cls)
+        tracker.update_lines(log_lines)
+        return tracker.tracking_url
 
     @classmethod
     def handle_cursor(cls, cursor, query, session):
@@ -1158,27 +1275,32 @@ class HiveEngineSpec(PrestoEngineSpec):
             hive.ttypes.TOperationState.INITIALIZED_STATE,
             hive.ttypes.TOperationState.RUNNING_STATE,
         )
+        channel = query_polling.get_cancellation_channel()
+        backoff = query_polling.Backoff(
+            hive_poll_interval, config.get('SQLLAB_POLL_MAX_INTERVAL'))
+        tracker = HiveLogTracker(cls)
         polled = cursor.poll()
-        last_log_line = 0
+        unlogged_lines = []
         tracking_url = None
         job_id = None
         while polled.operationState in unfinished_states:
-            query = session.query(type(query)).filter_by(id=query.id).one()
-            if query.status == QueryStatus.STOPPED:
+            if channel.is_stopped(query, session):
+                query.status = QueryStatus.STOPPED
                 cursor.cancel()
                 break
 
             log = cursor.fetch_logs() or ''
             if log:
-                log_lines = log.splitlines()
-                progress = cls.progress(log_lines)
+                unlogged_lines += tracker.update(log)
+                progress = tracker.progress
                 logging.info('Progress total: {}'.format(progress))
                 needs_commit = False
-                if progress > query.progress:
+                if query_polling.is_progress_step(query.progress, progress):
                     query.progress = progress
                     needs_commit = True
+                    backoff.reset()
                 if not tracking_url:
-                    tracking_url = cls.get_tracking_url(log_lines)
+                    tracking_url = tracker.tracking_url
                     if tracking_url:
                         job_id = tracking_url.split('/')[-2]
                         logging.info(
@@ -1189,16 +1311,16 @@ class HiveEngineSpec(PrestoEngineSpec):
                         query.tracking_url = tracking_url
                         logging.info('Job id: {}'.format(job_id))
                         needs_commit = True
-                if job_id and len(log_lines) > last_log_line:
+                if job_id and unlogged_lines:
                     # Wait for job id before logging things out
                     # this allows for prefixing all log lines and becoming
                     # searchable in something like Kibana
-                    for l in log_lines[last_log_line:]:
+                    for l in unlogged_lines:
                         logging.info('[{}] {}'.format(job_id, l))
-                    last_log_line = len(log_lines)
+                    unlogged_lines = []
                 if needs_commit:
                     session.commit()
-            time.sleep(hive_poll_interval)
+            time.sleep(backoff.next())
             polled = cursor.poll()
 
     @classmethod
@@ -1269,6 +1391,7 @@ class HiveEngineSpec(PrestoEngineSpec):
 
 class MssqlEngineSpec(BaseEngineSpec):
     engine = 'mssql'
+    supports_grouping_sets = True
     epoch_to_dttm = "dateadd(S, {col}, '1970-01-01')"
     limit_method = LimitMethod.WRAP_SQL
 
@@ -1393,6 +1516,15 @@ class BQEngineSpec(BaseEngineSpec):
             data = [r.values() for r in data]
         return data
 
+    @classmethod
+    def fetch_data_chunks(cls, cursor, limit, chunk_size):
+        chunks = super(BQEngineSpec, cls).fetch_data_chunks(
+            cursor, limit, chunk_size)
+        for data in chunks:
+            if type(data[0]).__name__ == 'Row':
+                data = [r.values() for r in data]
+            yield data
+
 
 class ImpalaEngineSpec(BaseEngineSpec):
     """Engine spec for Cloudera's Impala"""
@@ -1432,6 +1564,8 @@ class DruidEngineSpec(BaseEngineSpec):
     """Engine spec for Druid.io"""
     engine = 'druid'
     inner_joins = False
+    # Druid SQL has neither joins nor row values, only single column IN
+    top_groups_filter = TopGroupsFilter.OR
     allows_subquery = False
 
     time_grain_functions = {
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Downsampling of time series, to send charts no more points than they draw
+
+Both algorithms pick, for every column of a DataFrame, the positions of the
+rows to keep. The buckets are walked in Python but each step handles all the
+columns at once with numpy.
+
+* ``lttb``: Largest-Triangle-Three-Buckets (Steinarsson, 2013) keeps the
+  first and last points and, in each bucket in between, the point forming
+  the largest triangle with the point kept in the previous bucket and the
+  average of the next bucket. It preserves the visual shape of a line.
+* ``minmax``: keeps the lowest and the highest point of each bucket, so
+  that spikes are never lost.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_POINTS = 1000
+
+
+def lttb_rows(x, y, threshold):
+    """Positions of the rows kept by LTTB
+
+    :param x: 1d float array, sorted
+    :param y: 2d float array, one column per series
+    :returns: a ``(threshold, len(y.T))`` int array
+    """
+    n, m = y.shape
+    # NaNs don't weigh in the triangles but can still be picked
+    y = np.where(np.isnan(y), 0, y)
+    x = x - x[0]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    rows = np.empty((threshold, m), dtype=np.int64)
+    rows[0] = 0
+    rows[-1] = n - 1
+    columns = np.arange(m)
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = end, edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean(axis=0)
+        prev = rows[i]
+        prev_x = x[prev]
+        prev_y = y[prev, columns]
+        areas = np.abs(
+            (prev_x - avg_x) * (y[start:end] - prev_y) -
+            (prev_x - x[start:end, None]) * (avg_y - prev_y))
+        rows[i + 1] = start + areas.argmax(axis=0)
+    return rows
+
+
+def minmax_rows(x, y, threshold):
+    """Positions of the lowest and highest row of ``threshold // 2`` buckets
+
+    :returns: a ``(threshold // 2 * 2, len(y.T))`` int array, sorted
+    """
+    n, m = y.shape
+    buckets = threshold // 2
+    nulls = np.isnan(y)
+    lows = np.where(nulls, np.inf, y)
+    highs = np.where(nulls, -np.inf, y)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    rows = np.empty((buckets * 2, m), dtype=np.int64)
+    for i in range(buckets):
+        start, end = edges[i], edges[i + 1]
+        low = start + lows[start:end].argmin(axis=0)
+        high = start + highs[start:end].argmax(axis=0)
+        rows[2 * i] = np.minimum(low, high)
+        rows[2 * i + 1] = np.maximum(low, high)
+    return rows
+
+
+METHODS = {
+    'lttb': lttb_rows,
+    'minmax': minmax_rows,
+}
+
+
+def get_rows(method, df, threshold=DEFAULT_POINTS):
+    """Positions of the rows of ``df`` to keep for each of its columns
+
+    Returns None when ``df`` doesn't have more than ``threshold`` rows,
+    otherwise a 2d int array with one column per column of ``df``.
+    Non numeric columns are treated as NaNs.
+    """
+    if method not in METHODS:
+        raise ValueError('Unknown downsampling method [{}]'.format(method))
+    threshold = max(int(threshold), 3)
+    if len(df.index) <= threshold:
+        return None
+
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.values.astype('datetime64[ns]').view('i8').astype(float)
+    elif index.dtype.kind in 'biuf':
+        x = index.values.astype(float)
+    else:
+        x = np.arange(len(index), dtype=float)
+
+    y = np.full(df.shape, np.nan)
+    for i in range(len(df.columns)):
+        values = df.iloc[:, i].values
+        if values.dtype.kind in 'biuf':
+            y[:, i] = values
+    return METHODS[method](x, y, threshold)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""A per-process registry of pooled SQLAlchemy engines
+
+``Database.get_sqla_engine`` used to create a new engine, with a NullPool,
+on every call. Engines are now kept here, keyed on everything that goes
+into ``create_engine``, so that the dialect setup and the connections
+themselves are reused across requests.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+
+class StatsQueuePool(QueuePool):
+    """QueuePool reporting how long callers wait to check out a connection"""
+
+    stats_logger = None
+
+    def _do_get(self):
+        start = time.time()
+        try:
+            return super(StatsQueuePool, self)._do_get()
+        finally:
+            if self.stats_logger:
+                self.stats_logger.timing(
+                    'engine_pool.checkout_wait', (time.time() - start) * 1000)
+
+
+class EngineRegistry(object):
+    """Caches SQLAlchemy engines keyed on their URL and parameters
+
+    :param max_engines: number of engines kept around, the least recently
+        used engine is disposed of when the registry is full
+    :param idle_timeout: engines that haven't been used for that many
+        seconds are disposed of
+    :param pool_params: default QueuePool parameters (``pool_size``,
+        ``max_overflow``, ...) used when ``engine_params`` don't specify
+        a ``poolclass``
+    """
+
+    def __init__(
+            self, max_engines=50, idle_timeout=600, pool_params=None,
+            stats_logger=None):
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self.pool_params = pool_params or {}
+        self.stats_logger = stats_logger
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def get_key(database_id, url, params, effective_username=None):
+        return (
+            database_id,
+            str(url),
+            effective_username,
+            json.dumps(params, sort_keys=True, default=repr),
+        )
+
+    def get_engine(
+            self, database_id, url, params, effective_username=None,
+            pooled=True):
+        """Returns the engine for ``url`` and ``params``, creating it if needed
+
+        ``params`` are passed to ``create_engine``. When ``pooled`` is False
+        the engine keeps the dialect's default pool. When the registry is
+        disabled (``max_engines`` is 0) a new engine is returned every time.
+        """
+        if not self.max_engines:
+            return create_engine(url, **params)
+        key = self.get_key(database_id, url, params, effective_username)
+        now = time.time()
+        with self._lock:
+            if self._pid != os.getpid():
+                # never share connections with the parent of a forked process
+                self._engines.clear()
+                self._pid = os.getpid()
+            self._evict_idle(now)
+            entry = self._engines.pop(key, None)
+            if entry is None:
+                if self.stats_logger:
+                    self.stats_logger.incr('engine_registry.miss')
+                entry = {
+                    'database_id': database_id,
+                    'engine': self.create_engine(url, params, pooled),
+                }
+                while len(self._engines) >= self.max_engines:
+                    _, evicted = self._engines.popitem(last=False)
+                    self._dispose(evicted)
+            elif self.stats_logger:
+                self.stats_logger.incr('engine_registry.hit')
+            entry['last_used'] = now
+            self._engines[key] = entry
+        return entry['engine']
+
+    def create_engine(self, url, params, pooled=True):
+        params = dict(params)
+        if pooled and 'poolclass' not in params:
+            params['poolclass'] = StatsQueuePool
+            for k, v in self.pool_params.items():
+                params.setdefault(k, v)
+        engine = create_engine(url, **params)
+        if self.stats_logger:
+            self._listen(engine)
+        return engine
+
+    def _listen(self, engine):
+        stats_logger = self.stats_logger
+        if isinstance(engine.pool, StatsQueuePool):
+            engine.pool.stats_logger = stats_logger
+
+        @event.listens_for(engine, 'checkout')
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            stats_logger.incr('engine_pool.checkout')
+            connection_record.info['checkout_time'] = time.time()
+
+        @event.listens_for(engine, 'checkin')
+        def checkin(dbapi_connection, connection_record):
+            start = connection_record.info.pop('checkout_time', None)
+            if start:
+                stats_logger.timing(
+                    'engine_pool.checkout_duration', (time.time() - start) * 1000)
+
+    def _evict_idle(self, now):
+        if not self.idle_timeout:
+            return
+        for key, entry in list(self._engines.items()):
+            if now - entry['last_used'] > self.idle_timeout:
+                self._dispose(self._engines.pop(key))
+
+    def _dispose(self, entry):
+        try:
+            entry['engine'].dispose()
+        except Exception as e:
+            logging.exception(e)
+
+    def invalidate(self, database_id):
+        """Disposes of all the engines of a database"""
+        with self._lock:
+            for key, entry in list(self._engines.items()):
+                if entry['database_id'] == database_id:
+                    self._dispose(self._engines.pop(key))
+
+    def clear(self):
+        with self._lock:
+            for entry in self._engines.values():
+                self._dispose(entry)
+            self._engines.clear()
+
+    def __len__(self):
+        return len(self._engines)
@@ -38,6 +38,7 @@ import sqlparse
 
 from superset import app, db, db_engine_specs, security_manager, utils
 from superset.connectors.connector_registry import ConnectorRegistry
+from superset.engine_registry import EngineRegistry
 from superset.legacy import update_time_range
 from superset.models.helpers import AuditMixinNullable, ImportMixin, set_perm
 from superset.models.user_attributes import UserAttribute
@@ -52,6 +53,14 @@ metadata = Model.metadata  # pylint: disable=no-member
 
 PASSWORD_MASK = 'X' * 10
 
+engine_registry = EngineRegistry(
+    max_engines=config.get('SQLALCHEMY_ENGINE_REGISTRY_SIZE'),
+    idle_timeout=config.get('SQLALCHEMY_ENGINE_IDLE_TIMEOUT'),
+    pool_params=config.get('SQLALCHEMY_ENGINE_POOL_PARAMS'),
+    stats_logger=stats_logger,
+)
+
+
 def set_related_perm(mapper, connection, target):  # noqa
     src_class = target.cls_model
     id_ = target.datasource_id
@@ -730,9 +739,12 @@ class Database(Model, AuditMixinNullable, ImportMixin):
                 effective_username = g.user.username
         return effective_username
 
-    @utils.memoized(
-        watch=('impersonate_user', 'sqlalchemy_uri_decrypted', 'extra'))
-    def get_sqla_engine(self, schema=None, nullpool=True, user_name=None):
+    def get_sqla_engine(self, schema=None, nullpool=False, user_name=None):
+        """Returns an engine, shared through the process' engine registry
+
+        Engines are pooled unless ``nullpool`` is set, in which case a new
+        engine that doesn't keep connections around is created.
+        """
         extra = self.get_extra()
         url = make_url(self.sqlalchemy_uri_decrypted)
         url = self.db_engine_spec.adjust_database_uri(url, schema)
@@ -766,7 +778,12 @@ class Database(Model, AuditMixinNullable, ImportMixin):
         if DB_CONNECTION_MUTATOR:
             url, params = DB_CONNECTION_MUTATOR(
                 url, params, effective_username, security_manager)
-        return create_engine(url, **params)
+
+        if nullpool:
+            return create_engine(url, **params)
+        return engine_registry.get_engine(
+            self.id, url, params, effective_username,
+            pooled=self.db_engine_spec.allows_connection_pooling)
 
     def get_reserved_words(self):
         return self.get_dialect().preparer.reserved_words
@@ -775,7 +792,18 @@ class Database(Model, AuditMixinNullable, ImportMixin):
         return self.get_dialect().identifier_preparer.quote
 
     def get_df(self, sql, schema):
-        sqls = [six.text_type(s).strip().strip(';') for s in sqlparse.parse(sql)]
+        return list(self.get_df_chunks(sql, schema, chunk_size=None))[0]
+
+    def get_df_chunks(self, sql, schema, chunk_size):
+        """Yields the results of the last statement of ``sql`` as DataFrames
+
+        Rows are fetched ``chunk_size`` at a time, or all at once when
+        ``chunk_size`` is None. At least one, possibly empty, DataFrame is
+        yielded.
+        """
+        # splitting doesn't build the token trees of the parse cache, which
+        # is kept for the SQL Lab queries
+        sqls = [s.strip(';') for s in sqlparse.split(sql)]
         engine = self.get_sqla_engine(schema=schema)
 
         def needs_conversion(df_series):
@@ -785,6 +813,17 @@ class Database(Model, AuditMixinNullable, ImportMixin):
                 return True
             return False
 
+        def to_df(rows, columns):
+            df = pd.DataFrame.from_records(
+                data=list(rows),
+                columns=columns,
+                coerce_float=True,
+            )
+            for k, v in df.dtypes.items():
+                if v.type == numpy.object_ and needs_conversion(df[k]):
+                    df[k] = df[k].apply(utils.json_dumps_w_dates)
+            return df
+
         with closing(engine.raw_connection()) as conn:
             with closing(conn.cursor()) as cursor:
                 for sql in sqls[:-1]:
@@ -792,17 +831,18 @@ class Database(Model, AuditMixinNullable, ImportMixin):
                     cursor.fetchall()
 
                 self.db_engine_spec.execute(cursor, sqls[-1])
-
-                df = pd.DataFrame.from_records(
-                    data=list(cursor.fetchall()),
-                    columns=[col_desc[0] for col_desc in cursor.description],
-                    coerce_float=True,
-                )
-
-                for k, v in df.dtypes.items():
-                    if v.type == numpy.object_ and needs_conversion(df[k]):
-                        df[k] = df[k].apply(utils.json_dumps_w_dates)
-                return df
+                columns = [col_desc[0] for col_desc in cursor.description]
+
+                if not chunk_size:
+                    yield to_df(cursor.fetchall(), columns)
+                    return
+                empty = True
+                for rows in self.db_engine_spec.fetch_data_chunks(
+                        cursor, None, chunk_size):
+                    empty = False
+                    yield to_df(rows, columns)
+                if empty:
+                    yield to_df([], columns)
 
     def compile_sqla_query(self, qry, schema=None):
         engine = self.get_sqla_engine(schema=schema)
@@ -953,8 +993,14 @@ class Database(Model, AuditMixinNullable, ImportMixin):
         return sqla_url.get_dialect()()
 
 
+def invalidate_engines(mapper, connection, target):
+    engine_registry.invalidate(target.id)
+
+
 sqla.event.listen(Database, 'after_insert', set_perm)
 sqla.event.listen(Database, 'after_update', set_perm)
+sqla.event.listen(Database, 'after_update', invalidate_engines)
+sqla.event.listen(Database, 'after_delete', invalidate_engines)
 
 
 class Log(Model):
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Helpers for the engine specs polling running SQL Lab queries
+
+``stop_query`` marks queries as stopped in the metadata database and
+publishes it to ``SQLLAB_CANCELLATION_BACKEND``, a cache shared by the web
+servers and the workers. Pollers check that cache rather than re-reading
+the ``Query`` row, which they only fall back to when no backend is set.
+They wait longer and longer between polls while a query makes no
+progress, and only store progress when it moved by a meaningful step.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from superset import app
+from superset.utils import QueryStatus
+
+config = app.config
+
+STOPPED_STATES = (QueryStatus.STOPPED, QueryStatus.TIMED_OUT)
+
+
+class CancellationChannel(object):
+    """Publishes and checks the stop requests of queries
+
+    :param backend: an instantiated derivative of
+        werkzeug.contrib.cache.BaseCache, the metadata database is read
+        when None
+    :param timeout: seconds the stop requests are kept for
+    """
+
+    def __init__(self, backend=None, timeout=None):
+        self.backend = backend
+        self.timeout = timeout
+
+    @staticmethod
+    def get_key(query):
+        return 'sqllab_stopped_{}'.format(query.client_id)
+
+    def stop(self, query):
+        if self.backend is not None:
+            self.backend.set(self.get_key(query), True, timeout=self.timeout)
+
+    def is_stopped(self, query, session):
+        if self.backend is not None:
+            return bool(self.backend.get(self.get_key(query)))
+        status = (
+            session.query(type(query).status)
+            .filter_by(id=query.id)
+            .scalar()
+        )
+        return status in STOPPED_STATES
+
+
+def get_cancellation_channel():
+    return CancellationChannel(
+        config.get('SQLLAB_CANCELLATION_BACKEND'),
+        timeout=config.get('SQLLAB_ASYNC_TIME_LIMIT_SEC'))
+
+
+class Backoff(object):
+    """Poll intervals growing by ``factor`` from ``initial`` to ``maximum``"""
+
+    def __init__(self, initial, maximum, factor=1.5):
+        self.initial = initial
+        self.maximum = max(initial, maximum)
+        self.factor = factor
+        self.interval = initial
+
+    def reset(self):
+        self.interval = self.initial
+
+    def next(self):
+        interval = self.interval
+        self.interval = min(self.interval * self.factor, self.maximum)
+        return interval
+
+
+def is_progress_step(previous, progress):
+    """Whether ``progress`` moved far enough from ``previous`` to be stored"""
+    previous = previous or 0
+    if progress <= previous:
+        return False
+    return (
+        progress >= 100 or
+        progress - previous >= config.get('SQLLAB_PROGRESS_MIN_STEP'))
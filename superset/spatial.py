@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Vectorized decoding of the spatial columns of deck.gl charts
+
+Both decoders work on whole columns and report the values they couldn't
+decode through masks instead of exceptions, leaving it to the caller to
+fall back on a slower parser or to raise.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import numpy as np
+import pandas as pd
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# characters past that are below float64 precision and ignored
+GEOHASH_MAX_LENGTH = 24
+
+_GEOHASH_CODES = np.full(256, -1, dtype=np.int64)
+for _i, _c in enumerate(GEOHASH_ALPHABET):
+    _GEOHASH_CODES[ord(_c)] = _i
+
+# "latitude longitude" in plain decimal notation
+SPACED_PAIR_REGEX = r'^\s*(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)\s*$'
+
+
+def _to_code_points(values):
+    """Returns the characters of strings as a zero padded 2d array of code points"""
+    strings = np.asarray(values, dtype=object).astype('U')
+    width = max(strings.dtype.itemsize // 4, 1)
+    strings = np.ascontiguousarray(strings, dtype='U{}'.format(width))
+    code_points = strings.view(np.uint32).reshape(len(strings), width)
+    return code_points, np.char.str_len(strings)
+
+
+def decode_geohashes(values):
+    """Returns the center of the cell of each geohash
+
+    Gives the same coordinates as ``geohash.decode``, for a whole column.
+
+    :returns: ``(latitudes, longitudes, nulls, errors)``, float arrays with
+        NaNs for null and invalid geohashes, and the masks of those
+    """
+    values = pd.Series(values, dtype=object)
+    nulls = values.isnull().values
+    chars, lengths = _to_code_points(values.where(~nulls, '').values)
+    chars = chars[:, :GEOHASH_MAX_LENGTH]
+    codes = np.where(chars < 256, _GEOHASH_CODES[chars & 0xFF], -1)
+
+    n, width = codes.shape
+    positions = np.arange(width)[None, :] < lengths[:, None]
+    errors = ~nulls & (positions & (codes < 0)).any(axis=1)
+
+    lat = np.zeros(n, dtype=np.int64)
+    lon = np.zeros(n, dtype=np.int64)
+    lat_bits = np.zeros(n, dtype=np.int64)
+    lon_bits = np.zeros(n, dtype=np.int64)
+    for j in range(width):
+        active = positions[:, j] & ~errors
+        code = np.where(active, codes[:, j], 0)
+        for k in range(5):
+            bit = (code >> (4 - k)) & 1
+            # bits alternate between longitude and latitude, longitude first
+            if (j * 5 + k) % 2 == 0:
+                lon = np.where(active, (lon << 1) | bit, lon)
+                lon_bits += active
+            else:
+                lat = np.where(active, (lat << 1) | bit, lat)
+                lat_bits += active
+
+    # center of the cell, computed as geohash.decode does
+    latitudes = (
+        (2 * lat + 1 - (1 << lat_bits)).astype(np.float64) * 180.0 /
+        np.ldexp(1.0, lat_bits + 1))
+    longitudes = (
+        (2 * lon + 1 - (1 << lon_bits)).astype(np.float64) * 360.0 /
+        np.ldexp(1.0, lon_bits + 1))
+    latitudes[nulls | errors] = np.nan
+    longitudes[nulls | errors] = np.nan
+    return latitudes, longitudes, nulls, errors
+
+
+def _to_floats(strings):
+    try:
+        return strings.astype(np.float64)
+    except ValueError:
+        return pd.to_numeric(
+            pd.Series(strings), errors='coerce').values.astype(np.float64)
+
+
+def parse_coordinate_pairs(values):
+    """Splits "latitude, longitude" strings into two float arrays
+
+    Pairs are split on the first comma, or on spaces when there is no
+    comma. Values that don't parse as numbers within the latitude and
+    longitude ranges (degrees and minutes, altitudes, ...) are flagged in
+    ``errors`` for the caller to parse.
+
+    :returns: ``(latitudes, longitudes, nulls, errors)``, float arrays with
+        NaNs for null and unparsed values, and the masks of those
+    """
+    values = pd.Series(values, dtype=object)
+    nulls = (values.isnull() | (values == '')).values
+    strings = values.where(~nulls, '').values.astype('U')
+    parts = np.char.partition(strings, ',')
+    has_comma = parts[:, 1] != ''
+    latitudes = _to_floats(np.where(has_comma, parts[:, 0], 'nan'))
+    longitudes = _to_floats(np.where(has_comma, parts[:, 2], 'nan'))
+
+    spaced = ~nulls & ~has_comma
+    if spaced.any():
+        pairs = pd.Series(strings[spaced]).str.extract(
+            SPACED_PAIR_REGEX, expand=True)
+        latitudes[spaced] = pd.to_numeric(pairs[0], errors='coerce').values
+        longitudes[spaced] = pd.to_numeric(pairs[1], errors='coerce').values
+
+    with np.errstate(invalid='ignore'):
+        errors = ~nulls & ~(
+            (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180))
+    latitudes[nulls | errors] = np.nan
+    longitudes[nulls | errors] = np.nan
+    return latitudes, longitudes, nulls, errors
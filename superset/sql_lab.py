@@ -4,25 +4,41 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from datetime import datetime
 import logging
+import operator
 from time import sleep
 import uuid
 
 from celery.exceptions import SoftTimeLimitExceeded
 from contextlib2 import contextmanager
+import numpy as np
+import pandas as pd
 import simplejson as json
+from six import text_type
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
 from superset import app, dataframe, db, results_backend, security_manager, utils
+from superset.cache_serializers import ColumnarSerializer
+from superset.exceptions import SupersetException
 from superset.models.sql_lab import Query
-from superset.sql_parse import SupersetQuery
+from superset.sql_parse import parse_query
 from superset.utils import get_celery_app, QueryStatus
 
 config = app.config
 celery_app = get_celery_app(config)
 stats_logger = app.config.get('STATS_LOGGER')
 SQLLAB_TIMEOUT = config.get('SQLLAB_ASYNC_TIME_LIMIT_SEC', 600)
+results_frame_serializer = ColumnarSerializer(compression='zlib')
+
+RESULTS_FILTER_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
 
 
 class SqlLabException(Exception):
@@ -73,6 +89,213 @@ def session_scope(nullpool):
         session.close()
 
 
+def get_cache_timeout(database):
+    cache_timeout = database.cache_timeout
+    if cache_timeout is None:
+        cache_timeout = config.get('CACHE_DEFAULT_TIMEOUT', 0)
+    return cache_timeout
+
+
+# prefix of the keys of results stored page by page, which tells them
+# apart without decoding their payload
+PAGED_RESULTS_PREFIX = 'paged_'
+
+
+def is_paged_results_key(key):
+    return key.startswith(PAGED_RESULTS_PREFIX)
+
+
+def get_results_page_key(key, page):
+    """Key of a page of results stored by ``store_results_pages``"""
+    return '{}/page/{}'.format(key, page)
+
+
+def store_results_pages(
+        key, cursor, query, db_engine_spec, page_size, cache_timeout):
+    """Fetches the results in chunks and stores them one page at a time
+
+    Every page is serialized and compressed on its own and stored under
+    ``get_results_page_key(key, page)`` as a ``{"data": [...]}`` payload.
+    Column metadata is inferred from the first page.
+
+    :returns: dict of the metadata to store under ``key`` along the rest
+        of the query payload
+    """
+    cursor_description = cursor.description
+    columns = []
+    rows = 0
+    pages = 0
+    for chunk in db_engine_spec.fetch_data_chunks(cursor, query.limit, page_size):
+        cdf = dataframe.SupersetDataFrame(chunk, cursor_description, db_engine_spec)
+        if not pages:
+            columns = cdf.columns or []
+        json_page = json.dumps(
+            {'data': cdf.data}, default=utils.json_iso_dttm_ser, ignore_nan=True)
+        results_backend.set(
+            get_results_page_key(key, pages),
+            utils.zlib_compress(json_page),
+            cache_timeout)
+        if config.get('SQLLAB_RESULTS_CURSOR'):
+            store_results_frame(key, pages, cdf.df, cache_timeout)
+        rows += cdf.size
+        pages += 1
+        logging.info('Stored page {} of results, {} rows so far'.format(pages, rows))
+    meta = {
+        'columns': columns,
+        'rows': rows,
+        'pages': pages,
+        'page_size': page_size,
+    }
+    if config.get('SQLLAB_RESULTS_CURSOR'):
+        meta['frames'] = pages
+    return meta
+
+
+def has_results_page(key, page):
+    """Whether a page of results is still stored"""
+    page_key = get_results_page_key(key, page)
+    try:
+        return results_backend.has(page_key)
+    except NotImplementedError:
+        return results_backend.get(page_key) is not None
+
+
+def get_results_page(key, page):
+    """Returns the rows stored on a page of results, None if it expired"""
+    blob = results_backend.get(get_results_page_key(key, page))
+    if blob is None:
+        return None
+    return json.loads(utils.zlib_decompress_to_string(blob))['data']
+
+
+def get_results_frame_key(key, frame):
+    """Key of a DataFrame stored by ``store_results_frame``"""
+    return '{}/frame/{}'.format(key, frame)
+
+
+def store_results_frame(key, frame, df, cache_timeout):
+    """Stores (a chunk of) the results in the columnar format
+
+    Those frames back ``get_results_window``, which reads only the columns
+    it needs from them. Object columns holding decimals or dates are
+    converted the way they would be serialized to JSON, so that they don't
+    force the serializer to fall back to pickle.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns[df.dtypes == object]:
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+        if inferred == 'decimal':
+            df[col] = df[col].astype(float)
+        elif inferred == 'date':
+            df[col] = df[col].map(lambda v: v.isoformat() if v else v)
+    results_backend.set(
+        get_results_frame_key(key, frame),
+        results_frame_serializer.dumps({'df': df}),
+        cache_timeout)
+
+
+def load_results_frame(key, frame, columns=None):
+    """Returns a frame of stored results, None if it expired"""
+    blob = results_backend.get(get_results_frame_key(key, frame))
+    if blob is None:
+        return None
+    return results_frame_serializer.loads(blob, columns)['df']
+
+
+def filter_results(df, filters):
+    """Returns the mask of the rows of ``df`` matching all of ``filters``
+
+    Filters are dicts with a ``col``, an ``op`` (``==``, ``!=``, ``>``,
+    ``>=``, ``<``, ``<=``, ``in``, ``not in`` or ``contains``) and a ``val``.
+    """
+    mask = np.ones(len(df.index), dtype=bool)
+    for flt in filters:
+        col, op, val = flt.get('col'), flt.get('op'), flt.get('val')
+        if col not in df.columns:
+            raise SupersetException('Unknown column [{}]'.format(col))
+        series = df[col]
+        if op in ('in', 'not in'):
+            matches = series.isin(val if isinstance(val, list) else [val])
+            if op == 'not in':
+                matches = ~matches
+        elif op == 'contains':
+            if series.dtype != object:
+                series = series.astype(text_type)
+            matches = series.str.contains(
+                text_type(val), case=False, regex=False, na=False)
+        elif op in RESULTS_FILTER_OPERATORS:
+            try:
+                matches = RESULTS_FILTER_OPERATORS[op](series, val)
+            except TypeError:
+                raise SupersetException(
+                    'Column [{}] can not be compared to {!r}'.format(col, val))
+        else:
+            raise SupersetException('Unsupported operator [{}]'.format(op))
+        mask &= np.asarray(matches, dtype=bool)
+    return mask
+
+
+def get_results_window(
+        key, frames, offset=0, limit=None, order_by=None, order_desc=False,
+        filters=None):
+    """Filters, sorts and slices stored results without running the query
+
+    Only the columns used to filter and sort are read from every frame,
+    the other ones are only read from the frames holding rows of the
+    window.
+
+    :returns: tuple of the number of rows matching the filters and the
+        DataFrame of the window, None if the results expired
+    """
+    filters = filters or []
+    columns = {flt.get('col') for flt in filters}
+    if order_by:
+        columns.add(order_by)
+
+    parts = []
+    for frame in range(frames):
+        df = load_results_frame(key, frame, columns)
+        if df is None:
+            return None
+        parts.append(df)
+    if not parts:
+        return 0, pd.DataFrame()
+    starts = np.cumsum([0] + [len(df.index) for df in parts])
+    df = pd.concat(parts, ignore_index=True)
+
+    positions = np.flatnonzero(filter_results(df, filters))
+    if order_by:
+        if order_by not in df.columns:
+            raise SupersetException('Unknown column [{}]'.format(order_by))
+        try:
+            order = (
+                df[order_by].iloc[positions].reset_index(drop=True)
+                .sort_values(ascending=not order_desc, kind='mergesort')
+                .index.values)
+        except TypeError:
+            raise SupersetException(
+                'Column [{}] holds values that can not be sorted'.format(order_by))
+        positions = positions[order]
+    total = len(positions)
+    window = positions[offset:None if limit is None else offset + limit]
+
+    # read the rows of the window frame by frame, then put them back in
+    # the order of the window
+    frame_ids = np.searchsorted(starts, window, side='right') - 1
+    parts = []
+    for frame in np.unique(frame_ids):
+        in_frame = np.flatnonzero(frame_ids == frame)
+        df = load_results_frame(key, frame)
+        if df is None:
+            return None
+        df = df.iloc[window[in_frame] - starts[frame]]
+        df.index = in_frame
+        parts.append(df)
+    if not parts:
+        return total, pd.DataFrame()
+    return total, pd.concat(parts).sort_index().reset_index(drop=True)
+
+
 @celery_app.task(bind=True, soft_time_limit=SQLLAB_TIMEOUT)
 def get_sql_results(
     ctask, query_id, rendered_query, return_results=True, store_results=False,
@@ -126,8 +349,13 @@ def execute_sql(
     if store_results and not results_backend:
         return handle_error("Results backend isn't configured.")
 
+    # Results that are only stored (async queries) are fetched in chunks and
+    # stored page by page, so the worker never holds the whole result set
+    page_size = config.get('SQLLAB_RESULTS_PAGE_SIZE')
+    stream_results = bool(store_results and not return_results and page_size)
+
     # Limit enforced only for retrieving the data, not for the CTA queries.
-    superset_query = SupersetQuery(rendered_query)
+    superset_query = parse_query(rendered_query)
     executed_sql = superset_query.stripped()
     SQL_MAX_ROWS = app.config.get('SQL_MAX_ROW')
     if not superset_query.is_readonly() and not database.allow_dml:
@@ -176,7 +404,13 @@ def execute_sql(
         logging.info('Handling cursor')
         db_engine_spec.handle_cursor(cursor, query, session)
         logging.info('Fetching data: {}'.format(query.to_dict()))
-        data = db_engine_spec.fetch_data(cursor, query.limit)
+        if stream_results:
+            key = '{}{}'.format(PAGED_RESULTS_PREFIX, uuid.uuid4())
+            results_meta = store_results_pages(
+                key, cursor, query, db_engine_spec, page_size,
+                get_cache_timeout(database))
+        else:
+            data = db_engine_spec.fetch_data(cursor, query.limit)
     except SoftTimeLimitExceeded as e:
         logging.exception(e)
         if conn is not None:
@@ -199,9 +433,11 @@ def execute_sql(
     if query.status == utils.QueryStatus.STOPPED:
         return handle_error('The query has been stopped')
 
-    cdf = dataframe.SupersetDataFrame(data, cursor_description, db_engine_spec)
-
-    query.rows = cdf.size
+    if stream_results:
+        query.rows = results_meta['rows']
+    else:
+        cdf = dataframe.SupersetDataFrame(data, cursor_description, db_engine_spec)
+        query.rows = cdf.size
     query.progress = 100
     query.status = QueryStatus.SUCCESS
     if query.select_as_cta:
@@ -216,21 +452,28 @@ def execute_sql(
     session.merge(query)
     session.flush()
 
+    if stream_results:
+        payload.update(results_meta)
+    else:
+        payload.update({
+            'data': cdf.data,
+            'columns': cdf.columns if cdf.columns else [],
+        })
     payload.update({
         'status': query.status,
-        'data': cdf.data if cdf.data else [],
-        'columns': cdf.columns if cdf.columns else [],
         'query': query.to_dict(),
     })
     if store_results:
-        key = '{}'.format(uuid.uuid4())
+        if not stream_results:
+            key = '{}'.format(uuid.uuid4())
+            if config.get('SQLLAB_RESULTS_CURSOR'):
+                store_results_frame(key, 0, cdf.df, get_cache_timeout(database))
+                payload['frames'] = 1
         logging.info('Storing results in results backend, key: {}'.format(key))
         json_payload = json.dumps(
             payload, default=utils.json_iso_dttm_ser, ignore_nan=True)
-        cache_timeout = database.cache_timeout
-        if cache_timeout is None:
-            cache_timeout = config.get('CACHE_DEFAULT_TIMEOUT', 0)
-        results_backend.set(key, utils.zlib_compress(json_payload), cache_timeout)
+        results_backend.set(
+            key, utils.zlib_compress(json_payload), get_cache_timeout(database))
         query.results_key = key
         query.end_result_backend_time = utils.now_as_float()
 
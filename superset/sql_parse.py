@@ -5,8 +5,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from collections import OrderedDict
+import hashlib
 import logging
+import threading
 
+import six
 import sqlparse
 from sqlparse.sql import Identifier, IdentifierList
 from sqlparse.tokens import Keyword, Name
@@ -25,6 +29,7 @@ class SupersetQuery(object):
 
         logging.info('Parsing with sqlparse statement {}'.format(self.sql))
         self._parsed = sqlparse.parse(self.sql)
+        self._statements = [six.text_type(s) for s in self._parsed]
         for statement in self._parsed:
             self.__extract_from_token(statement)
             self._limit = self._extract_limit_from_query(statement)
@@ -51,6 +56,10 @@ class SupersetQuery(object):
     def stripped(self):
         return self.sql.strip(' \t\n;')
 
+    def get_statements(self):
+        """Returns the statements of the query, without trailing ;"""
+        return [text.strip().strip(';') for text in self._statements]
+
     @staticmethod
     def __precedes_table_name(token_value):
         for keyword in PRECEDES_TABLE_NAME:
@@ -168,14 +177,72 @@ class SupersetQuery(object):
                 limit_pos = pos
                 break
         limit = tokens[limit_pos + 2]
+        # the tokens are left untouched as parsed queries are shared
+        # through the parse cache
+        limit_value = limit.value
         if limit.ttype == sqlparse.tokens.Literal.Number.Integer:
-            tokens[limit_pos + 2].value = new_limit
+            limit_value = new_limit
         elif limit.is_group:
-            tokens[limit_pos + 2].value = (
+            limit_value = (
                 '{}, {}'.format(next(limit.get_identifiers()), new_limit)
             )
 
         str_res = ''
-        for i in tokens:
-            str_res += str(i.value)
+        for pos, i in enumerate(tokens):
+            str_res += str(limit_value if pos == limit_pos + 2 else i.value)
         return str_res
+
+
+class ParseCache(object):
+    """A bounded LRU cache of ``SupersetQuery`` objects
+
+    The same SQL is parsed by the security checks, the limit handling and
+    the execution of a query, and ``sqlparse`` is slow on large generated
+    queries. Entries are keyed on the hash of the SQL text, the least
+    recently used ones are evicted beyond ``max_size`` entries.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(sql):
+        if not isinstance(sql, bytes):
+            sql = sql.encode('utf-8')
+        return hashlib.sha1(sql).hexdigest()
+
+    def get(self, sql):
+        """Returns the ``SupersetQuery`` of ``sql``, parsing it if need be"""
+        key = self.get_key(sql)
+        with self._lock:
+            query = self._entries.pop(key, None)
+            if query is not None:
+                self._entries[key] = query
+                return query
+        query = SupersetQuery(sql)
+        if self.max_size:
+            with self._lock:
+                self._entries[key] = query
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return query
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+parse_cache = ParseCache()
+
+
+def parse_query(sql):
+    """Returns the cached ``SupersetQuery`` of ``sql``
+
+    The returned object is shared and shouldn't be altered.
+    """
+    return parse_cache.get(sql)
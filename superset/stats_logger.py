@@ -33,6 +33,10 @@ class BaseStatsLogger(object):
         """Setup a gauge"""
         raise NotImplementedError()
 
+    def timing(self, key, value):
+        """Record a duration, in milliseconds"""
+        raise NotImplementedError()
+
 
 class DummyStatsLogger(BaseStatsLogger):
     def incr(self, key):
@@ -49,6 +53,11 @@ class DummyStatsLogger(BaseStatsLogger):
             Fore.CYAN + '[stats_logger] (gauge) '
             '{key} | {value}' + Style.RESET_ALL).format(**locals()))
 
+    def timing(self, key, value):
+        logging.debug((
+            Fore.CYAN + '[stats_logger] (timing) '
+            '{key} | {value}' + Style.RESET_ALL).format(**locals()))
+
 
 try:
     from statsd import StatsClient
@@ -67,5 +76,8 @@ try:
             # pylint: disable=no-value-for-parameter
             self.client.gauge(key)
 
+        def timing(self, key, value):
+            self.client.timing(key, value)
+
 except Exception as e:
     pass
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Numpy arrays encoded for JavaScript typed arrays
+
+Charts with many data points can ship them as one buffer per attribute
+instead of one JSON object per point. Each array is described as::
+
+    {'type': 'Float32Array', 'size': 2, 'data': '<base64>'}
+
+where ``data`` holds the little-endian values, ``size`` is the number of
+values per point and ``type`` is the name of the typed array constructor
+to read ``data`` with in the browser.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import base64
+
+import numpy as np
+import pandas as pd
+
+TYPED_ARRAYS = {
+    '<f4': 'Float32Array',
+    '<f8': 'Float64Array',
+    '|u1': 'Uint8Array',
+    '|i1': 'Int8Array',
+    '<u2': 'Uint16Array',
+    '<i2': 'Int16Array',
+    '<u4': 'Uint32Array',
+    '<i4': 'Int32Array',
+}
+
+
+def encode_array(values, dtype=None):
+    """Describes a 1d or 2d numeric array, cast to ``dtype`` if given"""
+    values = np.asarray(values, dtype=dtype)
+    dtype = values.dtype.newbyteorder('<')
+    if dtype.str not in TYPED_ARRAYS:
+        raise ValueError('Unsupported dtype {}'.format(values.dtype))
+    return {
+        'type': TYPED_ARRAYS[dtype.str],
+        'size': 1 if values.ndim == 1 else values.shape[1],
+        'data': base64.b64encode(
+            np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii'),
+    }
+
+
+def encode_categories(values):
+    """Describes an array of categories as int32 codes
+
+    ``categories`` lists the distinct values, nulls are coded as -1
+    """
+    codes, categories = pd.factorize(values)
+    spec = encode_array(codes, np.int32)
+    spec['categories'] = categories.tolist()
+    return spec
+
+
+def encode_datetimes(values):
+    """Describes datetimes as float64 epoch milliseconds, NaTs as NaN"""
+    values = pd.to_datetime(values)
+    millis = values.values.astype('datetime64[ns]').view('i8') / 10 ** 6
+    millis[pd.isnull(values)] = np.nan
+    return encode_array(millis, np.float64)
@@ -50,6 +50,8 @@ logging.getLogger('MARKDOWN').setLevel(logging.INFO)
 PY3K = sys.version_info >= (3, 0)
 EPOCH = datetime(1970, 1, 1)
 DTTM_ALIAS = '__timestamp'
+TIME_OFFSET_ALIAS = '__time_offset'
+GROUPING_SET_ALIAS = '__grouping_set'
 ADHOC_METRIC_EXPRESSION_TYPES = {
     'SIMPLE': 'SIMPLE',
     'SQL': 'SQL',
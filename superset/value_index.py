@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=C,R,W
+"""Cached, searchable distinct values of datasource columns
+
+The values served by ``/superset/filter/`` are loaded once per datasource,
+column and fetch values predicate, and kept in the cache for
+``FILTER_VALUES_CACHE_TIMEOUT`` seconds along with their sorted search
+keys, so that serving them doesn't sort them again. Entries older than
+``FILTER_VALUES_REFRESH_INTERVAL`` seconds are still served while they
+are reloaded in a background thread.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from six import text_type
+
+from superset import app, cache
+
+config = app.config
+stats_logger = config.get('STATS_LOGGER')
+
+MATCH_PREFIX = 'prefix'
+MATCH_SUBSTRING = 'substring'
+
+
+class ValueIndex(object):
+    """The distinct values of a column, searchable case insensitively
+
+    ``keys`` are the sorted lowercase texts of the values and ``order`` the
+    positions of the values they stand for. They are computed from the
+    values unless given.
+    """
+
+    def __init__(self, values, keys=None, order=None):
+        self.values = list(values)
+        if keys is None or order is None:
+            keys = pd.Series(self.values, dtype=object).map(text_type).str.lower()
+            keys = np.asarray(keys.tolist(), dtype='U')
+            order = np.argsort(keys, kind='mergesort')
+            keys = keys[order]
+        self.keys = keys
+        self.order = order
+
+    def to_dict(self):
+        return {'values': self.values, 'keys': self.keys, 'order': self.order}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['values'], d.get('keys'), d.get('order'))
+
+    def search(self, q=None, match=MATCH_PREFIX, limit=None):
+        """Returns the values starting with or containing ``q``
+
+        Matches are sorted by their text, all the values are returned in
+        their original order when there is nothing to search for.
+        """
+        if not q:
+            return self.values[:limit] if limit else self.values
+        q = text_type(q).lower()
+        if match == MATCH_SUBSTRING:
+            positions = np.flatnonzero(np.char.find(self.keys, q) >= 0)
+        else:
+            start = np.searchsorted(self.keys, q, side='left')
+            end = np.searchsorted(self.keys, q + '\uffff', side='left')
+            positions = np.arange(start, end)
+        if limit:
+            positions = positions[:limit]
+        return [self.values[i] for i in self.order[positions]]
+
+
+def get_cache_key(datasource, column_name, limit):
+    key = json.dumps([
+        datasource.uid,
+        column_name,
+        limit,
+        datasource.get_fetch_values_predicate(),
+    ])
+    return 'filter_values_{}'.format(
+        hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def _store(cache_key, index):
+    entry = index.to_dict()
+    entry['loaded_at'] = time.time()
+    cache.set(
+        cache_key, entry, timeout=config.get('FILTER_VALUES_CACHE_TIMEOUT'))
+
+
+def _refresh(cache_key, reload):
+    try:
+        _store(cache_key, ValueIndex(reload()))
+        stats_logger.incr('filter_values.refreshed')
+    except Exception as e:
+        logging.exception(e)
+    finally:
+        cache.delete(cache_key + '_refresh')
+
+
+def get_value_index(cache_key, load, reload=None):
+    """Returns the ``ValueIndex`` of the values returned by ``load``
+
+    :param cache_key: key of the values, see ``get_cache_key``
+    :param load: callable loading the values when they aren't cached
+    :param reload: callable loading the values from a background thread
+        when they are due for a refresh, which has to set up its own
+        context
+    """
+    if not cache:
+        return ValueIndex(load())
+    entry = cache.get(cache_key)
+    if entry is None:
+        stats_logger.incr('filter_values.miss')
+        index = ValueIndex(load())
+        _store(cache_key, index)
+        return index
+
+    stats_logger.incr('filter_values.hit')
+    age = time.time() - entry['loaded_at']
+    if (
+            reload and
+            age > config.get('FILTER_VALUES_REFRESH_INTERVAL') and
+            # only one refresh at a time
+            cache.add(
+                cache_key + '_refresh', True,
+                timeout=config.get('FILTER_VALUES_REFRESH_INTERVAL'))):
+        thread = threading.Thread(target=_refresh, args=(cache_key, reload))
+        thread.daemon = True
+        thread.start()
+    return ValueIndex.from_dict(entry)
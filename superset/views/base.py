@@ -11,7 +11,9 @@ import json
 import logging
 import traceback
 
-from flask import abort, flash, g, get_flashed_messages, redirect, Response
+from flask import (
+    abort, flash, g, get_flashed_messages, redirect, Response, stream_with_context,
+)
 from flask_appbuilder import BaseView, ModelView
 from flask_appbuilder.actions import action
 from flask_appbuilder.models.sqla.filters import BaseFilter
@@ -21,7 +23,7 @@ from flask_babel import gettext as __
 from flask_babel import lazy_gettext as _
 import yaml
 
-from superset import conf, db, security_manager, utils
+from superset import conf, csv_export, db, security_manager, utils
 from superset.exceptions import SupersetSecurityException
 from superset.translations.utils import get_language_pack
 
@@ -278,6 +280,21 @@ class CsvResponse(Response):
     charset = conf.get('CSV_EXPORT').get('encoding', 'utf-8')
 
 
+def csv_stream_response(
+        chunks, filename=None, compression=None, mimetype='text/csv'):
+    """Streams the CSV ``chunks``, gzip compressed if ``compression='gzip'``"""
+    if compression == 'gzip':
+        return Response(
+            stream_with_context(
+                csv_export.iter_gzip(chunks, encoding=CsvResponse.charset)),
+            headers=generate_download_headers('csv.gz', filename),
+            mimetype='application/gzip')
+    return CsvResponse(
+        stream_with_context(chunks),
+        headers=generate_download_headers('csv', filename),
+        mimetype=mimetype)
+
+
 def check_ownership(obj, raise_if_false=True):
     """Meant to be used in `pre_update` hooks on models to enforce ownership
 
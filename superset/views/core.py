@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 from datetime import datetime, timedelta
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import re
 import time
@@ -14,7 +15,8 @@ import traceback
 from urllib import parse
 
 from flask import (
-    flash, g, Markup, redirect, render_template, request, Response, url_for,
+    _request_ctx_stack, flash, g, Markup, redirect, render_template, request,
+    Response, stream_with_context, url_for,
 )
 from flask_appbuilder import expose, SimpleFormView
 from flask_appbuilder.actions import action
@@ -34,11 +36,12 @@ from werkzeug.routing import BaseConverter
 from werkzeug.utils import secure_filename
 
 from superset import (
-    app, appbuilder, cache, db, results_backend, security_manager, sql_lab, utils,
-    viz,
+    app, appbuilder, cache, csv_export, db, query_polling, results_backend,
+    security_manager, sql_lab, utils, value_index, viz,
 )
 from superset.connectors.connector_registry import ConnectorRegistry
 from superset.connectors.sqla.models import AnnotationDatasource, SqlaTable
+from superset.dataframe import SupersetDataFrame
 from superset.exceptions import SupersetException
 from superset.forms import CsvToDatabaseForm
 from superset.jinja_context import get_template_processor
@@ -46,14 +49,14 @@ from superset.legacy import cast_form_data, update_time_range
 import superset.models.core as models
 from superset.models.sql_lab import Query
 from superset.models.user_attributes import UserAttribute
-from superset.sql_parse import SupersetQuery
+from superset.sql_parse import parse_query
 from superset.utils import (
     merge_extra_filters, merge_request_params, QueryStatus,
 )
 from .base import (
     api, BaseSupersetView,
     check_ownership,
-    CsvResponse, DeleteMixin,
+    csv_stream_response, DeleteMixin,
     generate_download_headers, get_error_msg,
     json_error_response, SupersetFilter, SupersetModelView, YamlExportMixin,
 )
@@ -1036,7 +1039,7 @@ class Superset(BaseSupersetView):
             mimetype='application/json')
 
     def generate_json(self, datasource_type, datasource_id, form_data,
-                      csv=False, query=False, force=False):
+                      csv=False, query=False, force=False, compression=None):
         try:
             viz_obj = self.get_viz(
                 datasource_type=datasource_type,
@@ -1057,10 +1060,9 @@ class Superset(BaseSupersetView):
                 link=security_manager.get_datasource_access_link(viz_obj.datasource))
 
         if csv:
-            return CsvResponse(
-                viz_obj.get_csv(),
-                status=200,
-                headers=generate_download_headers('csv'),
+            return csv_stream_response(
+                viz_obj.iter_csv(),
+                compression=compression,
                 mimetype='application/csv')
 
         if query:
@@ -1136,6 +1138,7 @@ class Superset(BaseSupersetView):
             csv = request.args.get('csv') == 'true'
             query = request.args.get('query') == 'true'
             force = request.args.get('force') == 'true'
+            compression = request.args.get('compression')
             form_data = self.get_form_data()[0]
             datasource_id, datasource_type = self.datasource_info(
                 datasource_id, datasource_type, form_data)
@@ -1149,7 +1152,123 @@ class Superset(BaseSupersetView):
                                   form_data=form_data,
                                   csv=csv,
                                   query=query,
-                                  force=force)
+                                  force=force,
+                                  compression=compression)
+
+    @log_this
+    @has_access_api
+    @expose('/slice_json_batch/', methods=['GET', 'POST'])
+    def slice_json_batch(self):
+        """Runs the queries of many slices concurrently
+
+        Takes either a ``dashboard_id`` or a comma separated list of
+        ``slice_ids`` and streams back one JSON document per line (in the
+        order the queries complete) holding the ``slice_id``, the HTTP
+        ``status`` that ``explore_json`` would have returned and either the
+        ``payload`` or an ``error``. ``extra_filters`` (a JSON list) is
+        applied to every slice, the same way dashboards filter their slices.
+        """
+        params = request.values
+        force = params.get('force') == 'true'
+        extra_filters = json.loads(params.get('extra_filters') or '[]')
+        session = db.session()
+        if params.get('dashboard_id'):
+            dashboard_id = params.get('dashboard_id')
+            qry = session.query(models.Dashboard)
+            if dashboard_id.isdigit():
+                qry = qry.filter_by(id=int(dashboard_id))
+            else:
+                qry = qry.filter_by(slug=dashboard_id)
+            dash = qry.first()
+            if not dash:
+                return json_error_response(__(
+                    'Dashboard %(id)s not found', id=dashboard_id), status=404)
+            slices = dash.slices
+        elif params.get('slice_ids'):
+            try:
+                slice_ids = [int(i) for i in params.get('slice_ids').split(',')]
+            except ValueError:
+                return json_error_response(__(
+                    'Malformed request. slice_ids should be a comma '
+                    'separated list of ids'), status=400)
+            slices = (
+                session.query(models.Slice)
+                .filter(models.Slice.id.in_(slice_ids))
+                .all()
+            )
+        else:
+            return json_error_response(__(
+                'Malformed request. dashboard_id or slice_ids '
+                'arguments are expected'), status=400)
+
+        # Access is checked here, the worker threads only run the queries
+        errors = []
+        slice_ids = []
+        for slc in slices:
+            datasource = slc.datasource
+            if not datasource:
+                errors.append({
+                    'slice_id': slc.id,
+                    'status': 404,
+                    'error': DATASOURCE_MISSING_ERR,
+                })
+            elif not security_manager.datasource_access(datasource, g.user):
+                errors.append({
+                    'slice_id': slc.id,
+                    'status': 404,
+                    'error': security_manager.get_datasource_access_error_msg(
+                        datasource),
+                })
+            else:
+                slice_ids.append(slc.id)
+        user = g.user
+        request_context = _request_ctx_stack.top
+
+        def get_slice_json(slice_id):
+            # every thread pushes its own copy of the request context, and
+            # so works with its own scoped database session
+            with request_context.copy():
+                g.user = user
+                try:
+                    slc = db.session.query(models.Slice).filter_by(id=slice_id).one()
+                    viz_obj = slc.get_viz(force=force)
+                    if extra_filters:
+                        viz_obj.form_data['extra_filters'] = extra_filters
+                    payload = viz_obj.get_payload()
+                    status = 200
+                    if (
+                        payload.get('status') == QueryStatus.FAILED or
+                        payload.get('error') is not None
+                    ):
+                        status = 400
+                    return viz_obj.json_dumps({
+                        'slice_id': slice_id,
+                        'status': status,
+                        'payload': payload,
+                    })
+                except Exception as e:
+                    logging.exception(e)
+                    return json.dumps({
+                        'slice_id': slice_id,
+                        'status': getattr(e, 'status', 500),
+                        'error': utils.error_msg_from_exception(e),
+                    })
+
+        def generate():
+            for error in errors:
+                yield json.dumps(error) + '\n'
+            if not slice_ids:
+                return
+            pool = ThreadPool(
+                min(len(slice_ids), config.get('SLICE_JSON_BATCH_WORKERS')))
+            try:
+                for line in pool.imap_unordered(get_slice_json, slice_ids):
+                    yield line + '\n'
+            finally:
+                pool.terminate()
+
+        return Response(
+            stream_with_context(generate()), mimetype='application/x-ndjson')
 
     @log_this
     @has_access
@@ -1310,12 +1429,15 @@ class Superset(BaseSupersetView):
         """
         Endpoint to retrieve values for specified column.
 
+        The values are cached, and only the ones starting with (or with
+        ``match=substring``, containing) the ``q`` argument are returned
+        when it is given, at most ``limit`` of them.
+
         :param datasource_type: Type of datasource e.g. table
         :param datasource_id: Datasource id
         :param column: Column name to retrieve values for
         :return:
         """
-        # TODO: Cache endpoint by user, datasource and column
         datasource = ConnectorRegistry.get_datasource(
             datasource_type, datasource_id, db.session)
         if not datasource:
@@ -1324,11 +1446,33 @@ class Superset(BaseSupersetView):
             return json_error_response(
                 security_manager.get_datasource_access_error_msg(datasource))
 
+        q = request.args.get('q')
+        try:
+            limit = int(request.args.get('limit') or 0) or None
+        except ValueError:
+            return json_error_response('limit should be an integer', status=400)
+        if q:
+            search_limit = config.get('FILTER_SEARCH_ROW_LIMIT')
+            limit = min(limit or search_limit, search_limit)
+
+        row_limit = config.get('FILTER_SELECT_ROW_LIMIT', 10000)
+        request_context = _request_ctx_stack.top
+        user = g.user
+
+        def reload():
+            # runs in a thread of its own, with its own database session
+            with request_context.copy():
+                g.user = user
+                datasource = ConnectorRegistry.get_datasource(
+                    datasource_type, datasource_id, db.session)
+                return datasource.values_for_column(column, row_limit)
+
+        index = value_index.get_value_index(
+            value_index.get_cache_key(datasource, column, row_limit),
+            lambda: datasource.values_for_column(column, row_limit),
+            reload)
         payload = json.dumps(
-            datasource.values_for_column(
-                column,
-                config.get('FILTER_SELECT_ROW_LIMIT', 10000),
-            ),
+            index.search(q, request.args.get('match'), limit),
             default=utils.json_int_dttm_ser)
         return json_success(payload)
 
@@ -2176,7 +2320,7 @@ class Superset(BaseSupersetView):
         table.schema = data.get('schema')
         table.template_params = data.get('templateParams')
         table.is_sqllab_view = True
-        q = SupersetQuery(data.get('sql'))
+        q = parse_query(data.get('sql'))
         table.sql = q.stripped()
         db.session.add(table)
         cols = []
@@ -2328,7 +2472,102 @@ class Superset(BaseSupersetView):
             return json_error_response(security_manager.get_table_access_error_msg(
                 '{}'.format(rejected_tables)))
 
-        return json_success(utils.zlib_decompress_to_string(blob))
+        json_payload = utils.zlib_decompress_to_string(blob)
+        if not sql_lab.is_paged_results_key(key):
+            return json_success(json_payload)
+        obj = json.loads(json_payload)
+
+        # Results stored page by page, the payload holds the requested page,
+        # or the first one when no page is specified
+        try:
+            page = int(request.args.get('page', 0))
+        except ValueError:
+            return json_error_response('Invalid page', status=400)
+        data = []
+        if 0 <= page < obj['pages']:
+            data = sql_lab.get_results_page(key, page)
+            if data is None:
+                return json_error_response(
+                    'Data could not be retrieved. '
+                    'You may want to re-run the query.',
+                    status=410,
+                )
+        if 'page' in request.args:
+            obj = {'page': page, 'pages': obj['pages']}
+        else:
+            obj['page'] = page
+        obj['data'] = data
+        return json_success(json.dumps(obj, ignore_nan=True))
+
+    @has_access_api
+    @expose('/results/<key>/rows/')
+    @log_this
+    def results_rows(self, key):
+        """Serves a window of the results stored for a query
+
+        The stored results are filtered (``filters``, a JSON list of
+        ``{"col", "op", "val"}``), sorted (``order_by`` and ``order_desc``)
+        and sliced (``offset`` and ``limit``) without running the query again.
+        The response holds the window's ``data`` and the ``total`` number of
+        rows matching the filters.
+        """
+        if not results_backend:
+            return json_error_response("Results backend isn't configured")
+
+        expired_msg = 'Data could not be retrieved. You may want to re-run the query.'
+        blob = results_backend.get(key)
+        if not blob:
+            return json_error_response(expired_msg, status=410)
+
+        query = db.session.query(Query).filter_by(results_key=key).one()
+        rejected_tables = security_manager.rejected_datasources(
+            query.sql, query.database, query.schema)
+        if rejected_tables:
+            return json_error_response(security_manager.get_table_access_error_msg(
+                '{}'.format(rejected_tables)))
+
+        obj = json.loads(utils.zlib_decompress_to_string(blob))
+        if 'frames' not in obj:
+            return json_error_response(
+                'These results can not be browsed on the server, '
+                'you may want to re-run the query.', status=400)
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = int(request.args.get('limit', 0))
+            filters = json.loads(request.args.get('filters') or '[]')
+        except ValueError:
+            return json_error_response(
+                'Malformed request. offset and limit should be integers and '
+                'filters a JSON list', status=400)
+        # windows are capped, a limit below 1 gets the default one
+        max_limit = (
+            config.get('SQLLAB_RESULTS_PAGE_SIZE') or config.get('SQL_MAX_ROW'))
+        if limit < 1:
+            limit = 1000
+        limit = min(limit, max_limit)
+
+        try:
+            window = sql_lab.get_results_window(
+                key,
+                obj['frames'],
+                offset=offset,
+                limit=limit,
+                order_by=request.args.get('order_by') or None,
+                order_desc=request.args.get('order_desc') == 'true',
+                filters=filters,
+            )
+        except SupersetException as e:
+            return json_error_response(utils.error_msg_from_exception(e), status=400)
+        if window is None:
+            return json_error_response(expired_msg, status=410)
+        total, df = window
+        return json_success(json.dumps({
+            'columns': obj['columns'],
+            'data': SupersetDataFrame.df_data(df),
+            'limit': limit,
+            'offset': offset,
+            'total': total,
+        }, default=utils.json_iso_dttm_ser, ignore_nan=True))
 
     @has_access_api
     @expose('/stop_query/', methods=['POST'])
@@ -2342,6 +2581,7 @@ class Superset(BaseSupersetView):
             )
             query.status = utils.QueryStatus.STOPPED
             db.session.commit()
+            query_polling.get_cancellation_channel().stop(query)
         except Exception:
             pass
         return self.json_response('OK')
@@ -2471,7 +2711,7 @@ class Superset(BaseSupersetView):
     @expose('/csv/<client_id>')
     @log_this
     def csv(self, client_id):
-        """Download the query results as csv."""
+        """Download the query results as csv, gzipped with ?compression=gzip"""
         logging.info('Exporting CSV file [{}]'.format(client_id))
         query = (
             db.session.query(Query)
@@ -2485,6 +2725,7 @@ class Superset(BaseSupersetView):
             flash(
                 security_manager.get_table_access_error_msg('{}'.format(rejected_tables)))
             return redirect('/')
+        chunk_size = config.get('CSV_EXPORT_CHUNK_SIZE')
         blob = None
         if results_backend and query.results_key:
             logging.info(
@@ -2496,20 +2737,33 @@ class Superset(BaseSupersetView):
             json_payload = utils.zlib_decompress_to_string(blob)
             obj = json.loads(json_payload)
             columns = [c['name'] for c in obj['columns']]
-            df = pd.DataFrame.from_records(obj['data'], columns=columns)
-            logging.info('Using pandas to convert to CSV')
-            csv = df.to_csv(index=False, **config.get('CSV_EXPORT'))
+            if 'pages' in obj:
+                if not all(
+                        sql_lab.has_results_page(query.results_key, page)
+                        for page in range(obj['pages'])):
+                    return json_error_response(
+                        'Data could not be retrieved. '
+                        'You may want to re-run the query.',
+                        status=410,
+                    )
+                # pages are only fetched from the backend as they're written
+                pages = (
+                    sql_lab.get_results_page(query.results_key, page)
+                    for page in range(obj['pages']))
+                chunks = csv_export.records_chunks(pages, columns)
+            else:
+                df = pd.DataFrame.from_records(obj['data'], columns=columns)
+                chunks = csv_export.dataframe_chunks(df, chunk_size)
         else:
             logging.info('Running a query to turn into CSV')
             sql = query.select_sql or query.executed_sql
-            df = query.database.get_df(sql, query.schema)
-            # TODO(bkyryliuk): add compression=gzip for big files.
-            csv = df.to_csv(index=False, **config.get('CSV_EXPORT'))
-        response = Response(csv, mimetype='text/csv')
-        response.headers['Content-Disposition'] = (
-            'attachment; filename={}.csv'.format(unidecode(query.name)))
-        logging.info('Ready to return response')
-        return response
+            chunks = query.database.get_df_chunks(sql, query.schema, chunk_size)
+        csv = csv_export.iter_csv(chunks, index=False, **config.get('CSV_EXPORT'))
+        logging.info('Streaming CSV response')
+        return csv_stream_response(
+            csv,
+            filename=unidecode(query.name),
+            compression=request.args.get('compression'))
 
     @has_access
     @expose('/fetch_datasource_metadata')
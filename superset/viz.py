@@ -18,14 +18,14 @@ import inspect
 from itertools import product
 import logging
 import math
+from multiprocessing.pool import ThreadPool
 import re
 import traceback
 import uuid
 
 from dateutil import relativedelta as rdelta
-from flask import request
+from flask import _request_ctx_stack, g, request
 from flask_babel import lazy_gettext as _
-import geohash
 from geopy.point import Point
 from markdown import markdown
 import numpy as np
@@ -35,15 +35,39 @@ from past.builtins import basestring
 import polyline
 import simplejson as json
 from six import string_types, text_type
-from six.moves import cPickle as pkl, reduce
-
-from superset import app, cache, get_css_manifest_files, utils
+from six.moves import reduce
+
+from superset import (
+    app, cache, csv_export, downsampling, get_css_manifest_files, typed_arrays,
+    utils,
+)
+from superset.cache_serializers import PickleSerializer
+from superset.cache_util import SingleFlight
 from superset.exceptions import NullValueException, SpatialException
+from superset.spatial import decode_geohashes, parse_coordinate_pairs
 from superset.utils import DTTM_ALIAS, JS_MAX_INTEGER, merge_extra_filters
 
 
 config = app.config
 stats_logger = config.get('STATS_LOGGER')
+cache_serializer = config.get('DATA_CACHE_SERIALIZER') or PickleSerializer()
+single_flight = None
+if cache and config.get('DATA_CACHE_SINGLE_FLIGHT'):
+    single_flight = SingleFlight(
+        cache, timeout=config.get('DATA_CACHE_SINGLE_FLIGHT_TIMEOUT'))
+
+# time grains of a fixed duration, with buckets aligned on the epoch, that
+# the incremental cache of time series can work with
+FIXED_TIME_GRAINS = {
+    'PT1S': timedelta(seconds=1),
+    'PT1M': timedelta(minutes=1),
+    'PT5M': timedelta(minutes=5),
+    'PT10M': timedelta(minutes=10),
+    'PT15M': timedelta(minutes=15),
+    'PT0.5H': timedelta(minutes=30),
+    'PT1H': timedelta(hours=1),
+    'P1D': timedelta(days=1),
+}
 
 METRIC_KEYS = [
     'metric', 'metrics', 'percent_metrics', 'metric_2', 'secondary_metric',
@@ -62,6 +86,8 @@ class BaseViz(object):
     default_fillna = 0
     cache_type = 'df'
     enforce_numerical_metrics = True
+    # whether queries can be served by get_df_incremental
+    incremental_cache = False
 
     def __init__(self, datasource, form_data, force=False):
         if not datasource:
@@ -294,6 +320,7 @@ class BaseViz(object):
             'order_desc': order_desc,
             'prequeries': [],
             'is_prequery': False,
+            'force': self.force,
         }
         return d
 
@@ -324,12 +351,19 @@ class BaseViz(object):
         """
         cache_dict = copy.copy(query_obj)
 
-        for k in ['from_dttm', 'to_dttm']:
-            del cache_dict[k]
+        for k in [
+                'from_dttm', 'to_dttm', 'inner_from_dttm', 'inner_to_dttm',
+                'force']:
+            cache_dict.pop(k, None)
 
-        for k in ['since', 'until']:
+        for k in ['since', 'until', 'time_range']:
             cache_dict[k] = self.form_data.get(k)
 
+        # time shifted queries only differ from the main one by their shift
+        if query_obj.get('inner_from_dttm') and query_obj.get('from_dttm'):
+            cache_dict['time_offset'] = (
+                query_obj['inner_from_dttm'] - query_obj['from_dttm'])
+
         cache_dict['datasource'] = self.datasource.uid
         json_data = self.json_dumps(cache_dict, sort_keys=True)
         return hashlib.md5(json_data.encode('utf-8')).hexdigest()
@@ -359,68 +393,50 @@ class BaseViz(object):
         stacktrace = None
         df = None
         cached_dttm = datetime.utcnow().isoformat().split('.')[0]
-        if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
-            if cache_value:
-                stats_logger.incr('loaded_from_cache')
-                try:
-                    cache_value = pkl.loads(cache_value)
-                    df = cache_value['df']
-                    self.query = cache_value['query']
-                    self._any_cached_dttm = cache_value['dttm']
-                    self._any_cache_key = cache_key
-                    self.status = utils.QueryStatus.SUCCESS
-                    is_loaded = True
-                except Exception as e:
-                    logging.exception(e)
-                    logging.error('Error reading cache: ' +
-                                  utils.error_msg_from_exception(e))
-                logging.info('Serving from cache')
-
-        if query_obj and not is_loaded:
-            try:
-                df = self.get_df(query_obj)
-                if hasattr(self.datasource.database, 'db_engine_spec'):
-                    db_engine_spec = self.datasource.database.db_engine_spec
-                    df = db_engine_spec.adjust_df_column_names(df, self.form_data)
-                if self.status != utils.QueryStatus.FAILED:
-                    stats_logger.incr('loaded_from_source')
-                    is_loaded = True
-            except Exception as e:
-                logging.exception(e)
-                if not self.error_message:
-                    self.error_message = '{}'.format(e)
-                self.status = utils.QueryStatus.FAILED
-                stacktrace = traceback.format_exc()
-
-            if (
-                    is_loaded and
-                    cache_key and
-                    cache and
-                    self.status != utils.QueryStatus.FAILED):
+        flight_lock = None
+        try:
+            if cache_key and cache and not self.force:
+                cache_value = cache.get(cache_key)
+                if not cache_value and single_flight:
+                    # An identical query may already be running in this
+                    # worker or another one, in which case we wait for it and
+                    # read its result from the cache
+                    flight_lock = single_flight.acquire(cache_key)
+                    if not flight_lock:
+                        stats_logger.incr('single_flight_coalesced')
+                        cache_value = cache.get(cache_key)
+                if cache_value:
+                    df, is_loaded = self.load_cache_value(
+                        cache_key, cache_value)
+
+            if query_obj and not is_loaded:
                 try:
-                    cache_value = dict(
-                        dttm=cached_dttm,
-                        df=df if df is not None else None,
-                        query=self.query,
-                    )
-                    cache_value = pkl.dumps(
-                        cache_value, protocol=pkl.HIGHEST_PROTOCOL)
-
-                    logging.info('Caching {} chars at key {}'.format(
-                        len(cache_value), cache_key))
-
-                    stats_logger.incr('set_cache_key')
-                    cache.set(
-                        cache_key,
-                        cache_value,
-                        timeout=self.cache_timeout)
+                    grain = self.get_incremental_grain(query_obj)
+                    if grain:
+                        df = self.get_df_incremental(query_obj, grain)
+                    else:
+                        df = self.get_df(query_obj)
+                    if hasattr(self.datasource.database, 'db_engine_spec'):
+                        db_engine_spec = self.datasource.database.db_engine_spec
+                        df = db_engine_spec.adjust_df_column_names(df, self.form_data)
+                    if self.status != utils.QueryStatus.FAILED:
+                        stats_logger.incr('loaded_from_source')
+                        is_loaded = True
                 except Exception as e:
-                    # cache.set call can fail if the backend is down or if
-                    # the key is too large or whatever other reasons
-                    logging.warning('Could not cache key {}'.format(cache_key))
                     logging.exception(e)
-                    cache.delete(cache_key)
+                    if not self.error_message:
+                        self.error_message = '{}'.format(e)
+                    self.status = utils.QueryStatus.FAILED
+                    stacktrace = traceback.format_exc()
+
+                if (
+                        is_loaded and
+                        cache_key and
+                        self.status != utils.QueryStatus.FAILED):
+                    self.set_cache_value(cache_key, df, cached_dttm)
+        finally:
+            if flight_lock:
+                flight_lock.release()
 
         return {
             'cache_key': self._any_cache_key,
@@ -436,6 +452,332 @@ class BaseViz(object):
             'rowcount': len(df.index) if df is not None else 0,
         }
 
+    def load_cache_value(self, cache_key, cache_value):
+        """Reads a value stored by ``set_cache_value``
+
+        :returns: tuple of the cached DataFrame and whether it could be read
+        """
+        stats_logger.incr('loaded_from_cache')
+        df = None
+        is_loaded = False
+        try:
+            cache_value = cache_serializer.loads(cache_value)
+            df = cache_value['df']
+            self.query = cache_value['query']
+            self._any_cached_dttm = cache_value['dttm']
+            self._any_cache_key = cache_key
+            self.status = utils.QueryStatus.SUCCESS
+            is_loaded = True
+        except Exception as e:
+            logging.exception(e)
+            logging.error('Error reading cache: ' +
+                          utils.error_msg_from_exception(e))
+        logging.info('Serving from cache')
+        return df, is_loaded
+
+    def set_cache_value(self, cache_key, df, cached_dttm):
+        """Caches ``df`` along with the query it came from"""
+        if not cache:
+            return
+        try:
+            cache_value = dict(
+                dttm=cached_dttm,
+                df=df if df is not None else None,
+                query=self.query,
+            )
+            cache_value = cache_serializer.dumps(cache_value)
+
+            logging.info('Caching {} chars at key {}'.format(
+                len(cache_value), cache_key))
+
+            stats_logger.incr('set_cache_key')
+            cache.set(
+                cache_key,
+                cache_value,
+                timeout=self.cache_timeout)
+        except Exception as e:
+            # cache.set call can fail if the backend is down or if
+            # the key is too large or whatever other reasons
+            logging.warning('Could not cache key {}'.format(cache_key))
+            logging.exception(e)
+            cache.delete(cache_key)
+
+    def get_incremental_grain(self, query_obj):
+        """Returns the time grain ``get_df_incremental`` can work with
+
+        None when the query can't be served incrementally: the results of
+        the query have to be the union of independent time buckets of a
+        fixed duration, so the top groups of ``timeseries_limit`` can't be
+        used.
+        """
+        if not (
+                self.incremental_cache and
+                cache and
+                config.get('TIME_SERIES_INCREMENTAL_CACHE') and
+                self.datasource.type == 'table' and
+                query_obj.get('is_timeseries') and
+                query_obj.get('granularity') and
+                query_obj.get('from_dttm') and
+                query_obj.get('to_dttm')):
+            return None
+        if query_obj.get('timeseries_limit') and query_obj.get('groupby'):
+            return None
+        extras = query_obj.get('extras') or {}
+        return FIXED_TIME_GRAINS.get(extras.get('time_grain_sqla'))
+
+    def incremental_cache_key(self, query_obj):
+        """Same as ``cache_key``, regardless of the time range"""
+        cache_dict = copy.copy(query_obj)
+        for k in [
+                'from_dttm', 'to_dttm', 'inner_from_dttm', 'inner_to_dttm',
+                'force']:
+            cache_dict.pop(k, None)
+        if query_obj.get('inner_from_dttm') and query_obj.get('from_dttm'):
+            cache_dict['time_offset'] = (
+                query_obj['inner_from_dttm'] - query_obj['from_dttm'])
+        cache_dict['time_shift'] = self.time_shift
+        cache_dict['datasource'] = self.datasource.uid
+        cache_dict['incremental'] = True
+        json_data = self.json_dumps(cache_dict, sort_keys=True)
+        return hashlib.md5(json_data.encode('utf-8')).hexdigest()
+
+    def get_df_incremental(self, query_obj, grain):
+        """Same as ``get_df``, reusing the time buckets of previous results
+
+        The results of the last query are kept under
+        ``incremental_cache_key`` along with the time range they cover.
+        Buckets that are fully within both that range and the one of
+        ``query_obj`` are reused, except the ones that fall within
+        ``TIME_SERIES_INCREMENTAL_CACHE_LOOKBACK`` of the end of the cached
+        range where late data may still land. Only the time before and
+        after the reused buckets is queried.
+        """
+        from_dttm = query_obj['from_dttm']
+        to_dttm = query_obj['to_dttm']
+        key = self.incremental_cache_key(query_obj)
+        lookback = timedelta(
+            seconds=config.get('TIME_SERIES_INCREMENTAL_CACHE_LOOKBACK') or 0)
+
+        cached = None
+        if not self.force:
+            cached = self.load_incremental_cache_value(key)
+        if cached is not None:
+            cached_df, cached_from, cached_to = cached
+            start = self.ceil_dttm(max(from_dttm, cached_from), grain)
+            end = self.floor_dttm(min(cached_to - lookback, to_dttm), grain)
+        row_limit = query_obj.get('row_limit')
+        if cached is None or start >= end:
+            stats_logger.incr('incremental_cache.miss')
+            df = self.get_df(query_obj)
+            if (
+                    self.status != utils.QueryStatus.FAILED and
+                    not (row_limit and len(df.index) >= row_limit)):
+                self.set_incremental_cache_value(key, df, from_dttm, to_dttm)
+            return df
+
+        # timestamps of the DataFrames are shifted from the ones queried
+        shift = timedelta(hours=self.datasource.offset or 0) + self.time_shift
+        parts = []
+        queries = []
+        if not cached_df.empty:
+            timestamps = cached_df[DTTM_ALIAS] - shift
+            parts.append(cached_df[(timestamps >= start) & (timestamps < end)])
+        for start_dttm, end_dttm in ((from_dttm, start), (end, to_dttm)):
+            if start_dttm >= end_dttm:
+                continue
+            df = self.get_df(dict(
+                query_obj, from_dttm=start_dttm, to_dttm=end_dttm))
+            if self.status == utils.QueryStatus.FAILED:
+                return df
+            if row_limit and len(df.index) >= row_limit:
+                # results may have been truncated, buckets can't be merged
+                return self.get_df(query_obj)
+            queries.append(self.query)
+            if not df.empty:
+                # the end bound is inclusive, so the time before the reused
+                # buckets also returns the partial first bucket
+                timestamps = df[DTTM_ALIAS] - shift
+                parts.append(df[(timestamps < start) | (timestamps >= end)])
+
+        df = pd.concat(parts, ignore_index=True) if parts else cached_df
+        if row_limit and len(df.index) >= row_limit:
+            return self.get_df(query_obj)
+        stats_logger.incr('incremental_cache.hit')
+        self.query = ';\n\n'.join(queries)
+        self.set_incremental_cache_value(key, df, from_dttm, to_dttm)
+        return df
+
+    @staticmethod
+    def floor_dttm(dttm, grain):
+        seconds = (dttm - utils.EPOCH).total_seconds()
+        return utils.EPOCH + timedelta(
+            seconds=seconds - seconds % grain.total_seconds())
+
+    @classmethod
+    def ceil_dttm(cls, dttm, grain):
+        floor = cls.floor_dttm(dttm, grain)
+        return floor if floor == dttm else floor + grain
+
+    def load_incremental_cache_value(self, key):
+        """Returns the DataFrame and time range cached under ``key``"""
+        cache_value = cache.get(key)
+        if not cache_value:
+            return None
+        try:
+            cache_value = cache_serializer.loads(cache_value)
+            return (
+                cache_value['df'],
+                pd.Timestamp(cache_value['from_dttm']).to_pydatetime(),
+                pd.Timestamp(cache_value['to_dttm']).to_pydatetime(),
+            )
+        except Exception as e:
+            logging.exception(e)
+            return None
+
+    def set_incremental_cache_value(self, key, df, from_dttm, to_dttm):
+        try:
+            cache_value = cache_serializer.dumps(dict(
+                df=df,
+                query=self.query,
+                from_dttm=from_dttm.isoformat(),
+                to_dttm=to_dttm.isoformat(),
+            ))
+            cache.set(
+                key,
+                cache_value,
+                timeout=config.get('TIME_SERIES_INCREMENTAL_CACHE_TIMEOUT'))
+        except Exception as e:
+            logging.warning('Could not cache key {}'.format(key))
+            logging.exception(e)
+            cache.delete(key)
+
+    def get_dfs(self, query_objs):
+        """Returns the DataFrames of independent query objects
+
+        Every query object is cached on its own. The ones missing from the
+        cache run as the single query returned by ``combine_query_objs``,
+        whose DataFrame is split back by ``split_df``. If they can't be
+        combined, or if that query fails, they run one by one.
+        """
+        dfs = [None] * len(query_objs)
+        cache_keys = [self.cache_key(query_obj) for query_obj in query_objs]
+        missing = []
+        for i, cache_key in enumerate(cache_keys):
+            cache_value = None
+            if cache and not self.force:
+                cache_value = cache.get(cache_key)
+            if cache_value:
+                dfs[i], is_loaded = self.load_cache_value(cache_key, cache_value)
+                if is_loaded:
+                    continue
+            missing.append(i)
+
+        if len(missing) > 1:
+            split_dfs = self.get_combined_dfs([query_objs[i] for i in missing])
+            if split_dfs is not None:
+                cached_dttm = datetime.utcnow().isoformat().split('.')[0]
+                for i, df in zip(missing, split_dfs):
+                    dfs[i] = df
+                    self.set_cache_value(cache_keys[i], df, cached_dttm)
+                missing = []
+
+        payloads = self.get_df_payloads([query_objs[i] for i in missing])
+        for i, payload in zip(missing, payloads):
+            dfs[i] = payload.get('df')
+        return dfs
+
+    def get_combined_dfs(self, query_objs):
+        """Runs ``query_objs`` as a single query, None if it's not possible"""
+        query_obj = self.combine_query_objs(query_objs)
+        if not query_obj:
+            return None
+        try:
+            df = self.get_df(query_obj)
+            db_engine_spec = getattr(self.datasource.database, 'db_engine_spec', None)
+            if db_engine_spec:
+                df = db_engine_spec.adjust_df_column_names(df, self.form_data)
+            dfs = None
+            if self.status != utils.QueryStatus.FAILED:
+                dfs = self.split_df(df, query_objs)
+        except Exception as e:
+            logging.exception(e)
+            dfs = None
+        if dfs is None:
+            # the query objects run one by one instead
+            self.status = None
+            self.error_message = None
+            return None
+        stats_logger.incr('loaded_from_source')
+        return dfs
+
+    def combine_query_objs(self, query_objs):
+        """Returns a single query object getting the rows of ``query_objs``
+
+        None if the query objects can't be combined, see ``get_dfs``.
+        """
+        return None
+
+    def split_df(self, df, query_objs):
+        """Splits the DataFrame of ``combine_query_objs``'s query
+
+        Returns one DataFrame per query object, None if it can't be split.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def split_df_on(df, column_name, count):
+        """Splits ``df`` on the index held in its ``column_name`` column"""
+        names = [c for c in df.columns if text_type(c).lower() == column_name]
+        if not names:
+            return None
+        index = df[names[0]].astype(int).values
+        df = df.drop(names[0], axis=1)
+        return [df[index == i].reset_index(drop=True) for i in range(count)]
+
+    def get_df_payloads(self, query_objs):
+        """Returns the ``get_df_payload`` of many independent query objects
+
+        When the datasource allows it the queries run concurrently, each on
+        a copy of this object so that they don't overwrite each other's
+        status, query and error message. Those are then merged back as if
+        the queries had run one after the other.
+        """
+        workers = min(
+            len(query_objs), getattr(self.datasource, 'concurrent_queries', 0))
+        if workers < 2:
+            return [self.get_df_payload(query_obj) for query_obj in query_objs]
+
+        self.datasource.prepare_concurrent_queries()
+        request_context = _request_ctx_stack.top
+        user = getattr(g, 'user', None) if request_context else None
+
+        def get_df_payload(args):
+            viz_obj, query_obj = args
+            if not request_context:
+                return viz_obj.get_df_payload(query_obj)
+            # every thread pushes its own copy of the request context, and
+            # so works with its own scoped database session
+            with request_context.copy():
+                g.user = user
+                return viz_obj.get_df_payload(query_obj)
+
+        viz_objs = [copy.copy(self) for _ in query_objs]
+        pool = ThreadPool(workers)
+        try:
+            payloads = pool.map(get_df_payload, list(zip(viz_objs, query_objs)))
+        finally:
+            pool.terminate()
+
+        for viz_obj in viz_objs:
+            self.results = getattr(viz_obj, 'results', None)
+            self.query = viz_obj.query
+            self.status = viz_obj.status
+            self.error_message = viz_obj.error_message
+            if viz_obj._any_cache_key:
+                self._any_cache_key = viz_obj._any_cache_key
+                self._any_cached_dttm = viz_obj._any_cached_dttm
+        return payloads
+
     def json_dumps(self, obj, sort_keys=False):
         return json.dumps(
             obj,
@@ -456,9 +798,16 @@ class BaseViz(object):
         return content
 
     def get_csv(self):
+        return ''.join(self.iter_csv())
+
+    def iter_csv(self):
+        """Yields the CSV export of the results a chunk of rows at a time"""
         df = self.get_df()
         include_index = not isinstance(df.index, pd.RangeIndex)
-        return df.to_csv(index=include_index, **config.get('CSV_EXPORT'))
+        chunks = csv_export.dataframe_chunks(
+            df, config.get('CSV_EXPORT_CHUNK_SIZE'))
+        return csv_export.iter_csv(
+            chunks, index=include_index, **config.get('CSV_EXPORT'))
 
     def get_data(self, df):
         return []
@@ -816,6 +1165,19 @@ class NVD3Viz(BaseViz):
     verbose_name = 'Base NVD3 Viz'
     is_timeseries = False
 
+    def downsample_rows(self, df):
+        """Positions of the rows of ``df`` to plot for each of its columns
+
+        None when all the rows are plotted, see ``superset.downsampling``
+        """
+        method = self.form_data.get('downsampling')
+        if not method or method == 'None':
+            return None
+        points = (
+            self.form_data.get('downsampling_points') or
+            downsampling.DEFAULT_POINTS)
+        return downsampling.get_rows(method, df, points)
+
 
 class BoxPlotViz(NVD3Viz):
 
@@ -1069,8 +1431,38 @@ class NVD3TimeSeriesViz(NVD3Viz):
     verbose_name = _('Time Series - Line Chart')
     sort_series = False
     is_timeseries = True
+    incremental_cache = True
+
+    @property
+    def columnar_series(self):
+        return bool(config.get('NVD3_COLUMNAR_SERIES'))
+
+    @staticmethod
+    def index_to_list(index):
+        """Lists index values, datetimes as epoch milliseconds"""
+        if isinstance(index, pd.DatetimeIndex):
+            nanos = index.values.astype('datetime64[ns]').view('i8')
+            return (nanos / 10 ** 6).tolist()
+        return index.tolist()
+
+    @staticmethod
+    def values_to_list(values):
+        """Lists numeric values, NaNs as None"""
+        if values.dtype.kind == 'f':
+            nulls = np.isnan(values)
+            if nulls.any():
+                values = values.astype(object)
+                values[nulls] = None
+        return values.tolist()
 
     def to_series(self, df, classed='', title_suffix=''):
+        """Returns one series per numeric column of ``df``
+
+        Series hold one ``{'x': ..., 'y': ...}`` dict per point or, when
+        ``columnar_series`` is set, an ``x`` and a ``y`` list with datetimes
+        as epoch milliseconds and NaNs as None. Each series only holds the
+        rows picked by ``downsample_rows``.
+        """
         cols = []
         for col in df.columns:
             if col == '':
@@ -1080,13 +1472,24 @@ class NVD3TimeSeriesViz(NVD3Viz):
             else:
                 cols.append(col)
         df.columns = cols
-        series = df.to_dict('series')
+
+        columnar = self.columnar_series
+
+        def get_xs(index):
+            return self.index_to_list(index) if columnar else index.tolist()
+
+        rows = self.downsample_rows(df)
+        if rows is None:
+            xs = get_xs(df.index)
 
         chart_data = []
-        for name in df.T.index.tolist():
-            ys = series[name]
-            if df[name].dtype.kind not in 'biufc':
+        for i, name in enumerate(df.columns):
+            ys = df.iloc[:, i].values
+            if ys.dtype.kind not in 'biufc':
                 continue
+            if rows is not None:
+                ys = ys[rows[:, i]]
+                xs = get_xs(df.index[rows[:, i]])
             if isinstance(name, list):
                 series_title = [text_type(title) for title in name]
             elif isinstance(name, tuple):
@@ -1105,21 +1508,13 @@ class NVD3TimeSeriesViz(NVD3Viz):
                 elif isinstance(series_title, (list, tuple)):
                     series_title = series_title + (title_suffix,)
 
-            values = []
-            for ds in df.index:
-                if ds in ys:
-                    d = {
-                        'x': ds,
-                        'y': ys[ds],
-                    }
-                else:
-                    d = {}
-                values.append(d)
-
-            d = {
-                'key': series_title,
-                'values': values,
-            }
+            d = {'key': series_title}
+            if columnar:
+                d['x'] = xs
+                d['y'] = self.values_to_list(ys)
+            else:
+                d['values'] = [
+                    {'x': x, 'y': y} for x, y in zip(xs, ys.tolist())]
             if classed:
                 d['classed'] = classed
             chart_data.append(d)
@@ -1191,6 +1586,8 @@ class NVD3TimeSeriesViz(NVD3Viz):
         if not isinstance(time_compare, list):
             time_compare = [time_compare]
 
+        deltas = []
+        query_objects = []
         for option in time_compare:
             query_object = self.query_obj()
             delta = utils.parse_human_timedelta(option)
@@ -1203,14 +1600,32 @@ class NVD3TimeSeriesViz(NVD3Viz):
                     'when using the `Time Shift` feature.'))
             query_object['from_dttm'] -= delta
             query_object['to_dttm'] -= delta
+            deltas.append(delta)
+            query_objects.append(query_object)
 
-            df2 = self.get_df_payload(query_object).get('df')
+        dfs = self.get_dfs(query_objects)
+        for option, delta, df2 in zip(time_compare, deltas, dfs):
             if df2 is not None and DTTM_ALIAS in df2:
                 label = '{} offset'. format(option)
                 df2[DTTM_ALIAS] += delta
                 df2 = self.process_data(df2)
                 self._extra_chart_data.append((label, df2))
 
+    def combine_query_objs(self, query_objs):
+        query_obj = query_objs[0]
+        query_obj = dict(
+            query_obj,
+            from_dttm=query_obj['inner_from_dttm'],
+            to_dttm=query_obj['inner_to_dttm'],
+            time_offsets=[
+                qo['inner_from_dttm'] - qo['from_dttm'] for qo in query_objs])
+        if not self.datasource.can_query_time_offsets(query_obj):
+            return None
+        return query_obj
+
+    def split_df(self, df, query_objs):
+        return self.split_df_on(df, utils.TIME_OFFSET_ALIAS, len(query_objs))
+
     def get_data(self, df):
         fd = self.form_data
         comparison_type = fd.get('comparison_type') or 'values'
@@ -1313,7 +1728,7 @@ class NVD3DualLineViz(NVD3Viz):
             else:
                 cols.append(col)
         df.columns = cols
-        series = df.to_dict('series')
+        rows = self.downsample_rows(df)
         chart_data = []
         metrics = [
             self.form_data.get('metric'),
@@ -1321,16 +1736,20 @@ class NVD3DualLineViz(NVD3Viz):
         ]
         for i, m in enumerate(metrics):
             m = utils.get_metric_name(m)
-            ys = series[m]
-            if df[m].dtype.kind not in 'biufc':
+            ys = df[m].values
+            if ys.dtype.kind not in 'biufc':
                 continue
+            index = df.index
+            if rows is not None:
+                kept = rows[:, df.columns.get_loc(m)]
+                ys = ys[kept]
+                index = index[kept]
             series_title = m
             d = {
                 'key': series_title,
                 'classed': classed,
                 'values': [
-                    {'x': ds, 'y': ys[ds] if ds in ys else None}
-                    for ds in df.index
+                    {'x': x, 'y': y} for x, y in zip(index.tolist(), ys.tolist())
                 ],
                 'yAxis': i + 1,
                 'type': 'line',
@@ -1781,11 +2200,45 @@ class FilterBoxViz(BaseViz):
     def run_extra_queries(self):
         qry = self.filter_query_obj()
         filters = [g for g in self.form_data['groupby']]
-        self.dataframes = {}
-        for flt in filters:
-            qry['groupby'] = [flt]
-            df = self.get_df_payload(query_obj=qry).get('df')
-            self.dataframes[flt] = df
+        dfs = self.get_dfs([dict(qry, groupby=[flt]) for flt in filters])
+        self.dataframes = dict(zip(filters, dfs))
+
+    def combine_query_objs(self, query_objs):
+        query_obj = dict(
+            query_objs[0],
+            groupby=[qo['groupby'][0] for qo in query_objs],
+            grouping_sets=True)
+        if not self.datasource.can_query_grouping_sets(query_obj):
+            return None
+        return query_obj
+
+    def split_df(self, df, query_objs):
+        dfs = self.split_df_on(df, utils.GROUPING_SET_ALIAS, len(query_objs))
+        if dfs is None:
+            return None
+        groupby = [qo['groupby'][0] for qo in query_objs]
+        metric = utils.get_metric_name(self.form_data['metric'])
+        columns = {col.column_name: col for col in self.datasource.columns}
+        for i, flt in enumerate(groupby):
+            df = dfs[i].drop(
+                [gb for gb in groupby if gb != flt and gb in dfs[i]], axis=1)
+            # other columns' rows held nulls, turning integers into floats,
+            # the column's own nulls keep it as floats like a single query
+            col = columns.get(flt)
+            if (
+                    col is not None and
+                    'INT' in (col.type or '').upper() and
+                    df[flt].dtype.kind == 'f' and
+                    df[flt].notnull().all()):
+                df[flt] = df[flt].astype('int64')
+            if metric in df:
+                df = df.sort_values(
+                    metric,
+                    ascending=not self.form_data.get('order_desc', True),
+                    kind='mergesort',
+                ).reset_index(drop=True)
+            dfs[i] = df
+        return dfs
 
     def filter_query_obj(self):
         qry = super(FilterBoxViz, self).query_obj()
@@ -1921,6 +2374,8 @@ class HorizonViz(NVD3TimeSeriesViz):
     credits = (
         '<a href="https://www.npmjs.com/package/d3-horizon-chart">'
         'd3-horizon-chart</a>')
+    # the chart reads the per point values
+    columnar_series = False
 
 
 class MapboxViz(BaseViz):
@@ -2063,6 +2518,8 @@ class BaseDeckGLViz(BaseViz):
     is_timeseries = False
     credits = '<a href="https://uber.github.io/deck.gl/">deck.gl</a>'
     spatial_control_keys = []
+    # whether get_binary_data is implemented, see DECKGL_BINARY_PAYLOAD
+    binary_payload = False
 
     def handle_nulls(self, df):
         return df
@@ -2095,29 +2552,60 @@ class BaseDeckGLViz(BaseViz):
                 _('Invalid spatial point encountered: %s' % s))
         return (p.latitude, p.longitude)
 
-    def process_spatial_data_obj(self, key, df):
+    def decode_spatial(self, key, df):
+        """Returns the coordinates of each row as two float arrays
+
+        The arrays hold the first and second items of the points stored in
+        ``df[key]`` by ``process_spatial_data_obj``, NaNs where a row has no
+        point, along with the mask of those rows. Returns None for unknown
+        spatial types.
+        """
         spatial = self.form_data.get(key)
         if spatial is None:
             raise ValueError(_('Bad spatial key'))
         if spatial.get('type') == 'latlong':
-            df[key] = list(zip(
-                pd.to_numeric(df[spatial.get('lonCol')], errors='coerce'),
-                pd.to_numeric(df[spatial.get('latCol')], errors='coerce'),
-            ))
+            lon = pd.to_numeric(df[spatial.get('lonCol')], errors='coerce')
+            lat = pd.to_numeric(df[spatial.get('latCol')], errors='coerce')
+            return (
+                lon.values.astype(np.float64),
+                lat.values.astype(np.float64),
+                np.zeros(len(df.index), dtype=bool))
         elif spatial.get('type') == 'delimited':
-            lon_lat_col = spatial.get('lonlatCol')
-            df[key] = df[lon_lat_col].apply(self.parse_coordinates)
-
+            values = df[spatial.get('lonlatCol')].values
+            lat, lon, nulls, errors = parse_coordinate_pairs(values)
+            # geopy parses what the fast path doesn't, or raises
+            for i in np.flatnonzero(errors):
+                point = self.parse_coordinates(values[i])
+                if point is None:
+                    nulls[i] = True
+                else:
+                    lat[i], lon[i] = point
             if spatial.get('reverseCheckbox'):
-                df[key] = [
-                    tuple(reversed(o)) if isinstance(o, (list, tuple)) else (0, 0)
-                    for o in df[key]
-                ]
-            del df[lon_lat_col]
+                lon[nulls] = 0
+                lat[nulls] = 0
+                return lon, lat, np.zeros(len(df.index), dtype=bool)
+            return lat, lon, nulls
+        elif spatial.get('type') == 'geohash':
+            values = df[spatial.get('geohashCol')].values
+            lat, lon, nulls, errors = decode_geohashes(values)
+            if errors.any():
+                raise SpatialException(
+                    _('Invalid geohash encountered: %s' % values[errors][0]))
+            return lat, lon, nulls
+        return None
+
+    def process_spatial_data_obj(self, key, df):
+        spatial = self.form_data.get(key)
+        coordinates = self.decode_spatial(key, df)
+        if coordinates is not None:
+            first, second, nulls = coordinates
+            points = list(zip(first.tolist(), second.tolist()))
+            for i in np.flatnonzero(nulls):
+                points[i] = None
+            df[key] = points
+        if spatial.get('type') == 'delimited':
+            del df[spatial.get('lonlatCol')]
         elif spatial.get('type') == 'geohash':
-            latlong = df[spatial.get('geohashCol')].map(geohash.decode)
-            df[key] = list(zip(latlong.apply(lambda x: x[0]),
-                               latlong.apply(lambda x: x[1])))
             del df[spatial.get('geohashCol')]
 
         if df.get(key) is None:
@@ -2125,6 +2613,15 @@ class BaseDeckGLViz(BaseViz):
                                        please consider filtering those out'))
         return df
 
+    def get_positions(self, key, df):
+        """Returns the points of ``process_spatial_data_obj`` as a 2d float array"""
+        coordinates = self.decode_spatial(key, df)
+        if coordinates is None:
+            raise NullValueException(_('Encountered invalid NULL spatial entry, \
+                                       please consider filtering those out'))
+        first, second, _nulls = coordinates
+        return np.column_stack([first, second])
+
     def query_obj(self):
         d = super(BaseDeckGLViz, self).query_obj()
         fd = self.form_data
@@ -2156,6 +2653,12 @@ class BaseDeckGLViz(BaseViz):
         if df is None:
             return None
 
+        if self.binary_payload and config.get('DECKGL_BINARY_PAYLOAD'):
+            return {
+                'binary': self.get_binary_data(df),
+                'mapboxApiKey': config.get('MAPBOX_API_KEY'),
+            }
+
         # Processing spatial info
         for key in self.spatial_control_keys:
             df = self.process_spatial_data_obj(key, df)
@@ -2176,6 +2679,36 @@ class BaseDeckGLViz(BaseViz):
     def get_properties(self, d):
         raise NotImplementedError()
 
+    def get_binary_data(self, df):
+        """Returns the features as column buffers instead of objects
+
+        ``attributes`` maps the properties returned by ``get_properties`` to
+        arrays encoded by ``superset.typed_arrays``, ``constants`` holds the
+        properties shared by all the features and ``columns`` the lists of
+        values of the extra ``js_columns``.
+        """
+        cols = self.form_data.get('js_columns') or []
+        return {
+            'length': len(df.index),
+            'attributes': self.get_binary_attributes(df),
+            'constants': self.get_binary_constants(),
+            'columns': {col: df[col].tolist() for col in cols},
+        }
+
+    def get_binary_attributes(self, df):
+        raise NotImplementedError()
+
+    def get_binary_constants(self):
+        return {}
+
+    def get_weights(self, df):
+        """Returns the metric of each row as float32, 1 where it is null or 0"""
+        if self.metric_label not in df:
+            return np.ones(len(df.index), dtype=np.float32)
+        weights = pd.to_numeric(df[self.metric_label], errors='coerce').values
+        weights = np.where(np.isnan(weights) | (weights == 0), 1, weights)
+        return weights.astype(np.float32)
+
 
 class DeckScatterViz(BaseDeckGLViz):
 
@@ -2185,6 +2718,7 @@ class DeckScatterViz(BaseDeckGLViz):
     verbose_name = _('Deck.gl - Scatter plot')
     spatial_control_keys = ['spatial']
     is_timeseries = True
+    binary_payload = True
 
     def query_obj(self):
         fd = self.form_data
@@ -2221,6 +2755,27 @@ class DeckScatterViz(BaseDeckGLViz):
             self.fixed_value = self.point_radius_fixed.get('value')
         return super(DeckScatterViz, self).get_data(df)
 
+    def get_binary_attributes(self, df):
+        attributes = {
+            'position': typed_arrays.encode_array(
+                self.get_positions('spatial', df), np.float32),
+        }
+        if self.metric_label:
+            metric = pd.to_numeric(df[self.metric_label], errors='coerce')
+            attributes['metric'] = typed_arrays.encode_array(metric, np.float32)
+            if not self.fixed_value:
+                attributes['radius'] = attributes['metric']
+        if self.dim:
+            attributes['cat_color'] = typed_arrays.encode_categories(df[self.dim])
+        if DTTM_ALIAS in df:
+            attributes[DTTM_ALIAS] = typed_arrays.encode_datetimes(df[DTTM_ALIAS])
+        return attributes
+
+    def get_binary_constants(self):
+        if self.fixed_value:
+            return {'radius': self.fixed_value}
+        return {}
+
 
 class DeckScreengrid(BaseDeckGLViz):
 
@@ -2230,6 +2785,7 @@ class DeckScreengrid(BaseDeckGLViz):
     verbose_name = _('Deck.gl - Screen Grid')
     spatial_control_keys = ['spatial']
     is_timeseries = True
+    binary_payload = True
 
     def query_obj(self):
         fd = self.form_data
@@ -2247,6 +2803,18 @@ class DeckScreengrid(BaseDeckGLViz):
         self.metric_label = self.get_metric_label(self.metric)
         return super(DeckScreengrid, self).get_data(df)
 
+    def get_binary_attributes(self, df):
+        attributes = {
+            'position': typed_arrays.encode_array(
+                self.get_positions('spatial', df), np.float32),
+            'weight': typed_arrays.encode_array(self.get_weights(df)),
+        }
+        for col in (DTTM_ALIAS, '__time'):
+            if col in df:
+                attributes[DTTM_ALIAS] = typed_arrays.encode_datetimes(df[col])
+                break
+        return attributes
+
 
 class DeckGrid(BaseDeckGLViz):
 
@@ -2255,6 +2823,7 @@ class DeckGrid(BaseDeckGLViz):
     viz_type = 'deck_grid'
     verbose_name = _('Deck.gl - 3D Grid')
     spatial_control_keys = ['spatial']
+    binary_payload = True
 
     def get_properties(self, d):
         return {
@@ -2266,6 +2835,13 @@ class DeckGrid(BaseDeckGLViz):
         self.metric_label = self.get_metric_label(self.metric)
         return super(DeckGrid, self).get_data(df)
 
+    def get_binary_attributes(self, df):
+        return {
+            'position': typed_arrays.encode_array(
+                self.get_positions('spatial', df), np.float32),
+            'weight': typed_arrays.encode_array(self.get_weights(df)),
+        }
+
 
 class DeckPathViz(BaseDeckGLViz):
 
@@ -2315,6 +2891,7 @@ class DeckHex(BaseDeckGLViz):
     viz_type = 'deck_hex'
     verbose_name = _('Deck.gl - 3D HEX')
     spatial_control_keys = ['spatial']
+    binary_payload = True
 
     def get_properties(self, d):
         return {
@@ -2326,6 +2903,13 @@ class DeckHex(BaseDeckGLViz):
         self.metric_label = self.get_metric_label(self.metric)
         return super(DeckHex, self).get_data(df)
 
+    def get_binary_attributes(self, df):
+        return {
+            'position': typed_arrays.encode_array(
+                self.get_positions('spatial', df), np.float32),
+            'weight': typed_arrays.encode_array(self.get_weights(df)),
+        }
+
 
 class DeckGeoJson(BaseDeckGLViz):
 
@@ -2467,6 +3051,8 @@ class RoseViz(NVD3TimeSeriesViz):
     verbose_name = _('Time Series - Nightingale Rose Chart')
     sort_series = False
     is_timeseries = True
+    # the chart reads the per point values
+    columnar_series = False
 
     def get_data(self, df):
         data = super(RoseViz, self).get_data(df)
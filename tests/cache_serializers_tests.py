@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from datetime import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from superset.cache_serializers import (
+    ColumnarSerializer, PickleSerializer, UnsupportedFrameException,
+)
+
+
+def get_payload(df):
+    return {
+        'dttm': '2018-07-01T00:00:00',
+        'query': 'SELECT * FROM birth_names',
+        'df': df,
+    }
+
+
+class ColumnarSerializerTestCase(unittest.TestCase):
+
+    def get_df(self):
+        return pd.DataFrame({
+            'name': ['Aaron', None, 'Zoé', ''],
+            'num': [1, 2, 3, 2 ** 60],
+            'sum__num': [1.5, np.nan, 3.0, 4.25],
+            'is_girl': [True, False, True, False],
+            '__timestamp': pd.to_datetime([
+                '2018-01-01', '2018-01-02', None, '2018-01-04']),
+        }, columns=['name', 'num', 'sum__num', 'is_girl', '__timestamp'])
+
+    def test_round_trip(self):
+        serializer = ColumnarSerializer()
+        df = self.get_df()
+        blob = serializer.dumps(get_payload(df))
+        self.assertTrue(ColumnarSerializer.is_columnar(blob))
+
+        payload = serializer.loads(blob)
+        self.assertEqual(payload['query'], 'SELECT * FROM birth_names')
+        self.assertEqual(payload['dttm'], '2018-07-01T00:00:00')
+        pd.testing.assert_frame_equal(payload['df'], df)
+        self.assertEqual(list(payload['df'].dtypes), list(df.dtypes))
+
+    def test_round_trip_compressed(self):
+        serializer = ColumnarSerializer(
+            compression='zlib', compression_min_size=0)
+        df = pd.concat([self.get_df()] * 100, ignore_index=True)
+        blob = serializer.dumps(get_payload(df))
+        pd.testing.assert_frame_equal(serializer.loads(blob)['df'], df)
+
+    def test_round_trip_empty_and_missing_df(self):
+        serializer = ColumnarSerializer()
+        df = self.get_df().iloc[0:0].reset_index(drop=True)
+        payload = serializer.loads(serializer.dumps(get_payload(df)))
+        self.assertTrue(payload['df'].empty)
+        self.assertEqual(list(payload['df'].columns), list(df.columns))
+
+        payload = serializer.loads(serializer.dumps(get_payload(None)))
+        self.assertIsNone(payload['df'])
+
+    def test_duplicate_column_names(self):
+        serializer = ColumnarSerializer()
+        df = pd.DataFrame([[1, 2], [3, 4]], columns=['a', 'a'])
+        payload = serializer.loads(serializer.dumps(get_payload(df)))
+        pd.testing.assert_frame_equal(payload['df'], df)
+
+    def test_loads_columns(self):
+        serializer = ColumnarSerializer(compression='zlib')
+        df = self.get_df()
+        payload = serializer.loads(
+            serializer.dumps(get_payload(df)), columns=['num', 'name'])
+        pd.testing.assert_frame_equal(payload['df'], df[['name', 'num']])
+
+        blob = PickleSerializer().dumps(get_payload(df))
+        payload = serializer.loads(blob, columns=['num'])
+        pd.testing.assert_frame_equal(payload['df'], df[['num']])
+
+    def test_unsupported_frames_fall_back_to_pickle(self):
+        serializer = ColumnarSerializer()
+        mixed = pd.DataFrame({'a': ['foo', 1, datetime(2018, 1, 1)]})
+        with self.assertRaises(UnsupportedFrameException):
+            serializer.encode_frame(mixed, [])
+        blob = serializer.dumps(get_payload(mixed))
+        self.assertFalse(ColumnarSerializer.is_columnar(blob))
+        pd.testing.assert_frame_equal(serializer.loads(blob)['df'], mixed)
+
+        indexed = self.get_df().set_index('name')
+        blob = serializer.dumps(get_payload(indexed))
+        self.assertFalse(ColumnarSerializer.is_columnar(blob))
+        pd.testing.assert_frame_equal(serializer.loads(blob)['df'], indexed)
+
+    def test_reads_pickled_entries(self):
+        df = self.get_df()
+        blob = PickleSerializer().dumps(get_payload(df))
+        payload = ColumnarSerializer().loads(blob)
+        pd.testing.assert_frame_equal(payload['df'], df)
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            ColumnarSerializer(compression='foo')
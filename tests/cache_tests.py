@@ -6,8 +6,14 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import json
+import threading
+import unittest
+
+from mock import patch
+from werkzeug.contrib.cache import SimpleCache
 
 from superset import cache, db, utils
+from superset.cache_util import SingleFlight
 from .base_tests import SupersetTestCase
 
 
@@ -39,3 +45,68 @@ class CacheTests(SupersetTestCase):
         self.assertEqual(resp_from_cache['status'], utils.QueryStatus.SUCCESS)
         self.assertEqual(resp['data'], resp_from_cache['data'])
         self.assertEqual(resp['query'], resp_from_cache['query'])
+
+
+class SingleFlightTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SimpleCache()
+
+    def test_acquire_when_free(self):
+        single_flight = SingleFlight(self.cache)
+        lock = single_flight.acquire('key')
+        self.assertIsNotNone(lock)
+        self.assertEqual(
+            self.cache.get(SingleFlight.lock_key('key')), lock.token)
+        lock.release()
+        self.assertIsNone(self.cache.get(SingleFlight.lock_key('key')))
+        self.assertIsNotNone(single_flight.acquire('key'))
+
+    def test_concurrent_callers_wait_for_the_leader(self):
+        single_flight = SingleFlight(self.cache, timeout=10)
+        lock = single_flight.acquire('key')
+        results = []
+
+        def follow():
+            results.append(single_flight.acquire('key'))
+            results.append(self.cache.get('key'))
+
+        threads = [threading.Thread(target=follow) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.cache.set('key', 'value')
+        lock.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [None, 'value'] * 3)
+
+    def test_waits_for_lock_held_by_other_process(self):
+        other_process = SingleFlight(self.cache)
+        lock = other_process.acquire('key')
+        single_flight = SingleFlight(self.cache, timeout=10, poll_interval=0.01)
+
+        def set_value():
+            self.cache.set('key', 'value')
+            lock.release()
+
+        timer = threading.Timer(0.1, set_value)
+        timer.start()
+        self.assertIsNone(single_flight.acquire('key'))
+        timer.join()
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_gives_up_after_timeout(self):
+        SingleFlight(self.cache).acquire('key')
+        single_flight = SingleFlight(self.cache, timeout=0.05, poll_interval=0.01)
+        self.assertIsNone(single_flight.acquire('key'))
+
+    def test_backend_error_releases_the_key(self):
+        single_flight = SingleFlight(self.cache, timeout=10)
+        with patch.object(self.cache, 'add', side_effect=IOError):
+            with self.assertRaises(IOError):
+                single_flight.acquire('key')
+        self.assertEqual(single_flight._events, {})
+        # the next caller doesn't wait for the failed one
+        lock = single_flight.acquire('key')
+        self.assertIsNotNone(lock)
+        lock.release()
@@ -228,6 +228,22 @@ class CoreTests(SupersetTestCase):
         assert len(resp) > 0
         assert 'Carbon Dioxide' in resp
 
+    def test_filter_endpoint_search(self):
+        self.login(username='admin')
+        tbl_id = self.table_ids.get('energy_usage')
+        url = '/superset/filter/table/{}/target/'.format(tbl_id)
+        values = self.get_json_resp(url)
+        self.assertIn('Carbon Dioxide', values)
+
+        resp = self.get_json_resp(url + '?q=carbon')
+        self.assertEqual(
+            resp,
+            sorted([v for v in values if v.lower().startswith('carbon')],
+                   key=lambda v: v.lower()))
+        resp = self.get_json_resp(url + '?q=dioxide&match=substring&limit=1')
+        self.assertEqual(resp, ['Carbon Dioxide'])
+        self.assertEqual(len(self.get_json_resp(url + '?limit=2')), 2)
+
     def test_slice_data(self):
         # slice data should have some required attributes
         self.login(username='admin')
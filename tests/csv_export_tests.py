@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import gzip
+import io
+import unittest
+
+import pandas as pd
+
+from superset import csv_export
+from superset.exceptions import SupersetException
+
+
+class CsvExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'name': ['a', 'b', None, 'd', 'é'],
+            'num': [1.5, 2, 3, None, 5],
+        }, columns=['name', 'num'])
+
+    def test_iter_csv(self):
+        chunks = list(csv_export.iter_csv(
+            csv_export.dataframe_chunks(self.df, 2), index=False))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunks), self.df.to_csv(index=False))
+
+    def test_iter_csv_empty(self):
+        df = self.df.iloc[:0]
+        chunks = csv_export.dataframe_chunks(df, 2)
+        self.assertEqual(
+            ''.join(csv_export.iter_csv(chunks)), df.to_csv(index=False))
+
+    def test_iter_gzip(self):
+        chunks = csv_export.iter_csv(csv_export.dataframe_chunks(self.df, 2))
+        data = b''.join(csv_export.iter_gzip(chunks))
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+            self.assertEqual(
+                f.read().decode('utf-8'), self.df.to_csv(index=False))
+
+    def test_records_chunks(self):
+        pages = [
+            self.df.iloc[:3].to_dict(orient='records'),
+            [],
+            self.df.iloc[3:].to_dict(orient='records'),
+        ]
+        chunks = csv_export.records_chunks(pages, ['name', 'num'])
+        self.assertEqual(
+            ''.join(csv_export.iter_csv(chunks)), self.df.to_csv(index=False))
+
+        chunks = csv_export.records_chunks([], ['name', 'num'])
+        self.assertEqual(''.join(csv_export.iter_csv(chunks)), 'name,num\n')
+
+    def test_records_chunks_missing_page(self):
+        pages = [self.df.iloc[:3].to_dict(orient='records'), None]
+        chunks = csv_export.records_chunks(pages, ['name', 'num'])
+        with self.assertRaises(SupersetException):
+            list(csv_export.iter_csv(chunks))
+
+    def test_records_chunks_dtypes(self):
+        # a NULL in an integer column is only found on the second page
+        pages = [
+            [{'name': 'a', 'num': 1}, {'name': 'b', 'num': 2}],
+            [{'name': 'c', 'num': None}, {'name': 'd', 'num': 4}],
+        ]
+        chunks = csv_export.records_chunks(pages, ['name', 'num'])
+        self.assertEqual(
+            ''.join(csv_export.iter_csv(chunks)),
+            'name,num\na,1\nb,2\nc,\nd,4\n')
+
+        pages = [[{'name': 'a', 'num': 1.5}], [{'name': 'b', 'num': 2}]]
+        chunks = csv_export.records_chunks(pages, ['name', 'num'])
+        self.assertEqual(
+            ''.join(csv_export.iter_csv(chunks)), 'name,num\na,1.5\nb,2.0\n')
@@ -76,6 +76,31 @@ class DashboardTests(SupersetTestCase):
         self.assertIn('editMode&#34;: true', resp)
         self.assertIn('standalone_mode&#34;: true', resp)
 
+    def test_slice_json_batch(self):
+        self.login(username='admin')
+        dash = (
+            db.session.query(models.Dashboard)
+            .filter_by(slug='births')
+            .first()
+        )
+        slice_ids = {slc.id for slc in dash.slices}
+        resp = self.get_resp(
+            '/superset/slice_json_batch/?dashboard_id={}'.format(dash.id))
+        lines = [json.loads(line) for line in resp.splitlines()]
+        self.assertEqual({line['slice_id'] for line in lines}, slice_ids)
+        for line in lines:
+            self.assertIn('payload', line)
+
+        slc = self.get_slice('Girls', db.session)
+        resp = self.get_resp(
+            '/superset/slice_json_batch/?slice_ids={}'.format(slc.id))
+        lines = [json.loads(line) for line in resp.splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['slice_id'], slc.id)
+
+        resp = self.client.get('/superset/slice_json_batch/?slice_ids=foo')
+        self.assertEqual(resp.status_code, 400)
+
     def test_save_dash(self, username='admin'):
         self.login(username=username)
         dash = db.session.query(models.Dashboard).filter_by(
@@ -4,6 +4,10 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from datetime import datetime
+
+import pandas as pd
+
 from superset.dataframe import dedup, SupersetDataFrame
 from superset.db_engine_specs import BaseEngineSpec
 from .base_tests import SupersetTestCase
@@ -129,3 +133,59 @@ class SupersetDataFrameTestCase(SupersetTestCase):
         )
         cdf = SupersetDataFrame(data, cursor_descr, BaseEngineSpec)
         self.assertListEqual(cdf.column_names, ['a', 'a__1'])
+
+    def test_data_conversion(self):
+        data = [
+            ('a', 1, 2 ** 60, 1.5, datetime(2018, 1, 1), 2 ** 60),
+            (None, -2 ** 60, 3, 2.5, None, 'b'),
+        ]
+        cursor_descr = [(c, None) for c in 'sijfdo']
+        cdf = SupersetDataFrame(data, cursor_descr, BaseEngineSpec)
+        self.assertEqual(cdf.data, [
+            {
+                's': 'a', 'i': 1, 'j': '1152921504606846976', 'f': 1.5,
+                'd': pd.Timestamp('2018-01-01'), 'o': '1152921504606846976',
+            },
+            {
+                's': None, 'i': '-1152921504606846976', 'j': 3, 'f': 2.5,
+                'd': pd.NaT, 'o': 'b',
+            },
+        ])
+        self.assertEqual(cdf.get_data(orient='columns'), {
+            'columns': ['s', 'i', 'j', 'f', 'd', 'o'],
+            'data': {
+                's': ['a', None],
+                'i': [1, '-1152921504606846976'],
+                'j': ['1152921504606846976', 3],
+                'f': [1.5, 2.5],
+                'd': [pd.Timestamp('2018-01-01'), pd.NaT],
+                'o': ['1152921504606846976', 'b'],
+            },
+        })
+
+    def test_data_empty(self):
+        cdf = SupersetDataFrame([], [('a', None)], BaseEngineSpec)
+        self.assertEqual(cdf.data, [])
+        self.assertEqual(
+            cdf.get_data(orient='columns'), {'columns': ['a'], 'data': {'a': []}})
+
+    def test_build_df_types(self):
+        data = [(i, i * 1.5, i % 2 == 0, 'a{}'.format(i)) for i in range(1000)]
+        # values the sample doesn't look at
+        data[501] = (None, 1, None, None)
+        cursor_descr = [(c, None) for c in 'abcd']
+        cdf = SupersetDataFrame(data, cursor_descr, BaseEngineSpec)
+        expected = pd.DataFrame(data, columns=list('abcd')).infer_objects()
+        self.assertEqual(list(cdf.df.dtypes), list(expected.dtypes))
+        self.assertTrue(cdf.df.equals(expected))
+
+    def test_infer_object_type(self):
+        self.assertEqual(
+            SupersetDataFrame.infer_object_type([None, 'a', 'b']), 'STRING')
+        self.assertEqual(
+            SupersetDataFrame.infer_object_type(
+                [datetime(2018, 1, 1)] * 99 + ['a']),
+            'DATETIME')
+        self.assertIsNone(
+            SupersetDataFrame.infer_object_type([datetime(2018, 1, 1), 'a']))
+        self.assertIsNone(SupersetDataFrame.infer_object_type([None]))
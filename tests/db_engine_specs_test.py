@@ -89,6 +89,37 @@ class DbEngineSpecsTestCase(SupersetTestCase):
         """.split('\n')  # noqa ignore: E501
         self.assertEquals(60, HiveEngineSpec.progress(log))
 
+    def test_hive_log_tracker(self):
+        log = [
+            '17/02/07 19:15:55 INFO ql.Driver: Total jobs = 2',
+            '17/02/07 19:15:55 INFO ql.Driver: Launching Job 1 out of 2',
+            '17/02/07 19:15:56 INFO exec.Task: Starting Job = job_1, '
+            'Tracking URL = http://host/proxy/application_1/',
+            '17/02/07 19:16:09 INFO exec.Task: 2017-02-07 19:16:09,173 '
+            'Stage-1 map = 40%,  reduce = 0%',
+            '17/02/07 19:15:55 INFO ql.Driver: Launching Job 2 out of 2',
+            '17/02/07 19:16:09 INFO exec.Task: 2017-02-07 19:16:09,173 '
+            'Stage-1 map = 40%,  reduce = 0%',
+        ]
+        # whole log on every call
+        tracker = db_engine_specs.HiveLogTracker(HiveEngineSpec)
+        self.assertEquals(log[:4], tracker.update('\n'.join(log[:4])))
+        self.assertEquals(10, tracker.progress)
+        self.assertEquals(
+            'http://host/proxy/application_1/', tracker.tracking_url)
+        self.assertEquals(log[4:], tracker.update('\n'.join(log) + '\n'))
+        self.assertEquals(60, tracker.progress)
+        self.assertEquals([], tracker.update('\n'.join(log) + '\n'))
+
+        # new lines only
+        tracker = db_engine_specs.HiveLogTracker(HiveEngineSpec)
+        self.assertEquals(log[:4], tracker.update('\n'.join(log[:4])))
+        self.assertEquals(log[4:], tracker.update('\n'.join(log[4:])))
+        self.assertEquals(60, tracker.progress)
+        self.assertEquals(
+            'http://host/proxy/application_1/',
+            HiveEngineSpec.get_tracking_url(log))
+
     def test_hive_error_msg(self):
         msg = (
             '{...} errorMessage="Error while compiling statement: FAILED: '
@@ -293,3 +324,22 @@ class DbEngineSpecsTestCase(SupersetTestCase):
                 defined_time_grains = {grain.duration for grain in cls.get_time_grains()}
                 intersection = time_grains.intersection(defined_time_grains)
                 self.assertSetEqual(defined_time_grains, intersection, cls_name)
+
+    def test_fetch_data_chunks(self):
+        rows = [(i,) for i in range(25)]
+
+        class Cursor(object):
+            def fetchmany(self, size):
+                chunk = rows[self.pos:self.pos + size]
+                self.pos += len(chunk)
+                return chunk
+
+        cursor = Cursor()
+        cursor.pos = 0
+        chunks = list(BaseEngineSpec.fetch_data_chunks(cursor, 0, 10))
+        self.assertEqual([10, 10, 5], [len(c) for c in chunks])
+
+        cursor.pos = 0
+        chunks = list(BaseEngineSpec.fetch_data_chunks(cursor, 12, 10))
+        self.assertEqual([10, 2], [len(c) for c in chunks])
+        self.assertEqual(rows[:12], chunks[0] + chunks[1])
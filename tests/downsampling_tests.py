@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from superset import downsampling
+
+
+def naive_lttb(x, y, threshold):
+    """Textbook LTTB, one series at a time"""
+    n = len(x)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    rows = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = end, edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        a = rows[-1]
+        areas = [
+            abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            for j in range(start, end)]
+        rows.append(start + int(np.argmax(areas)))
+    rows.append(n - 1)
+    return rows
+
+
+class DownsamplingTestCase(unittest.TestCase):
+
+    def get_df(self, rows=2000):
+        rng = np.random.RandomState(0)
+        return pd.DataFrame(
+            rng.randn(rows, 3).cumsum(axis=0),
+            columns=['a', 'b', 'c'],
+            index=pd.date_range('2018-01-01', periods=rows, freq='min'))
+
+    def test_lttb(self):
+        df = self.get_df()
+        rows = downsampling.get_rows('lttb', df, 100)
+        self.assertEqual(rows.shape, (100, 3))
+        x = np.arange(len(df.index), dtype=float) * 60
+        for i in range(3):
+            self.assertEqual(
+                rows[:, i].tolist(), naive_lttb(x, df.iloc[:, i].values, 100))
+
+    def test_minmax(self):
+        df = self.get_df()
+        df.iloc[1234, 1] = np.nan
+        rows = downsampling.get_rows('minmax', df, 100)
+        self.assertEqual(rows.shape, (100, 3))
+        self.assertTrue((np.diff(rows, axis=0) >= 0).all())
+        for i in range(3):
+            values = df.iloc[:, i].values
+            self.assertEqual(np.nanmax(values[rows[:, i]]), np.nanmax(values))
+            self.assertEqual(np.nanmin(values[rows[:, i]]), np.nanmin(values))
+
+    def test_small_frames_are_kept(self):
+        df = self.get_df(50)
+        self.assertIsNone(downsampling.get_rows('lttb', df, 100))
+        self.assertIsNone(downsampling.get_rows('minmax', df, 50))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            downsampling.get_rows('foo', self.get_df(), 100)
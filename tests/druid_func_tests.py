@@ -4,19 +4,28 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from datetime import datetime, timedelta
 import json
 import unittest
 
-from mock import Mock
+from dateutil.parser import parse as dparse
+from mock import Mock, patch
+import pandas as pd
+from pydruid.client import PyDruid
 from pydruid.utils.dimensions import MapLookupExtraction, RegexExtraction
 import pydruid.utils.postaggregator as postaggs
+from werkzeug.contrib.cache import SimpleCache
 
 
+from superset.connectors.druid.capabilities import (
+    ClusterCapabilitiesCache, get_query_types,
+)
 import superset.connectors.druid.models as models
 from superset.connectors.druid.models import (
-    DruidColumn, DruidDatasource, DruidMetric,
+    DruidCluster, DruidColumn, DruidDatasource, DruidMetric,
 )
 from superset.exceptions import SupersetException
+from .mock_druid_broker import MockDruidBroker, topn_responder
 
 
 def mock_metric(metric_name, is_postagg=False):
@@ -914,3 +923,143 @@ class DruidFuncTestCase(unittest.TestCase):
         metric_names = ['sum1', 'div1']
         self.assertRaises(
             SupersetException, ds.get_aggregations, metrics_dict, metric_names)
+
+    def test_run_query_caches_pre_query(self):
+        broker = MockDruidBroker(topn_responder(['Canada', 'USA']))
+        broker.start()
+        self.addCleanup(broker.stop)
+        ds = DruidDatasource(datasource_name='datasource')
+        ds.get_having_filters = Mock(return_value=[])
+        ds.columns = [DruidColumn(column_name='dim1')]
+        ds.metrics = [DruidMetric(
+            metric_name='sum1',
+            metric_type='doubleSum',
+            json=json.dumps(
+                {'type': 'doubleSum', 'name': 'sum1', 'fieldName': 'sum1'}),
+        )]
+        from_dttm = datetime(2012, 1, 1)
+        to_dttm = datetime(2012, 2, 1)
+        with patch.object(models, 'cache', SimpleCache()):
+            for granularity in ('day', 'week', 'day'):
+                client = PyDruid(broker.url, broker.endpoint)
+                ds.run_query(
+                    ['dim1'], ['sum1'], granularity, from_dttm, to_dttm,
+                    timeseries_limit=2, client=client, order_desc=True,
+                    filter=[],
+                )
+                df = client.export_pandas()
+                self.assertEqual(['Canada', 'USA'], list(df['dim1']))
+        queries = broker.queries_of_type('topN')
+        # a single phase 1 query for the three phase 2 queries
+        self.assertEqual(4, len(queries))
+        self.assertEqual('all', queries[0]['granularity'])
+        self.assertNotIn('all', [q['granularity'] for q in queries[1:]])
+
+        # forced queries don't read the cached phase 1 result
+        with patch.object(models, 'cache', SimpleCache()):
+            for force in (False, True):
+                ds.run_query(
+                    ['dim1'], ['sum1'], 'day', from_dttm, to_dttm,
+                    timeseries_limit=2, order_desc=True, filter=[],
+                    client=PyDruid(broker.url, broker.endpoint), force=force,
+                )
+        queries = broker.queries_of_type('topN')
+        self.assertEqual(8, len(queries))
+        self.assertEqual(
+            [True, False, True, False],
+            [q['granularity'] == 'all' for q in queries[4:]])
+
+    def test_homogenize_types(self):
+        df = pd.DataFrame({
+            'num': [1.0, None, 2.0, 1.0],
+            'name': ['a', None, 'b', 'a'],
+        })
+        df = DruidDatasource.homogenize_types(df, ['num', 'name'])
+        self.assertEqual(['1.0', '<NULL>', '2.0', '1.0'], df['num'].tolist())
+        self.assertEqual(['a', '<NULL>', 'b', 'a'], df['name'].tolist())
+
+    def test_offset_timestamps(self):
+        timestamps = pd.Series(
+            ['2012-01-01T00:00:00.000Z', '2012-01-07T12:30:00.000Z'])
+        offset = DruidDatasource.time_offset('week_ending_saturday')
+        expected = [
+            dparse(ts).replace(tzinfo=models.DRUID_TZ) +
+            timedelta(milliseconds=offset)
+            for ts in timestamps]
+        self.assertEqual(
+            expected,
+            DruidDatasource.offset_timestamps(timestamps, offset).tolist())
+        # not all in the same format
+        timestamps = pd.Series(['2012-01-01T00:00:00Z', '2012-01-07'])
+        self.assertEqual(
+            [dparse(ts).replace(tzinfo=models.DRUID_TZ) for ts in timestamps],
+            DruidDatasource.offset_timestamps(timestamps, 0).tolist())
+
+        # timestamps pandas can't parse at once are parsed row by row
+        to_datetime = pd.to_datetime
+
+        def fail_vectorized(arg, **kwargs):
+            if kwargs.get('utc'):
+                raise ValueError('Unknown string format')
+            return to_datetime(arg, **kwargs)
+
+        with patch.object(models.pd, 'to_datetime', side_effect=fail_vectorized):
+            self.assertEqual(
+                expected[:1],
+                DruidDatasource.offset_timestamps(
+                    pd.Series(['2012-01-01T00:00:00.000Z']), offset).tolist())
+
+
+class ClusterCapabilitiesCacheTestCase(unittest.TestCase):
+
+    def get_cluster(self, version='0.12.1'):
+        cluster = DruidCluster(
+            cluster_name='druid', coordinator_host='localhost',
+            coordinator_port=8081)
+        cluster.get_druid_version = Mock(return_value=version)
+        cluster.get_lookups = Mock(return_value=['country_names'])
+        return cluster
+
+    def test_get_query_types(self):
+        self.assertNotIn('scan', get_query_types('0.10.1'))
+        self.assertIn('scan', get_query_types('0.12.1'))
+
+    def test_get(self):
+        cache = ClusterCapabilitiesCache(timeout=60)
+        cluster = self.get_cluster()
+        self.assertIsNone(cache.get_age(cluster))
+        capabilities = cache.get(cluster)
+        self.assertEqual('0.12.1', capabilities['version'])
+        self.assertEqual(['country_names'], capabilities['lookups'])
+        self.assertIn('scan', capabilities['query_types'])
+        self.assertLess(cache.get_age(cluster), 60)
+
+        # other instances of the cluster share the entry
+        other = self.get_cluster()
+        self.assertIs(capabilities, cache.get(other))
+        other.get_druid_version.assert_not_called()
+
+        cache.get(cluster, force=True)
+        self.assertEqual(2, cluster.get_druid_version.call_count)
+
+    @patch('superset.connectors.druid.capabilities.time')
+    def test_timeout(self, mock_time):
+        cache = ClusterCapabilitiesCache(timeout=60)
+        cluster = self.get_cluster()
+        mock_time.time.return_value = 1000
+        cache.get(cluster)
+        mock_time.time.return_value = 1050
+        cache.get(cluster)
+        self.assertEqual(1, cluster.get_druid_version.call_count)
+        mock_time.time.return_value = 1061
+        cache.get(cluster)
+        self.assertEqual(2, cluster.get_druid_version.call_count)
+
+    def test_druid_version(self):
+        cluster = self.get_cluster('0.10.0')
+        with patch.object(models, 'capabilities_cache', ClusterCapabilitiesCache()):
+            self.assertIsNone(cluster.data['capabilities_age'])
+            for _ in range(3):
+                self.assertEqual('0.10.0', cluster.druid_version)
+            self.assertIsNotNone(cluster.data['capabilities_age'])
+        self.assertEqual(1, cluster.get_druid_version.call_count)
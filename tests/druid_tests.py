@@ -15,7 +15,9 @@ from superset import db, security_manager
 from superset.connectors.druid.models import (
     DruidCluster, DruidColumn, DruidDatasource, DruidMetric,
 )
+from superset.viz import FilterBoxViz
 from .base_tests import SupersetTestCase
+from .mock_druid_broker import MockDruidBroker, topn_responder
 
 
 class PickableMock(Mock):
@@ -531,6 +533,41 @@ class DruidTests(SupersetTestCase):
             {'__time', 'dim1', 'dim2', 'metric1'},
         )
 
+    def test_filter_box_queries_run_concurrently(self):
+        broker = MockDruidBroker(topn_responder(['Canada', 'USA']), delay=0.2)
+        broker.start()
+        self.addCleanup(broker.stop)
+        host, port = broker.url.rsplit(':', 1)
+        cluster = DruidCluster(
+            cluster_name='mock_broker',
+            broker_host=host,
+            broker_port=int(port),
+            broker_endpoint=broker.endpoint)
+        datasource = DruidDatasource(
+            datasource_name='test_datasource', cluster=cluster)
+        datasource.columns = [
+            DruidColumn(column_name='dim1', groupby=True),
+            DruidColumn(column_name='dim2', groupby=True),
+        ]
+        datasource.metrics = [DruidMetric(
+            metric_name='metric1',
+            metric_type='longSum',
+            json=json.dumps(
+                {'type': 'longSum', 'name': 'metric1', 'fieldName': 'metric1'}),
+        )]
+        form_data = {
+            'viz_type': 'filter_box',
+            'groupby': ['dim1', 'dim2'],
+            'metric': 'metric1',
+            'since': '2012-01-01',
+            'until': '2012-02-01',
+        }
+        viz_obj = FilterBoxViz(datasource, form_data, force=True)
+        viz_obj.run_extra_queries()
+        self.assertEqual(2, broker.max_in_flight)
+        self.assertEqual(['Canada', 'USA'], list(viz_obj.dataframes['dim1']['dim1']))
+        self.assertEqual(['Canada', 'USA'], list(viz_obj.dataframes['dim2']['dim2']))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""An in-process Druid broker to run Druid queries against in tests"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import threading
+import time
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockDruidBroker(object):
+    """Answers the queries POSTed by pydruid clients with canned results
+
+    ``responder`` is called with every query (the JSON body as a dict) and
+    returns the result to send back. Queries are recorded in ``queries``,
+    and ``max_in_flight`` tells how many were being answered at once, each
+    answer taking at least ``delay`` seconds. Point a client at it with
+    ``PyDruid(broker.url, broker.endpoint)`` once ``start`` was called.
+    """
+
+    endpoint = 'druid/v2'
+
+    def __init__(self, responder, delay=0):
+        self.responder = responder
+        self.delay = delay
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def queries_of_type(self, query_type):
+        return [q for q in self.queries if q['queryType'] == query_type]
+
+    def start(self):
+        broker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                query = json.loads(self.rfile.read(length).decode('utf-8'))
+                body = json.dumps(broker.answer(query)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, query):
+        with self._lock:
+            self.queries.append(query)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return self.responder(query)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def topn_responder(values, metric='metric1'):
+    """Returns a responder answering topN queries with ``values``"""
+    def respond(query):
+        dimension = query['dimension']
+        if isinstance(dimension, dict):
+            dimension = dimension['outputName']
+        return [{
+            'timestamp': '2012-01-01T00:00:00.000Z',
+            'result': [
+                {dimension: value, metric: i + 1}
+                for i, value in enumerate(values)
+            ],
+        }]
+    return respond
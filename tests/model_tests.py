@@ -4,12 +4,22 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from datetime import datetime, timedelta
 import textwrap
+import unittest
 
+from mock import Mock, patch
 from sqlalchemy.engine.url import make_url
-
-from superset import app, db
+from sqlalchemy.pool import NullPool
+
+from superset import app, db, viz
+from superset.connectors.sqla import models as sqla_models
+from superset.connectors.sqla import query_cache
+from superset.connectors.sqla.query_cache import CompiledQueryCache
+from superset.db_engine_specs import TopGroupsFilter
+from superset.engine_registry import EngineRegistry, StatsQueuePool
 from superset.models.core import Database
+from superset.utils import GROUPING_SET_ALIAS, TIME_OFFSET_ALIAS
 from .base_tests import SupersetTestCase
 
 
@@ -76,6 +86,17 @@ class DatabaseModelTestCase(SupersetTestCase):
         user_name = make_url(model.get_sqla_engine(user_name=example_user).url).username
         self.assertNotEquals(example_user, user_name)
 
+    def test_get_sqla_engine_is_shared(self):
+        model = Database(sqlalchemy_uri='mysql://root@localhost/superset')
+        engine = model.get_sqla_engine()
+        self.assertIs(engine, model.get_sqla_engine())
+        self.assertIsNot(engine, model.get_sqla_engine(schema='staging'))
+        self.assertIsInstance(engine.pool, StatsQueuePool)
+
+        nullpool_engine = model.get_sqla_engine(nullpool=True)
+        self.assertIsNot(engine, nullpool_engine)
+        self.assertIsInstance(nullpool_engine.pool, NullPool)
+
     def test_select_star(self):
         main_db = self.get_main_database(db.session)
         table_name = 'bart_lines'
@@ -210,3 +231,297 @@ class SqlaTableModelTestCase(SupersetTestCase):
         self.assertIn('--COMMENT', sql)
 
         app.config['SQL_QUERY_MUTATOR'] = None
+
+    def test_query_cache(self):
+        tbl = self.get_table_by_name('birth_names')
+        query_obj = dict(
+            groupby=['name'],
+            metrics=['sum__num'],
+            filter=[{'col': 'gender', 'op': '==', 'val': 'boy'}],
+            is_timeseries=False,
+            granularity=None,
+            from_dttm=None, to_dttm=None,
+            is_prequery=False,
+            prequeries=[],
+            extras={},
+        )
+        sqla_models.query_cache.clear()
+        with patch.object(tbl, 'get_sqla_query', wraps=tbl.get_sqla_query) as build:
+            sql = tbl.get_query_str(dict(query_obj))
+            self.assertEqual(sql, tbl.get_query_str(dict(query_obj)))
+            self.assertEqual(build.call_count, 1)
+
+            query_obj['filter'] = [{'col': 'gender', 'op': '==', 'val': 'girl'}]
+            self.assertIn('girl', tbl.get_query_str(dict(query_obj)))
+            self.assertEqual(build.call_count, 2)
+
+            query_obj['extras'] = {'where': "name = '{{ current_username() }}'"}
+            self.assertIsNone(tbl.get_query_cache_key(query_obj))
+
+    def test_query_cache_relative_time_range(self):
+        tbl = self.get_table_by_name('birth_names')
+        now = datetime(2018, 6, 1, 12, 0, 0)
+        query_obj = dict(
+            groupby=['name'],
+            metrics=['sum__num'],
+            filter=[],
+            is_timeseries=False,
+            granularity='ds',
+            from_dttm=now - timedelta(days=7), to_dttm=now,
+            is_prequery=False,
+            prequeries=[],
+            extras={},
+        )
+        sqla_models.query_cache.clear()
+        with patch.object(tbl, 'get_sqla_query', wraps=tbl.get_sqla_query) as build:
+            sql = tbl.get_query_str(dict(query_obj))
+            self.assertIn('2018-05-25 12:00:00', sql)
+            self.assertIn('2018-06-01 12:00:00', sql)
+            # a few seconds later, e.g. "7 days ago" to "now"
+            later = now + timedelta(seconds=5)
+            sql = tbl.get_query_str(dict(
+                query_obj, from_dttm=later - timedelta(days=7), to_dttm=later))
+            self.assertIn('2018-05-25 12:00:05', sql)
+            self.assertIn('2018-06-01 12:00:05', sql)
+            self.assertNotIn('__superset_time_bound', sql)
+            self.assertEqual(build.call_count, 1)
+            self.assertEqual(len(sqla_models.query_cache), 1)
+
+    def test_time_offsets_query(self):
+        tbl = self.get_table_by_name('birth_names')
+        query_obj = dict(
+            groupby=['gender'],
+            metrics=['sum__num'],
+            filter=[],
+            is_timeseries=True,
+            timeseries_limit=0,
+            granularity='ds',
+            from_dttm=datetime(2018, 1, 8), to_dttm=datetime(2018, 1, 15),
+            is_prequery=False,
+            prequeries=[],
+            extras={},
+            time_offsets=[timedelta(days=1), timedelta(days=7)],
+        )
+        self.assertTrue(tbl.can_query_time_offsets(query_obj))
+        sql = tbl.get_query_str(query_obj)
+        self.assertEqual(1, sql.count('UNION ALL'))
+        self.assertIn(TIME_OFFSET_ALIAS, sql)
+        self.assertIn('2018-01-07', sql)
+        self.assertIn('2018-01-01', sql)
+
+        df = tbl.query(query_obj).df
+        self.assertIn(TIME_OFFSET_ALIAS, df.columns)
+
+        # the shifted queries are subqueries of a UNION ALL
+        db_engine_spec = tbl.database.db_engine_spec
+        with patch.object(db_engine_spec, 'allows_subquery', False):
+            self.assertFalse(tbl.can_query_time_offsets(query_obj))
+            test_viz = viz.NVD3TimeSeriesViz(tbl, {
+                'metrics': ['sum__num'], 'granularity_sqla': 'ds'})
+            query_objs = [
+                dict(
+                    query_obj,
+                    inner_from_dttm=query_obj['from_dttm'],
+                    inner_to_dttm=query_obj['to_dttm'],
+                    from_dttm=query_obj['from_dttm'] - offset,
+                    to_dttm=query_obj['to_dttm'] - offset)
+                for offset in query_obj.pop('time_offsets')]
+            self.assertIsNone(test_viz.combine_query_objs(query_objs))
+
+    def test_grouping_sets_query(self):
+        tbl = self.get_table_by_name('birth_names')
+        query_obj = dict(
+            groupby=['gender', 'state'],
+            metrics=['sum__num'],
+            filter=[],
+            is_timeseries=False,
+            granularity=None,
+            from_dttm=None, to_dttm=None,
+            row_limit=2,
+            is_prequery=False,
+            prequeries=[],
+            extras={},
+            grouping_sets=True,
+        )
+        self.assertTrue(tbl.can_query_grouping_sets(query_obj))
+        db_engine_spec = tbl.database.db_engine_spec
+        with patch.object(db_engine_spec, 'supports_grouping_sets', False):
+            self.assertIn('UNION ALL', tbl.get_query_str(query_obj))
+            df = tbl.query(query_obj).df
+        self.assertEqual(
+            [0, 0, 1, 1], sorted(df[GROUPING_SET_ALIAS].astype(int)))
+
+        sqla_models.query_cache.clear()
+        with patch.object(db_engine_spec, 'supports_grouping_sets', True):
+            sql = tbl.get_query_str(query_obj)
+        self.assertIn('GROUPING SETS', sql)
+        self.assertIn('row_number()', sql.lower())
+
+    def test_top_groups_filter(self):
+        tbl = self.get_table_by_name('birth_names')
+        query_obj = dict(
+            groupby=['gender', 'state'],
+            metrics=['sum__num'],
+            filter=[],
+            is_timeseries=True,
+            timeseries_limit=5,
+            granularity='ds',
+            from_dttm=None, to_dttm=None,
+            is_prequery=False,
+            prequeries=[],
+            extras={},
+        )
+        db_engine_spec = tbl.database.db_engine_spec
+        expected = {
+            TopGroupsFilter.OR: ') OR (',
+            TopGroupsFilter.TUPLE_IN: '(gender, state) IN ((',
+            TopGroupsFilter.VALUES: 'JOIN (VALUES (',
+        }
+        dfs = []
+        for strategy, clause in expected.items():
+            sqla_models.query_cache.clear()
+            with patch.object(db_engine_spec, 'inner_joins', False), \
+                    patch.object(db_engine_spec, 'top_groups_filter', strategy):
+                self.assertIn(clause, tbl.get_query_str(query_obj))
+                # SQLite doesn't name the columns of VALUES derived tables
+                if strategy != TopGroupsFilter.VALUES:
+                    dfs.append(tbl.query(query_obj).df)
+        dfs = [
+            df.sort_values(list(df.columns)).reset_index(drop=True) for df in dfs]
+        self.assertEqual(len(dfs[0].groupby(['gender', 'state'])), 5)
+        self.assertTrue(dfs[0].equals(dfs[1]))
+
+        sqla_models.query_cache.clear()
+        query_obj['groupby'] = ['state']
+        with patch.object(db_engine_spec, 'inner_joins', False):
+            self.assertIn('state IN (', tbl.get_query_str(query_obj))
+
+
+class EngineRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stats_logger = Mock()
+        self.registry = EngineRegistry(
+            max_engines=2, idle_timeout=60, stats_logger=self.stats_logger,
+            pool_params={'pool_size': 2})
+
+    def tearDown(self):
+        self.registry.clear()
+
+    def test_get_engine(self):
+        url = 'mysql://root@localhost/superset'
+        engine = self.registry.get_engine(1, url, {})
+        self.assertIs(engine, self.registry.get_engine(1, url, {}))
+        self.assertEqual(engine.pool.size(), 2)
+        self.assertIsNot(engine, self.registry.get_engine(1, url, {}, 'alice'))
+        self.assertIsNot(
+            engine, self.registry.get_engine(1, url, {'echo': True}))
+        self.stats_logger.incr.assert_any_call('engine_registry.hit')
+
+    def test_engine_params_poolclass(self):
+        engine = self.registry.get_engine(
+            1, 'mysql://root@localhost/superset', {'poolclass': NullPool})
+        self.assertIsInstance(engine.pool, NullPool)
+        engine = self.registry.get_engine(
+            1, 'sqlite://', {}, pooled=False)
+        self.assertNotIsInstance(engine.pool, StatsQueuePool)
+
+    def test_max_engines(self):
+        urls = ['mysql://root@localhost/db{}'.format(i) for i in range(3)]
+        for url in urls:
+            self.registry.get_engine(1, url, {})
+        self.assertEqual(len(self.registry), 2)
+        keys = [key[1] for key in self.registry._engines]
+        self.assertEqual(keys, urls[1:])
+
+    @patch('superset.engine_registry.time')
+    def test_idle_eviction(self, mock_time):
+        mock_time.time.return_value = 0
+        url = 'mysql://root@localhost/superset'
+        engine = self.registry.get_engine(1, url, {})
+        mock_time.time.return_value = 61
+        self.assertIsNot(engine, self.registry.get_engine(1, url, {}))
+
+    def test_invalidate(self):
+        engine = self.registry.get_engine(1, 'mysql://root@localhost/db1', {})
+        self.registry.get_engine(2, 'mysql://root@localhost/db2', {})
+        self.registry.invalidate(1)
+        self.assertEqual(len(self.registry), 1)
+        self.assertIsNot(
+            engine, self.registry.get_engine(1, 'mysql://root@localhost/db1', {}))
+
+    def test_disabled(self):
+        registry = EngineRegistry(max_engines=0)
+        url = 'mysql://root@localhost/superset'
+        self.assertIsNot(
+            registry.get_engine(1, url, {}), registry.get_engine(1, url, {}))
+        self.assertEqual(len(registry), 0)
+
+
+class CompiledQueryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stats_logger = Mock()
+        self.cache = CompiledQueryCache(max_size=2, stats_logger=self.stats_logger)
+
+    def test_get_key(self):
+        query_obj = {
+            'groupby': ['name'],
+            'filter': [{'col': 'name', 'op': '==', 'val': 'Aaron'}],
+            'is_prequery': False,
+            'prequeries': [],
+        }
+        key = self.cache.get_key(1, ['2018-01-01'], query_obj)
+        self.assertEqual(key[0], 1)
+        self.assertEqual(key, self.cache.get_key(1, ['2018-01-01'], dict(
+            query_obj,
+            filter=query_obj['filter'] + [{'col': '', 'op': '=='}],
+            is_prequery=True,
+            prequeries=['SELECT 1'])))
+        self.assertNotEqual(key, self.cache.get_key(1, ['2018-01-02'], query_obj))
+        self.assertNotEqual(
+            key, self.cache.get_key(1, ['2018-01-01'], dict(query_obj, groupby=[])))
+
+        query_obj['from_dttm'] = datetime(2018, 1, 1)
+        key = self.cache.get_key(1, ['2018-01-01'], query_obj)
+        self.assertEqual(key, self.cache.get_key(1, ['2018-01-01'], dict(
+            query_obj, from_dttm=datetime(2018, 1, 1, 0, 0, 5))))
+        self.assertNotEqual(key, self.cache.get_key(1, ['2018-01-01'], dict(
+            query_obj, from_dttm=None)))
+
+    def test_render_time_bounds(self):
+        query_obj = {
+            'from_dttm': datetime(2018, 1, 8),
+            'to_dttm': datetime(2018, 1, 15),
+            'inner_from_dttm': None,
+        }
+        template_query_obj, rendered = query_cache.get_template_query_obj(
+            query_obj)
+        self.assertIsNone(template_query_obj['inner_from_dttm'])
+        sql = '{} AND {} AND {}'.format(
+            template_query_obj['from_dttm'].render('ds'),
+            template_query_obj['to_dttm'].render('ds'),
+            (template_query_obj['to_dttm'] - timedelta(days=7)).render('ds'))
+        sql = query_cache.render_time_bounds(
+            sql, rendered, query_obj,
+            lambda column_name, dttm: '{}:{}'.format(column_name, dttm.date()))
+        self.assertEqual(
+            sql, 'ds:2018-01-08 AND ds:2018-01-15 AND ds:2018-01-08')
+
+    def test_lru(self):
+        self.assertIsNone(self.cache.get((1, 'a')))
+        self.cache.set((1, 'a'), 'SELECT a')
+        self.cache.set((1, 'b'), 'SELECT b')
+        self.assertEqual(self.cache.get((1, 'a')), 'SELECT a')
+        self.cache.set((2, 'c'), 'SELECT c')
+        self.assertIsNone(self.cache.get((1, 'b')))
+        self.assertEqual(len(self.cache), 2)
+        self.stats_logger.incr.assert_any_call('sqla_query_cache.hit')
+        self.stats_logger.incr.assert_any_call('sqla_query_cache.miss')
+
+    def test_invalidate(self):
+        self.cache.set((1, 'a'), 'SELECT a')
+        self.cache.set((2, 'b'), 'SELECT b')
+        self.cache.invalidate(1)
+        self.assertIsNone(self.cache.get((1, 'a')))
+        self.assertEqual(self.cache.get((2, 'b')), 'SELECT b')
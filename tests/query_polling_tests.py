@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from mock import Mock, patch
+from werkzeug.contrib.cache import SimpleCache
+
+from superset import query_polling
+from superset.models.sql_lab import Query
+from superset.utils import QueryStatus
+
+
+class CancellationChannelTestCase(unittest.TestCase):
+
+    def test_stop(self):
+        channel = query_polling.CancellationChannel(SimpleCache())
+        query = Mock(client_id='abc')
+        session = Mock()
+        self.assertFalse(channel.is_stopped(query, session))
+        channel.stop(query)
+        self.assertTrue(channel.is_stopped(query, session))
+        self.assertFalse(channel.is_stopped(Mock(client_id='def'), session))
+        # the metadata database isn't read
+        session.query.assert_not_called()
+
+    def test_stop_without_backend(self):
+        channel = query_polling.CancellationChannel()
+        query = Query(id=1, client_id='abc')
+        session = Mock()
+        scalar = session.query.return_value.filter_by.return_value.scalar
+        scalar.return_value = QueryStatus.RUNNING
+        channel.stop(query)
+        self.assertFalse(channel.is_stopped(query, session))
+        scalar.return_value = QueryStatus.STOPPED
+        self.assertTrue(channel.is_stopped(query, session))
+        scalar.return_value = QueryStatus.TIMED_OUT
+        self.assertTrue(channel.is_stopped(query, session))
+
+
+class PollingTestCase(unittest.TestCase):
+
+    def test_backoff(self):
+        backoff = query_polling.Backoff(1, 3, factor=2)
+        self.assertEqual(
+            [1, 2, 3, 3], [backoff.next() for _ in range(4)])
+        backoff.reset()
+        self.assertEqual(1, backoff.next())
+        self.assertEqual(5, query_polling.Backoff(5, 3).next())
+
+    def test_is_progress_step(self):
+        with patch.dict(query_polling.config, {'SQLLAB_PROGRESS_MIN_STEP': 5}):
+            self.assertTrue(query_polling.is_progress_step(None, 5))
+            self.assertFalse(query_polling.is_progress_step(0, 4.9))
+            self.assertTrue(query_polling.is_progress_step(10, 15))
+            self.assertFalse(query_polling.is_progress_step(15, 10))
+            self.assertTrue(query_polling.is_progress_step(98, 100))
+            self.assertFalse(query_polling.is_progress_step(100, 100))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+import geohash
+import numpy as np
+
+from superset.spatial import (
+    decode_geohashes, GEOHASH_ALPHABET, parse_coordinate_pairs,
+)
+
+
+class SpatialTestCase(unittest.TestCase):
+
+    def test_decode_geohashes(self):
+        rng = np.random.RandomState(0)
+        hashes = [
+            ''.join(rng.choice(list(GEOHASH_ALPHABET), rng.randint(1, 13)))
+            for _ in range(500)
+        ]
+        lat, lon, nulls, errors = decode_geohashes(hashes)
+        self.assertFalse(nulls.any())
+        self.assertFalse(errors.any())
+        self.assertEqual(
+            list(zip(lat.tolist(), lon.tolist())),
+            [geohash.decode(h) for h in hashes])
+
+    def test_decode_geohashes_errors(self):
+        lat, lon, nulls, errors = decode_geohashes(
+            ['ezs42', None, 'ezs4a', 'ézs42'])
+        self.assertEqual(nulls.tolist(), [False, True, False, False])
+        self.assertEqual(errors.tolist(), [False, False, True, True])
+        self.assertEqual((lat[0], lon[0]), geohash.decode('ezs42'))
+        self.assertTrue(np.isnan(lat[1:]).all())
+        self.assertTrue(np.isnan(lon[1:]).all())
+
+    def test_parse_coordinate_pairs(self):
+        lat, lon, nulls, errors = parse_coordinate_pairs([
+            '1.23, 3.21', '1.23 3.21', '-1,2', None, '', '91, 0',
+            '41 24.2028, 2 10.4418', '1, 2, 3', 'foo'])
+        self.assertEqual(
+            nulls.tolist(),
+            [False, False, False, True, True, False, False, False, False])
+        self.assertEqual(
+            errors.tolist(),
+            [False, False, False, False, False, True, True, True, True])
+        self.assertEqual(lat[:3].tolist(), [1.23, 1.23, -1])
+        self.assertEqual(lon[:3].tolist(), [3.21, 3.21, 2])
+        self.assertTrue(np.isnan(lat[3:]).all())
+        self.assertTrue(np.isnan(lon[3:]).all())
@@ -310,3 +310,48 @@ class SupersetTestCase(unittest.TestCase):
         self.assertEquals(True, sql.is_explain())
         self.assertEquals(False, sql.is_select())
         self.assertEquals(True, sql.is_readonly())
+
+    def test_get_statements(self):
+        sql = sql_parse.SupersetQuery('SELECT * FROM t1;\nSELECT * FROM t2;')
+        self.assertEquals(
+            ['SELECT * FROM t1', 'SELECT * FROM t2'], sql.get_statements())
+
+    def test_get_query_with_new_limit(self):
+        sql = sql_parse.SupersetQuery('SELECT * FROM t1 LIMIT 10')
+        self.assertEquals(
+            'SELECT * FROM t1 LIMIT 100', sql.get_query_with_new_limit(100))
+        # the parsed query is left untouched
+        self.assertEquals(
+            'SELECT * FROM t1 LIMIT 10', sql.get_query_with_new_limit(10))
+        self.assertEquals(10, sql.limit)
+
+        sql = sql_parse.SupersetQuery('SELECT * FROM t1 LIMIT 10, 20')
+        self.assertEquals(
+            'SELECT * FROM t1 LIMIT 10, 100', sql.get_query_with_new_limit(100))
+
+
+class ParseCacheTestCase(unittest.TestCase):
+
+    def test_get(self):
+        cache = sql_parse.ParseCache(max_size=2)
+        query = cache.get('SELECT * FROM t1')
+        self.assertEquals({'t1'}, query.tables)
+        self.assertIs(query, cache.get('SELECT * FROM t1'))
+        self.assertIsNot(query, cache.get('SELECT * FROM t1 '))
+
+    def test_eviction(self):
+        cache = sql_parse.ParseCache(max_size=2)
+        query = cache.get('SELECT * FROM t1')
+        cache.get('SELECT * FROM t2')
+        # t1 is now the most recently used
+        cache.get('SELECT * FROM t1')
+        cache.get('SELECT * FROM t3')
+        self.assertEquals(2, len(cache))
+        self.assertIs(query, cache.get('SELECT * FROM t1'))
+        self.assertEquals(2, len(cache))
+
+    def test_disabled(self):
+        cache = sql_parse.ParseCache(max_size=0)
+        query = cache.get('SELECT * FROM t1')
+        self.assertIsNot(query, cache.get('SELECT * FROM t1'))
+        self.assertEquals(0, len(cache))
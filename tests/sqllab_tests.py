@@ -7,13 +7,18 @@ from __future__ import unicode_literals
 
 from datetime import datetime, timedelta
 import json
+import sqlite3
 import unittest
 
 from flask_appbuilder.security.sqla import models as ab_models
+from mock import patch
+import pandas as pd
+from werkzeug.contrib.cache import SimpleCache
 
-from superset import db, security_manager, utils
+from superset import app, db, security_manager, sql_lab, utils
 from superset.dataframe import SupersetDataFrame
 from superset.db_engine_specs import BaseEngineSpec
+from superset.exceptions import SupersetException
 from superset.models.sql_lab import Query
 from .base_tests import SupersetTestCase
 
@@ -237,6 +242,135 @@ class SqlLabTests(SupersetTestCase):
         self.assertEquals(len(data), cdf.size)
         self.assertEquals(len(cols), len(cdf.columns))
 
+    def test_results_window(self):
+        df = pd.DataFrame({
+            'name': ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+            'num': [3, 1, 4, 1, 5, 9, 2],
+        }, columns=['name', 'num'])
+        with patch.object(sql_lab, 'results_backend', SimpleCache()):
+            for frame, start in enumerate(range(0, len(df), 3)):
+                sql_lab.store_results_frame(
+                    'key', frame,
+                    df.iloc[start:start + 3].reset_index(drop=True), 0)
+
+            total, window = sql_lab.get_results_window('key', 3, 1, 3)
+            self.assertEquals(7, total)
+            self.assertEquals(['b', 'c', 'd'], list(window['name']))
+
+            total, window = sql_lab.get_results_window(
+                'key', 3, order_by='num', order_desc=True,
+                filters=[{'col': 'num', 'op': '>', 'val': 1}])
+            self.assertEquals(5, total)
+            self.assertEquals(['f', 'e', 'c', 'a', 'g'], list(window['name']))
+
+            total, window = sql_lab.get_results_window(
+                'key', 3, order_by='num',
+                filters=[{'col': 'name', 'op': 'in', 'val': ['b', 'd', 'g']}])
+            self.assertEquals(['b', 'd', 'g'], list(window['name']))
+
+            with self.assertRaises(SupersetException):
+                sql_lab.get_results_window('key', 3, order_by='foo')
+            self.assertIsNone(sql_lab.get_results_window('expired', 3))
+
+    def test_results_rows_limit(self):
+        self.login('admin')
+        key = 'results_rows_limit'
+        query = Query(
+            client_id='rows_limit',
+            database=self.get_main_database(db.session),
+            sql='SELECT * FROM birth_names',
+            results_key=key,
+        )
+        db.session.add(query)
+        db.session.commit()
+        backend = SimpleCache()
+        payload = json.dumps({'columns': [{'name': 'num'}], 'frames': 1})
+        backend.set(key, utils.zlib_compress(payload))
+        with patch.object(sql_lab, 'results_backend', backend), \
+                patch('superset.views.core.results_backend', backend), \
+                patch.dict(app.config, {
+                    'SQLLAB_RESULTS_PAGE_SIZE': None, 'SQL_MAX_ROW': 3}):
+            sql_lab.store_results_frame(
+                key, 0, pd.DataFrame({'num': list(range(5))}), 0)
+            for limit in (0, -1, 10):
+                resp = self.get_json_resp(
+                    '/superset/results/{}/rows/?limit={}'.format(key, limit))
+                self.assertEqual(3, resp['limit'])
+                self.assertEqual(3, len(resp['data']))
+        db.session.delete(query)
+        db.session.commit()
+
+    def test_is_paged_results_key(self):
+        self.assertTrue(sql_lab.is_paged_results_key(
+            sql_lab.PAGED_RESULTS_PREFIX + 'abc'))
+        self.assertFalse(sql_lab.is_paged_results_key('abc'))
+
+    def test_has_results_page(self):
+        with patch.object(sql_lab, 'results_backend', SimpleCache()) as backend:
+            backend.set(sql_lab.get_results_page_key('key', 0), b'blob')
+            self.assertTrue(sql_lab.has_results_page('key', 0))
+            self.assertFalse(sql_lab.has_results_page('key', 1))
+
+    def store_results_pages(self, key, page_size):
+        cursor = sqlite3.connect(':memory:').execute(
+            'SELECT 0 AS num, \'a\' AS name UNION ALL SELECT 1, \'b\' '
+            'UNION ALL SELECT 2, \'c\' UNION ALL SELECT 3, \'d\' '
+            'UNION ALL SELECT 4, \'e\'')
+        return sql_lab.store_results_pages(
+            key, cursor, Query(limit=None), BaseEngineSpec, page_size, 0)
+
+    def test_store_results_pages(self):
+        with patch.object(sql_lab, 'results_backend', SimpleCache()):
+            meta = self.store_results_pages('key', 2)
+            self.assertEqual(5, meta['rows'])
+            self.assertEqual(3, meta['pages'])
+            self.assertEqual(2, meta['page_size'])
+            self.assertEqual(
+                ['num', 'name'], [col['name'] for col in meta['columns']])
+            self.assertEqual(
+                [{'num': 0, 'name': 'a'}, {'num': 1, 'name': 'b'}],
+                sql_lab.get_results_page('key', 0))
+            self.assertEqual(
+                [{'num': 4, 'name': 'e'}], sql_lab.get_results_page('key', 2))
+            self.assertIsNone(sql_lab.get_results_page('key', 3))
+
+    def test_results_pages(self):
+        self.login('admin')
+        key = sql_lab.PAGED_RESULTS_PREFIX + 'results_pages'
+        query = Query(
+            client_id='results_pages',
+            database=self.get_main_database(db.session),
+            sql='SELECT * FROM birth_names',
+            results_key=key,
+        )
+        db.session.add(query)
+        db.session.commit()
+        backend = SimpleCache()
+        with patch.object(sql_lab, 'results_backend', backend), \
+                patch('superset.views.core.results_backend', backend):
+            meta = self.store_results_pages(key, 2)
+            backend.set(key, utils.zlib_compress(json.dumps(meta)))
+
+            # without a page, the index is merged with the first page
+            resp = self.get_json_resp('/superset/results/{}/'.format(key))
+            self.assertEqual(0, resp['page'])
+            self.assertEqual(3, resp['pages'])
+            self.assertEqual(5, resp['rows'])
+            self.assertEqual(meta['columns'], resp['columns'])
+            self.assertEqual([0, 1], [row['num'] for row in resp['data']])
+
+            resp = self.get_json_resp(
+                '/superset/results/{}/?page=1'.format(key))
+            self.assertEqual({'page', 'pages', 'data'}, set(resp))
+            self.assertEqual(1, resp['page'])
+            self.assertEqual([2, 3], [row['num'] for row in resp['data']])
+
+            backend.delete(sql_lab.get_results_page_key(key, 2))
+            resp = self.client.get('/superset/results/{}/?page=2'.format(key))
+            self.assertEqual(410, resp.status_code)
+        db.session.delete(query)
+        db.session.commit()
+
     def test_sqllab_viz(self):
         payload = {
             'chartType': 'dist_bar',
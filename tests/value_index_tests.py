@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from mock import Mock, patch
+from werkzeug.contrib.cache import SimpleCache
+
+from superset import value_index
+from superset.value_index import ValueIndex
+
+
+class ValueIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ValueIndex(
+            ['Boston', 'bar', None, 'Berlin', 12, 'abba', 'BOSTONIAN'])
+
+    def test_search_all(self):
+        self.assertEqual(self.index.search(), self.index.values)
+        self.assertEqual(self.index.search(limit=2), ['Boston', 'bar'])
+
+    def test_search_prefix(self):
+        self.assertEqual(self.index.search('bo'), ['Boston', 'BOSTONIAN'])
+        self.assertEqual(self.index.search('b', limit=2), ['bar', 'Berlin'])
+        self.assertEqual(self.index.search('1'), [12])
+        self.assertEqual(self.index.search('x'), [])
+
+    def test_search_substring(self):
+        self.assertEqual(
+            self.index.search('ba', value_index.MATCH_SUBSTRING), ['abba', 'bar'])
+        self.assertEqual(ValueIndex([]).search('ba', value_index.MATCH_SUBSTRING), [])
+
+
+def run_synchronously(target, args):
+    return Mock(start=lambda: target(*args))
+
+
+class GetValueIndexTestCase(unittest.TestCase):
+
+    def test_get_value_index(self):
+        load = Mock(return_value=['a', 'b'])
+        reload = Mock(return_value=['a', 'b', 'c'])
+        with patch.object(value_index, 'cache', SimpleCache()), \
+                patch.object(value_index.threading, 'Thread', run_synchronously), \
+                patch.dict(value_index.config, {
+                    'FILTER_VALUES_REFRESH_INTERVAL': 60}):
+            index = value_index.get_value_index('key', load, reload)
+            self.assertEqual(index.values, ['a', 'b'])
+            index = value_index.get_value_index('key', load, reload)
+            self.assertEqual(index.values, ['a', 'b'])
+            self.assertEqual(load.call_count, 1)
+            reload.assert_not_called()
+
+            # stale values are served while they're reloaded
+            with patch.dict(value_index.config, {
+                    'FILTER_VALUES_REFRESH_INTERVAL': -1}):
+                index = value_index.get_value_index('key', load, reload)
+            self.assertEqual(index.values, ['a', 'b'])
+            self.assertEqual(reload.call_count, 1)
+            index = value_index.get_value_index('key', load, reload)
+            self.assertEqual(index.values, ['a', 'b', 'c'])
+            self.assertEqual(load.call_count, 1)
+
+    def test_get_value_index_keeps_the_keys(self):
+        load = Mock(return_value=['b', 'A', 'c'])
+        with patch.object(value_index, 'cache', SimpleCache()), \
+                patch.dict(value_index.config, {
+                    'FILTER_VALUES_REFRESH_INTERVAL': 60}):
+            value_index.get_value_index('key', load)
+            # cached entries aren't sorted again
+            with patch.object(value_index.np, 'argsort') as argsort:
+                index = value_index.get_value_index('key', load)
+                argsort.assert_not_called()
+            self.assertEqual(index.search(), ['b', 'A', 'c'])
+            self.assertEqual(index.search('a'), ['A'])
+
+    def test_get_cache_key(self):
+        datasource = Mock(uid='1__table')
+        datasource.get_fetch_values_predicate.return_value = 'a = 1'
+        key = value_index.get_cache_key(datasource, 'col', 10)
+        self.assertEqual(key, value_index.get_cache_key(datasource, 'col', 10))
+        datasource.get_fetch_values_predicate.return_value = 'a = 2'
+        self.assertNotEqual(key, value_index.get_cache_key(datasource, 'col', 10))
@@ -4,15 +4,21 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 import unittest
 
 from mock import Mock, patch
+import numpy as np
 import pandas as pd
+from werkzeug.contrib.cache import SimpleCache
 
 from superset import app
 from superset.exceptions import SpatialException
-from superset.utils import DTTM_ALIAS
+from superset.models.helpers import QueryResult
+from superset.utils import (
+    DTTM_ALIAS, GROUPING_SET_ALIAS, parse_human_timedelta, TIME_OFFSET_ALIAS,
+)
 import superset.viz as viz
 from .utils import load_fixture
 
@@ -939,6 +945,39 @@ class BaseDeckGLVizTestCase(unittest.TestCase):
 
         self.assertEquals(viz_instance.parse_coordinates(''), None)
 
+    def test_process_spatial_data_obj(self):
+        form_data = {
+            'delimited': {'type': 'delimited', 'lonlatCol': 'lonlat'},
+            'reversed': {
+                'type': 'delimited',
+                'lonlatCol': 'latlon',
+                'reverseCheckbox': True,
+            },
+            'geohash': {'type': 'geohash', 'geohashCol': 'geo'},
+        }
+        df = pd.DataFrame({
+            'lonlat': ['1.23, 3.21', None, '41.5 N, 81.0 W'],
+            'latlon': ['1.23 3.21', '', '-1,2'],
+            'geo': ['ezs42', None, 's'],
+        })
+        test_viz_deckgl = viz.BaseDeckGLViz({'type': 'table'}, form_data)
+        for key in ('delimited', 'reversed', 'geohash'):
+            df = test_viz_deckgl.process_spatial_data_obj(key, df)
+
+        self.assertEqual(list(df.columns), ['delimited', 'reversed', 'geohash'])
+        self.assertEqual(df['delimited'][0], (1.23, 3.21))
+        self.assertIsNone(df['delimited'][1])
+        self.assertEqual(df['delimited'][2], (41.5, -81.0))
+        self.assertEqual(
+            df['reversed'].tolist(), [(3.21, 1.23), (0, 0), (2, -1)])
+        self.assertEqual(
+            df['geohash'].tolist(),
+            [(42.60498046875, -5.60302734375), None, (22.5, 22.5)])
+
+        df = pd.DataFrame({'geo': ['ezs42', 'ezs4a']})
+        with self.assertRaises(SpatialException):
+            test_viz_deckgl.process_spatial_data_obj('geohash', df)
+
     def test_parse_coordinates_raises(self):
         form_data = load_fixture('deck_path_form_data.json')
         datasource = {'type': 'table'}
@@ -950,9 +989,162 @@ class BaseDeckGLVizTestCase(unittest.TestCase):
         with self.assertRaises(SpatialException):
             test_viz_deckgl.parse_coordinates('fldkjsalkj,fdlaskjfjadlksj')
 
+    def test_binary_payload(self):
+        form_data = {
+            'spatial': {'type': 'latlong', 'lonCol': 'lon', 'latCol': 'lat'},
+            'dimension': 'cat',
+            'point_radius_fixed': {'type': 'fix', 'value': 500},
+            'js_columns': ['extra'],
+        }
+        df = pd.DataFrame({
+            'lon': [1.5, 2.5, None],
+            'lat': [-1.5, -2.5, 3.5],
+            'cat': ['a', 'b', 'a'],
+            'extra': ['x', 'y', 'z'],
+        })
+        test_viz_deckgl = viz.DeckScatterViz({'type': 'table'}, form_data)
+        test_viz_deckgl.metric = None
+        with patch.dict(viz.config, {'DECKGL_BINARY_PAYLOAD': True}):
+            data = test_viz_deckgl.get_data(df)
+
+        binary = data['binary']
+        self.assertNotIn('features', data)
+        self.assertEqual(binary['length'], 3)
+        self.assertEqual(binary['constants'], {'radius': 500})
+        self.assertEqual(binary['columns'], {'extra': ['x', 'y', 'z']})
+
+        position = binary['attributes']['position']
+        self.assertEqual(position['type'], 'Float32Array')
+        self.assertEqual(position['size'], 2)
+        values = np.frombuffer(base64.b64decode(position['data']), dtype='<f4')
+        np.testing.assert_array_equal(
+            values, [1.5, -1.5, 2.5, -2.5, np.nan, 3.5])
+
+        cat_color = binary['attributes']['cat_color']
+        self.assertEqual(cat_color['categories'], ['a', 'b'])
+        np.testing.assert_array_equal(
+            np.frombuffer(base64.b64decode(cat_color['data']), dtype='<i4'),
+            [0, 1, 0])
+
 
 class TimeSeriesVizTestCase(unittest.TestCase):
 
+    def get_time_compare_datasource(self):
+        datasource = Mock(
+            uid='1__table', type='table', offset=0, columns=[],
+            cache_timeout=0, database=None, concurrent_queries=0)
+        datasource.get_col.return_value = None
+        datasource.can_query_time_offsets.return_value = True
+
+        def query(query_obj):
+            offsets = query_obj.get('time_offsets') or [
+                query_obj['inner_from_dttm'] - query_obj['from_dttm']]
+            df = pd.DataFrame({
+                TIME_OFFSET_ALIAS: list(range(len(offsets))),
+                DTTM_ALIAS: [query_obj['inner_from_dttm'] - o for o in offsets],
+                'sum__num': [o.days for o in offsets],
+            })
+            if 'time_offsets' not in query_obj:
+                del df[TIME_OFFSET_ALIAS]
+            return QueryResult(df, 'SELECT', 0)
+
+        datasource.query.side_effect = query
+        return datasource
+
+    def test_time_compare_single_query(self):
+        datasource = self.get_time_compare_datasource()
+        form_data = {
+            'metrics': ['sum__num'],
+            'granularity_sqla': 'ds',
+            'since': '2018-01-08',
+            'until': '2018-01-15',
+            'time_compare': ['1 day ago', '1 week ago'],
+        }
+        with patch.object(viz, 'cache', SimpleCache()):
+            test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+            test_viz.run_extra_queries()
+            self.assertEqual(1, datasource.query.call_count)
+            query_obj = datasource.query.call_args[0][0]
+            deltas = [parse_human_timedelta(o) for o in form_data['time_compare']]
+            self.assertEqual(deltas, query_obj['time_offsets'])
+            labels = [label for label, df in test_viz._extra_chart_data]
+            self.assertEqual(['1 day ago offset', '1 week ago offset'], labels)
+            for (label, df), delta in zip(test_viz._extra_chart_data, deltas):
+                self.assertEqual([datetime(2018, 1, 8)], list(df.index))
+                self.assertEqual([delta.days], list(df['sum__num']))
+
+            # only the offset that isn't cached yet is queried
+            form_data['time_compare'] = ['1 week ago', '1 year ago']
+            test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+            test_viz.run_extra_queries()
+            self.assertEqual(2, datasource.query.call_count)
+            query_obj = datasource.query.call_args[0][0]
+            self.assertNotIn('time_offsets', query_obj)
+            deltas = [parse_human_timedelta(o) for o in form_data['time_compare']]
+            self.assertEqual(
+                [delta.days for delta in deltas],
+                [df['sum__num'].iloc[0] for label, df in test_viz._extra_chart_data])
+
+    def test_incremental_cache(self):
+        # one event every 20 seconds, counted per minute
+        events = pd.Series(pd.date_range('2018-01-01', periods=1000, freq='20s'))
+
+        def query(query_obj):
+            selected = events[
+                (events >= query_obj['from_dttm']) &
+                (events <= query_obj['to_dttm'])]
+            df = selected.dt.floor('min').value_counts().sort_index()
+            df = pd.DataFrame({DTTM_ALIAS: df.index, 'count': df.values})
+            return QueryResult(df, 'SELECT', 0)
+
+        datasource = Mock(uid='1__table', type='table', offset=0)
+        datasource.get_col.return_value = None
+        datasource.query.side_effect = query
+        form_data = {'metrics': ['count'], 'time_grain_sqla': 'PT1M'}
+
+        def get_query_obj(since, until):
+            return {
+                'granularity': 'ds',
+                'from_dttm': datetime(2018, 1, 1) + timedelta(minutes=since),
+                'to_dttm': datetime(2018, 1, 1) + timedelta(minutes=until),
+                'is_timeseries': True,
+                'groupby': [],
+                'metrics': ['count'],
+                'row_limit': 1000,
+                'extras': {'time_grain_sqla': 'PT1M'},
+            }
+
+        def get_df(test_viz, query_obj):
+            grain = test_viz.get_incremental_grain(query_obj)
+            df = test_viz.get_df_incremental(query_obj, grain)
+            return df.sort_values(DTTM_ALIAS).reset_index(drop=True)
+
+        with patch.object(viz, 'cache', SimpleCache()), patch.dict(viz.config, {
+                'TIME_SERIES_INCREMENTAL_CACHE': True,
+                'TIME_SERIES_INCREMENTAL_CACHE_LOOKBACK': 120}):
+            test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+            query_obj = get_query_obj(0.5, 60)
+            self.assertEqual(
+                test_viz.get_incremental_grain(query_obj), timedelta(minutes=1))
+            get_df(test_viz, query_obj)
+
+            query_obj = get_query_obj(10.5, 70)
+            df = get_df(test_viz, query_obj)
+            pd.testing.assert_frame_equal(
+                df, query(query_obj).df, check_dtype=False)
+            # before the first reused bucket, and from the lookback onwards
+            self.assertEqual(
+                [(q['from_dttm'], q['to_dttm']) for q in [
+                    c[0][0] for c in datasource.query.call_args_list[1:]]],
+                [
+                    (query_obj['from_dttm'], datetime(2018, 1, 1, 0, 11)),
+                    (datetime(2018, 1, 1, 0, 58), query_obj['to_dttm']),
+                ])
+
+            query_obj['timeseries_limit'] = 5
+            query_obj['groupby'] = ['name']
+            self.assertIsNone(test_viz.get_incremental_grain(query_obj))
+
     def test_timeseries_unicode_data(self):
         datasource = Mock()
         form_data = {
@@ -985,3 +1177,109 @@ class TimeSeriesVizTestCase(unittest.TestCase):
                 u'key': (u'Real Madrid C.F.\U0001f1fa\U0001f1f8\U0001f1ec\U0001f1e7',)},
         ]
         self.assertEqual(expected, viz_data)
+
+    def test_to_series_columnar(self):
+        datasource = Mock()
+        form_data = {'metrics': ['sum__num', 'avg__num']}
+        df = pd.DataFrame({
+            'sum__num': [1, 2, 3],
+            'avg__num': [1.5, None, 3.5],
+        }, columns=['sum__num', 'avg__num'], index=pd.to_datetime([
+            '2018-01-01', '2018-01-02', '2018-01-03']))
+
+        test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+        points = test_viz.to_series(df.copy())
+        self.assertEqual(points[0]['values'][0], {'x': df.index[0], 'y': 1})
+        self.assertTrue(pd.isnull(points[1]['values'][1]['y']))
+
+        with patch.dict(viz.config, {'NVD3_COLUMNAR_SERIES': True}):
+            series = test_viz.to_series(df.copy())
+        xs = [1514764800000, 1514851200000, 1514937600000]
+        self.assertEqual(series, [
+            {'key': 'sum__num', 'x': xs, 'y': [1, 2, 3]},
+            {'key': 'avg__num', 'x': xs, 'y': [1.5, None, 3.5]},
+        ])
+
+    def test_to_series_downsampling(self):
+        datasource = Mock()
+        form_data = {
+            'metrics': ['sum__num'],
+            'downsampling': 'minmax',
+            'downsampling_points': '10',
+        }
+        df = pd.DataFrame(
+            {'sum__num': range(100)},
+            index=pd.date_range('2018-01-01', periods=100, freq='min'))
+        df.iloc[42, 0] = 1000
+
+        test_viz = viz.NVD3TimeSeriesViz(datasource, form_data)
+        series = test_viz.to_series(df.copy())
+        values = series[0]['values']
+        self.assertEqual(len(values), 10)
+        self.assertIn({'x': df.index[42], 'y': 1000}, values)
+        self.assertEqual(values[0], {'x': df.index[0], 'y': 0})
+
+        form_data['downsampling'] = 'None'
+        series = test_viz.to_series(df.copy())
+        self.assertEqual(len(series[0]['values']), 100)
+
+
+class FilterBoxVizTestCase(unittest.TestCase):
+
+    def test_grouping_sets_query(self):
+        datasource = Mock(
+            uid='1__table', type='table', offset=0, cache_timeout=0,
+            database=None, concurrent_queries=0,
+            columns=[Mock(column_name='year', type='INTEGER', is_string=False)])
+        datasource.get_col.return_value = None
+        datasource.can_query_grouping_sets.return_value = True
+        datasource.query.return_value = QueryResult(pd.DataFrame({
+            GROUPING_SET_ALIAS: [0, 0, 1, 1],
+            'name': ['Aaron', 'Zoe', None, None],
+            'year': [None, None, 2001, 2002],
+            'sum__num': [1, 3, 5, 2],
+        }), 'SELECT', 0)
+        form_data = {
+            'groupby': ['name', 'year'],
+            'metric': 'sum__num',
+        }
+        test_viz = viz.FilterBoxViz(datasource, form_data, force=True)
+        test_viz.run_extra_queries()
+
+        self.assertEqual(1, datasource.query.call_count)
+        query_obj = datasource.query.call_args[0][0]
+        self.assertTrue(query_obj['grouping_sets'])
+        self.assertEqual(['name', 'year'], query_obj['groupby'])
+        df = test_viz.dataframes['name']
+        self.assertEqual(['name', 'sum__num'], list(df.columns))
+        self.assertEqual(['Zoe', 'Aaron'], list(df['name']))
+        df = test_viz.dataframes['year']
+        self.assertEqual(['year', 'sum__num'], list(df.columns))
+        self.assertEqual([2001, 2002], list(df['year']))
+        self.assertEqual('i', df['year'].dtype.kind)
+
+    def test_grouping_sets_query_null_integer(self):
+        datasource = Mock(
+            uid='1__table', type='table', offset=0, cache_timeout=0,
+            database=None, concurrent_queries=0,
+            columns=[Mock(column_name='year', type='INTEGER', is_string=False)])
+        datasource.get_col.return_value = None
+        datasource.can_query_grouping_sets.return_value = True
+        datasource.query.return_value = QueryResult(pd.DataFrame({
+            GROUPING_SET_ALIAS: [0, 0, 1, 1, 1],
+            'name': ['Aaron', 'Zoe', None, None, None],
+            'year': [None, None, 2001, None, 2002],
+            'sum__num': [1, 3, 5, 4, 2],
+        }), 'SELECT', 0)
+        form_data = {
+            'groupby': ['name', 'year'],
+            'metric': 'sum__num',
+        }
+        test_viz = viz.FilterBoxViz(datasource, form_data, force=True)
+        test_viz.run_extra_queries()
+
+        df = test_viz.dataframes['year']
+        self.assertEqual(3, len(df))
+        self.assertEqual([5, 4, 2], list(df['sum__num']))
+        self.assertEqual([2001, 2002], list(df['year'].dropna()))
+        self.assertTrue(df['year'].isnull()[1])